@@ -0,0 +1,164 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from .question_cache import is_context_dependent, normalize_question
+from .text_similarity import cosine, term_vector, tokenize
+from .token_budget import count_tokens
+
+# Few-shot examples: questions whose SQL executed successfully on the same database
+FEW_SHOT_ENABLED = os.getenv("FEW_SHOT_ENABLED", "true").lower() == "true"
+FEW_SHOT_TOP_K = int(os.getenv("FEW_SHOT_TOP_K", "3"))
+FEW_SHOT_MIN_SIMILARITY = float(os.getenv("FEW_SHOT_MIN_SIMILARITY", "0.35"))  # Cosine below this isn't a useful example
+FEW_SHOT_MAX_EXAMPLES = int(os.getenv("FEW_SHOT_MAX_EXAMPLES", "500"))        # Per database, oldest dropped first
+FEW_SHOT_MAX_TOKENS = int(os.getenv("FEW_SHOT_MAX_TOKENS", "600"))            # Examples text in the SQL prompt
+
+NO_EXAMPLES = "None"
+
+
+class ExampleStore:
+    """
+    Successful (question, SQL) pairs for one database with an inverted term index, so a
+    lookup only scores examples sharing a word with the question. Seeded from the
+    query_examples table; new pairs are handed to the persist callback.
+    """
+
+    def __init__(self, fingerprint: str, examples: Optional[List[Dict]] = None,
+                 persist: Optional[Callable[[str, str], None]] = None, max_examples: int = FEW_SHOT_MAX_EXAMPLES):
+        self.fingerprint = fingerprint
+        self.max_examples = max_examples
+        self._persist = persist
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._index: Dict[str, set] = {}  # term -> normalized questions containing it
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        for example in examples or []:
+            self._add_locked(example["question"], example["sql_query"])
+
+    def _remove_locked(self, key: str):
+        entry = self._entries.pop(key)
+        for term in entry["vector"]:
+            keys = self._index.get(term)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[term]
+
+    def _add_locked(self, question: str, sql_query: str) -> bool:
+        key = normalize_question(question)
+        existing = self._entries.get(key)
+        if existing is not None and existing["sql_query"] == sql_query:
+            self._entries.move_to_end(key)
+            return False
+        if existing is not None:
+            self._remove_locked(key)
+        vector = term_vector(tokenize(key))
+        if not vector:
+            return False
+        self._entries[key] = {"question": question, "sql_query": sql_query, "vector": vector}
+        for term in vector:
+            self._index.setdefault(term, set()).add(key)
+        while len(self._entries) > self.max_examples:
+            self._remove_locked(next(iter(self._entries)))
+        return True
+
+    def add(self, question: str, sql_query: str) -> bool:
+        """Remember a question whose SQL ran; follow-ups that only make sense in context are skipped"""
+        if not question.strip() or is_context_dependent(question):
+            return False
+        with self._lock:
+            added = self._add_locked(question.strip(), sql_query)
+        if added and self._persist is not None:
+            try:
+                self._persist(question.strip(), sql_query)
+            except Exception as e:
+                print(f"[FEW SHOT] Failed to persist example: {e}")
+        return added
+
+    def search(self, question: str, top_k: int = FEW_SHOT_TOP_K) -> List[Dict]:
+        """Most similar stored examples, best first"""
+        vector = term_vector(tokenize(normalize_question(question)))
+        with self._lock:
+            self.lookups += 1
+            candidates = set()
+            for term in vector:
+                candidates.update(self._index.get(term, ()))
+            scored = []
+            for key in candidates:
+                score = cosine(vector, self._entries[key]["vector"])
+                if score >= FEW_SHOT_MIN_SIMILARITY:
+                    scored.append((score, key))
+            scored.sort(reverse=True)
+            examples = [
+                {"question": self._entries[key]["question"], "sql_query": self._entries[key]["sql_query"], "similarity": round(score, 4)}
+                for score, key in scored[:top_k]
+            ]
+            if examples:
+                self.hits += 1
+        return examples
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"examples": len(self._entries), "lookups": self.lookups, "hits": self.hits}
+
+
+def format_examples(examples: List[Dict], max_tokens: int = FEW_SHOT_MAX_TOKENS) -> str:
+    """Examples as prompt text, dropping the least similar ones past the token cap"""
+    lines = []
+    used = 0
+    for example in examples:
+        text = f"Q: {example['question']}\nSQL: {example['sql_query']}"
+        cost = count_tokens(text)
+        if lines and used + cost > max_tokens:
+            break
+        lines.append(text)
+        used += cost
+    return "\n\n".join(lines) if lines else NO_EXAMPLES
+
+
+# Database.id -> store; replaced when the schema fingerprint changes
+_stores: Dict[int, ExampleStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_example_store(database_id: int, fingerprint: str, load: Callable[[], List[Dict]],
+                      persist: Optional[Callable[[str, str], None]] = None, replace: bool = True) -> Optional[ExampleStore]:
+    """
+    Store for a database's current schema, loaded on first use. With replace=False a store
+    built for another fingerprint is left alone and None is returned.
+    """
+    if not FEW_SHOT_ENABLED:
+        return None
+    with _stores_lock:
+        store = _stores.get(database_id)
+        if store is not None and store.fingerprint == fingerprint:
+            return store
+        if store is not None and not replace:
+            return None
+    try:
+        examples = load()
+    except Exception as e:
+        print(f"[FEW SHOT] Failed to load examples for database {database_id}: {e}")
+        examples = []
+    store = ExampleStore(fingerprint, examples, persist)
+    with _stores_lock:
+        current = _stores.get(database_id)
+        if current is not None and current.fingerprint == fingerprint:
+            return current
+        if current is not None and not replace:
+            return None
+        _stores[database_id] = store
+    return store
+
+
+def invalidate_example_store(database_id: int):
+    with _stores_lock:
+        _stores.pop(database_id, None)
+
+
+def get_example_store_stats() -> Dict[int, Dict]:
+    with _stores_lock:
+        stores = dict(_stores)
+    return {database_id: store.stats() for database_id, store in stores.items()}
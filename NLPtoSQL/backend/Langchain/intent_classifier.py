@@ -0,0 +1,126 @@
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+from .text_similarity import split_identifier, stem, tokenize
+
+# Local intent fast path: decisions at or above this confidence skip the LLM intent call
+INTENT_FAST_PATH_ENABLED = os.getenv("INTENT_FAST_PATH_ENABLED", "true").lower() == "true"
+INTENT_FAST_PATH_CONFIDENCE = float(os.getenv("INTENT_FAST_PATH_CONFIDENCE", "0.85"))
+
+_CASUAL_PATTERN = re.compile(
+    r"^\s*(hi+|hello+|hey+|yo|hiya|howdy|good (morning|afternoon|evening|night)|thanks?( you)?( so much| a lot)?|"
+    r"thank u|thx|ty|ok(ay)?|cool|great|nice|awesome|bye|goodbye|see you|how are you( doing)?|"
+    r"what'?s up|sup|who are you|what can you do)\s*[!.?]*\s*$",
+    re.IGNORECASE,
+)
+_RAW_SQL_PATTERN = re.compile(r"^\s*(select|with)\b.+\bfrom\b", re.IGNORECASE | re.DOTALL)
+_GEOJSON_PATTERN = re.compile(r"\"type\"\s*:\s*\"(Point|Polygon|MultiPolygon|LineString)\"", re.IGNORECASE)
+
+# Same vocabulary as the SQL_SPATIAL rule in the intent prompt. Strong terms decide on their own;
+# weak ones ("within", "near") also appear in plain date/number questions and need a distance unit
+_STRONG_SPATIAL_TERMS = {"polygon", "multipolygon", "intersect", "intersects", "geojson", "coordinate", "coordinates",
+                         "buffer", "radius", "latitude", "longitude", "geometry", "geography", "postgis"}
+_WEAK_SPATIAL_TERMS = {"near", "nearby", "within", "inside", "point", "boundary", "touch", "touches", "distance"}
+_DISTANCE_PATTERN = re.compile(r"\b\d+(\.\d+)?\s*(km|kms|kilometers?|kilometres?|m|meters?|metres?|miles?|mi)\b", re.IGNORECASE)
+
+# Wording that asks for data rather than an explanation
+_DATA_REQUEST_PATTERN = re.compile(
+    r"\b(how many|count|number of|list|show|display|fetch|give me|top \d+|total|sum|average|avg|"
+    r"maximum|minimum|max|min|highest|lowest|latest|oldest|newest|recent|group(ed)? by|per|each|"
+    r"between|greater than|less than|more than|sorted|order(ed)? by)\b",
+    re.IGNORECASE,
+)
+
+
+class IntentDecision:
+    """Outcome of the local classifier: intent value (QueryIntent.value) or None, plus confidence"""
+
+    def __init__(self, intent: Optional[str], confidence: float, reason: str):
+        self.intent = intent
+        self.confidence = round(confidence, 2)
+        self.reason = reason
+
+    def to_dict(self) -> Dict:
+        return {"intent": self.intent, "confidence": self.confidence, "reason": self.reason}
+
+
+def _terms(names: Iterable[str]) -> Set[str]:
+    terms = set()
+    for name in names:
+        for part in split_identifier(str(name).split(".")[-1]):
+            if len(part) > 2 and not part.isdigit():
+                terms.add(stem(part))
+    return terms
+
+
+class IntentClassifier:
+    """
+    Rule-based intent scoring from greetings, raw SQL, spatial vocabulary and the
+    table / column names of the connected database. Confident results short-circuit
+    the LLM classifier; anything else is left to it.
+    """
+
+    def __init__(self, table_descriptions: Optional[Dict] = None, stored_schema: Optional[Dict] = None,
+                 selected_tables: Optional[List[str]] = None, threshold: float = INTENT_FAST_PATH_CONFIDENCE):
+        self.threshold = threshold
+
+        tables = set(selected_tables or []) | set((stored_schema or {}).keys()) | set((table_descriptions or {}).keys())
+        columns = set()
+        for table_columns in (stored_schema or {}).values():
+            for column in table_columns or []:
+                if isinstance(column, dict) and column.get("column"):
+                    columns.add(column["column"])
+        for info in (table_descriptions or {}).values():
+            if isinstance(info, dict) and isinstance(info.get("columns"), dict):
+                columns.update(info["columns"].keys())
+
+        self.table_terms = _terms(tables)
+        self.column_terms = _terms(columns) - self.table_terms
+
+    def classify(self, question: str) -> IntentDecision:
+        text = question.strip()
+        if not text:
+            return IntentDecision(None, 0.0, "empty question")
+
+        if _CASUAL_PATTERN.match(text):
+            return IntentDecision("casual_chat", 0.95, "greeting / small talk")
+        if _RAW_SQL_PATTERN.match(text):
+            return IntentDecision("sql_query", 0.95, "question is a SQL statement")
+        if _GEOJSON_PATTERN.search(text):
+            return IntentDecision("sql_spatial", 0.95, "GeoJSON geometry in question")
+
+        words = set(tokenize(text, drop_stopwords=False))
+        stems = {stem(word) for word in words}
+        table_hits = stems & self.table_terms
+        column_hits = stems & self.column_terms
+
+        strong_spatial = words & _STRONG_SPATIAL_TERMS
+        weak_spatial = words & _WEAK_SPATIAL_TERMS
+        if strong_spatial or (weak_spatial and _DISTANCE_PATTERN.search(text)):
+            confidence = 0.9 if strong_spatial else 0.85
+            return IntentDecision("sql_spatial", confidence, f"spatial terms: {sorted(strong_spatial | weak_spatial)}")
+
+        score = 0.0
+        if table_hits:
+            score += 0.6
+        score += min(0.3, 0.15 * len(column_hits))
+        if _DATA_REQUEST_PATTERN.search(text):
+            score += 0.25
+        if weak_spatial:
+            # "within"/"near" without a distance: leave spatial vs plain SQL to the LLM
+            score = min(score, self.threshold - 0.05)
+
+        if score > 0:
+            reason = f"schema terms: {sorted(table_hits | column_hits)}" if table_hits or column_hits else "data request wording"
+            return IntentDecision("sql_query", min(score, 0.98), reason)
+        return IntentDecision(None, 0.0, "no local signal")
+
+    def decide(self, question: str) -> Optional[IntentDecision]:
+        """Local decision when confident enough, else None (ask the LLM)"""
+        if not INTENT_FAST_PATH_ENABLED:
+            return None
+        decision = self.classify(question)
+        if decision.intent is None or decision.confidence < self.threshold:
+            return None
+        return decision
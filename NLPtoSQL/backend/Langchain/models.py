@@ -17,6 +17,18 @@ class QueryLog(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+class QueryExample(Base):
+    """Question whose SQL executed successfully; few-shot examples for SQL generation"""
+    __tablename__ = "query_examples"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    database_id = Column(Integer, ForeignKey("databases.id", ondelete="CASCADE"), nullable=False, index=True)
+    schema_fingerprint = Column(String(16), nullable=False)
+    question = Column(Text, nullable=False)
+    sql_query = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
 class QueryLogBase(BaseModel):
     client_id: int
     user_id: Optional[int] = None
@@ -8,10 +8,37 @@ from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 import json
 import os
 import re
+import time
+from concurrent.futures import Future
 from enum import Enum
-from collections import deque
+from collections import OrderedDict, deque
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Hashable, Optional, Tuple
+from .schema_cache import TableDDLCache
+from .question_cache import QuestionCache, get_question_cache, is_context_dependent, normalize_question
+from .intent_classifier import IntentClassifier
+from .table_retriever import TABLE_LLM_RERANK, TableRetriever
+from .schema_linker import prune_schema
+from .token_budget import PromptBudget, count_tokens, truncate_to_tokens
+from .sql_identifiers import fix_identifiers
+from .example_store import ExampleStore, NO_EXAMPLES, format_examples
+
+# One-shot mode: intent + tables + SQL from a single LLM call
+ONE_SHOT_MIN_CONFIDENCE = float(os.getenv("ONE_SHOT_MIN_CONFIDENCE", "0.7"))  # Below this, fall back to the multi-stage pipeline
+ONE_SHOT_MAX_TABLES = int(os.getenv("ONE_SHOT_MAX_TABLES", "8"))  # Tables whose schema goes into the one-shot prompt
+
+# Speculative execution: table selection (and optionally SQL generation) run while the LLM classifies intent
+SPECULATIVE_TOKEN_BUDGET = int(os.getenv("SPECULATIVE_TOKEN_BUDGET", "0"))  # Extra tokens a question may spend speculatively (0 = off); plans can override
+SPECULATIVE_SQL = os.getenv("SPECULATIVE_SQL", "true").lower() == "true"   # Also speculate SQL generation when it fits the budget
+
+# Conversation memory: "window" keeps the last exchanges verbatim; "compact" folds older turns into a
+# running summary + structured SQL history so history tokens stay flat over long sessions
+MEMORY_MODE = os.getenv("MEMORY_MODE", "window")
+MEMORY_RECENT_EXCHANGES = int(os.getenv("MEMORY_RECENT_EXCHANGES", "2"))        # Verbatim exchanges kept in compact mode
+MEMORY_SUMMARY_MAX_TOKENS = int(os.getenv("MEMORY_SUMMARY_MAX_TOKENS", "150"))  # Cap on the running summary
+MEMORY_SQL_HISTORY = int(os.getenv("MEMORY_SQL_HISTORY", "2"))                  # Previous SQL statements remembered
+
+GENERATED_SQL_HISTORY = 20  # Questions per session whose generated SQL /execute-sql can still confirm
 
 # Define what type of question user is asking
 class QueryIntent(Enum):
@@ -35,8 +62,7 @@ class ConversationMemory:
     def add_message(self, role: str, content: str, metadata: Dict = None):
         """Add a message to conversation history"""
         # Truncate very long messages
-        if len(content) > self.max_tokens_per_msg * 4:  # Approx 4 chars per token
-            content = content[:self.max_tokens_per_msg * 4] + "... [truncated]"
+        content = truncate_to_tokens(content, self.max_tokens_per_msg)
         
         msg_data = {
             "role": role,
@@ -77,9 +103,8 @@ class ConversationMemory:
         self.messages.clear()
     
     def get_token_estimate(self) -> int:
-        """Estimate total tokens in conversation history"""
-        total_chars = sum(len(msg["content"]) for msg in self.messages)
-        return total_chars // 4  # Rough estimate: 4 chars ≈ 1 token
+        """Total tokens in conversation history"""
+        return sum(count_tokens(msg["content"]) for msg in self.messages)
     
     def to_dict(self) -> Dict:
         """Export conversation history"""
@@ -99,25 +124,132 @@ class ConversationMemory:
         for msg in data.get("messages", [])[-self.max_exchanges * 2:]:
             self.messages.append(msg)
 
+class CompactingConversationMemory(ConversationMemory):
+    """
+    Keeps only the last few exchanges verbatim. Older turns are folded locally (no LLM call)
+    into a token-capped running summary, and generated SQL is kept as structured records,
+    so the history part of every prompt stays roughly the same size however long the session runs.
+    """
+    
+    def __init__(self, recent_exchanges: int = MEMORY_RECENT_EXCHANGES, max_tokens_per_msg: int = 500,
+                 summary_max_tokens: int = MEMORY_SUMMARY_MAX_TOKENS, sql_history: int = MEMORY_SQL_HISTORY):
+        super().__init__(max_exchanges=recent_exchanges, max_tokens_per_msg=max_tokens_per_msg)
+        self.summary_max_tokens = summary_max_tokens
+        self.summary_lines = deque()
+        self.sql_history = deque(maxlen=sql_history)  # {"question", "tables", "sql"}
+        self._pending_question = None
+        self._folding_question = None
+    
+    def add_message(self, role: str, content: str, metadata: Dict = None):
+        if len(self.messages) == self.messages.maxlen:
+            self._fold(self.messages[0])
+        super().add_message(role, content, metadata)
+        
+        msg = self.messages[-1]
+        if role == "user":
+            self._pending_question = msg["content"]
+        elif msg["metadata"].get("sql"):
+            self.sql_history.append({
+                "question": truncate_to_tokens(self._pending_question or "", 25, marker="..."),
+                "tables": msg["metadata"].get("tables_used") or [],
+                "sql": msg["metadata"]["sql"]
+            })
+    
+    def _fold(self, msg: Dict):
+        """Move a message leaving the verbatim window into the running summary (one line per exchange)"""
+        if msg["role"] == "user":
+            self._folding_question = truncate_to_tokens(msg["content"], 25, marker="...")
+            return
+        question = self._folding_question or "(follow-up)"
+        self._folding_question = None
+        tables = msg["metadata"].get("tables_used")
+        if msg["metadata"].get("sql"):
+            outcome = f"SQL on {', '.join(tables)}" if tables else "SQL"
+        else:
+            outcome = msg["metadata"].get("intent") or truncate_to_tokens(msg["content"], 15, marker="...")
+        self.summary_lines.append(f"- {question} -> {outcome}")
+        while len(self.summary_lines) > 1 and count_tokens("\n".join(self.summary_lines)) > self.summary_max_tokens:
+            self.summary_lines.popleft()
+    
+    def get_context_summary(self) -> str:
+        """Running summary + previous SQL; the verbatim recent turns go in chat_history only"""
+        parts = []
+        if self.summary_lines:
+            parts.append("Earlier in this conversation:\n" + "\n".join(self.summary_lines))
+        if self.sql_history:
+            parts.append("Previous SQL:\n" + "\n".join(
+                f"- Q: {entry['question']} | tables: {', '.join(entry['tables'])} | SQL: {entry['sql']}"
+                for entry in self.sql_history
+            ))
+        return "\n\n".join(parts)
+    
+    def clear(self):
+        super().clear()
+        self.summary_lines.clear()
+        self.sql_history.clear()
+        self._pending_question = None
+        self._folding_question = None
+    
+    def get_token_estimate(self) -> int:
+        return super().get_token_estimate() + count_tokens(self.get_context_summary())
+    
+    def to_dict(self) -> Dict:
+        data = super().to_dict()
+        data["summary"] = list(self.summary_lines)
+        data["sql_history"] = list(self.sql_history)
+        return data
+    
+    def from_dict(self, data: Dict):
+        self.clear()
+        super().from_dict({**data, "messages": []})
+        # Messages beyond the verbatim window are folded as they are replayed
+        for msg in data.get("messages", []):
+            self.add_message(msg["role"], msg["content"], msg.get("metadata"))
+        if "summary" in data:
+            self.summary_lines.clear()
+            self.summary_lines.extend(data["summary"])
+        if "sql_history" in data:
+            self.sql_history.clear()
+            self.sql_history.extend(data["sql_history"])
+
 class QueryEngine:
     """Main engine: converts natural language to SQL with intent detection and memory"""
     
-    def __init__(self, db: SQLDatabase, db_description: str = None, table_descriptions: Dict = None, selected_tables: list = None, session_id: str = None, stored_schema: Dict = None):
+    def __init__(self, db: SQLDatabase, db_description: str = None, table_descriptions: Dict = None, selected_tables: list = None, session_id: str = None, stored_schema: Dict = None,
+                 ddl_cache: TableDDLCache = None, question_cache_key: Tuple[int, str] = None, speculative_token_budget: int = None,
+                 example_store_lookup: Callable[[], Optional[ExampleStore]] = None, tenant_id: Hashable = None):
         self.db = db
         self.db_description = db_description or "database"
         self.table_descriptions = table_descriptions or {}
         self.selected_tables = selected_tables or []
         self.stored_schema = stored_schema or {}  # Use stored schema if available
+        self.ddl_cache = ddl_cache or TableDDLCache()  # CREATE TABLE text per table for prompts
+        self.question_cache_key = question_cache_key  # (database id, schema fingerprint); None disables question -> SQL caching
+        self._generated_sql: "OrderedDict[str, Dict]" = OrderedDict()  # Normalized question -> SQL this session generated
+        self.example_store_lookup = example_store_lookup  # Shared store per database; None disables few-shot examples
+        self.intent_classifier = IntentClassifier(self.table_descriptions, self.stored_schema, self.selected_tables)
+        self.table_retriever = TableRetriever(self.table_descriptions, self.stored_schema, self.selected_tables)
+        self.column_descriptions = {
+            table: info["columns"] for table, info in self.table_descriptions.items()
+            if isinstance(info, dict) and isinstance(info.get("columns"), dict)
+        }
+        self.speculative_token_budget = SPECULATIVE_TOKEN_BUDGET if speculative_token_budget is None else speculative_token_budget
+        self.tenant_id = tenant_id  # Speculative work counts against this tenant's concurrency limit
         
         # Initialize conversation memory
-        self.memory = ConversationMemory(max_exchanges=5, max_tokens_per_msg=500)
+        if MEMORY_MODE == "compact":
+            self.memory = CompactingConversationMemory(max_tokens_per_msg=500)
+        else:
+            self.memory = ConversationMemory(max_exchanges=5, max_tokens_per_msg=500)
         self.memory.session_id = session_id or f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         
         # Setup Groq LLM
+        self.model_name = "llama-3.3-70b-versatile"
         self.llm = ChatGroq(
             temperature=0,
-            model_name="llama-3.3-70b-versatile"
+            model_name=self.model_name
         )
+        self.prompt_budget = PromptBudget(self.model_name)  # Per-call input token limit for this model
         
         # Setup web search tool
         # Setup web search tool
@@ -268,6 +400,9 @@ class QueryEngine:
             Recent Conversation Context:
             {conversation_context}
 
+            Similar questions answered correctly on this database (adapt, don't copy blindly):
+            {few_shot_examples}
+
             🚨🚨🚨 ABSOLUTE CRITICAL WARNING - READ-ONLY DATABASE 🚨🚨🚨
             ⛔ YOU ARE STRICTLY FORBIDDEN TO GENERATE ANY QUERIES THAT MODIFY DATA ⛔
 
@@ -353,6 +488,7 @@ class QueryEngine:
         ])
         
         self.query_chain = self.query_prompt | self.llm | StrOutputParser()
+        self._query_prompt_tokens = count_tokens(self.query_prompt.messages[0].prompt.template)  # Fixed instructions
         
         # 3. Table Selection Chain
         self.table_prompt = ChatPromptTemplate.from_messages([
@@ -412,6 +548,32 @@ Return format: ["TableName1", "TableName2"]"""),
                 ])
         
         self.sql_fix_chain = self.sql_fix_prompt | self.llm | StrOutputParser()
+        
+        # 6. One-shot Intent + Tables + SQL (opt-in, mode="one_shot")
+        self.one_shot_prompt = ChatPromptTemplate.from_messages([
+            ("system", """You answer questions about a {db_description} in ONE step.
+
+            Schema: {schema}
+
+            SELECTED TABLES ONLY - USE ONLY THESE TABLES:
+            {selected_tables_list}
+
+            Recent Conversation Context:
+            {conversation_context}
+
+            1. Classify the question: SQL_QUERY (about the database data), CASUAL_CHAT, GENERAL_KNOWLEDGE,
+               SARCASTIC_RESPONSE or AMBIGUOUS.
+            2. For SQL_QUERY, pick the tables you need and write ONE read-only SELECT (or WITH ... SELECT) query.
+               NEVER generate UPDATE/DELETE/INSERT/DROP/TRUNCATE/ALTER/CREATE.
+               Aliases follow the table name with a space (FROM crm_customer c), columns are alias.column.
+            3. Rate your confidence from 0 to 1.
+
+            Return ONLY JSON, no markdown, no explanation:
+            {{"intent": "SQL_QUERY", "confidence": 0.9, "tables": ["table_name"], "sql": "SELECT ..."}}
+            Use "sql": null when the intent is not SQL_QUERY."""),
+            MessagesPlaceholder(variable_name="chat_history", optional=True),
+            ("human", "{question}")
+        ])
     
     def classify_intent(self, question: str) -> tuple:
         """Determine question type with conversation context"""
@@ -456,6 +618,17 @@ Return format: ["TableName1", "TableName2"]"""),
             print(f"Intent classification error: {e}")
             return QueryIntent.AMBIGUOUS, token_usage
     
+    def decide_intent(self, question: str) -> tuple:
+        """Local fast-path classifier first; only low-confidence questions go to the LLM"""
+        decision = self.intent_classifier.decide(question)
+        if decision is not None:
+            print(f"[INTENT] Local: {decision.intent} ({decision.confidence}, {decision.reason})")
+            no_tokens = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+            return QueryIntent(decision.intent), no_tokens, {"intent_decided_by": "local", "intent_confidence": decision.confidence}
+        
+        intent, token_usage = self.classify_intent(question)
+        return intent, token_usage, {"intent_decided_by": "llm", "intent_confidence": None}
+    
     def _rephrase_search_results(self, question: str, search_results: str) -> str:
         """Summarize web search results"""
         try:
@@ -537,14 +710,16 @@ Return format: ["TableName1", "TableName2"]"""),
         topics = list(self.table_descriptions.keys())
         return ", ".join(topics[:5])  # First 5 tables
     
-    def get_table_details(self):
+    def get_table_details(self, tables: List[str] = None):
         """Get table descriptions from metadata"""
         if not self.table_descriptions:
             return "No table descriptions available"
         
-        # Filter by selected_tables if provided
+        # Filter by the given candidates, else by selected_tables if provided
         tables_to_use = self.table_descriptions
-        if self.selected_tables:
+        if tables:
+            tables_to_use = {k: v for k, v in self.table_descriptions.items() if k in tables}
+        elif self.selected_tables:
             tables_to_use = {k: v for k, v in self.table_descriptions.items() if k in self.selected_tables}
         
         details = ""
@@ -559,7 +734,7 @@ Return format: ["TableName1", "TableName2"]"""),
             # If selected_tables is set, use only those
             if self.selected_tables:
                 return self._get_schema_for_tables(self.selected_tables)
-            return self.db.table_info
+            return self._get_schema_for_tables(self.db.get_usable_table_names())
         
         try:
             all_tables = self.db.get_usable_table_names()
@@ -582,7 +757,7 @@ Return format: ["TableName1", "TableName2"]"""),
         except Exception as e:
             print(f"Schema filtering failed: {e}")
         
-        return self.db.table_info
+        return self._get_schema_for_tables(self.db.get_usable_table_names())
     
     def _get_schema_for_tables(self, tables: list) -> str:
         """Helper to get schema for specific tables"""
@@ -598,13 +773,8 @@ Return format: ["TableName1", "TableName2"]"""),
             if not normalized_tables:
                 return "Schema unavailable for requested tables"
 
-            filtered_db = SQLDatabase.from_uri(
-                self.db._engine.url,
-                sample_rows_in_table_info=0,
-                include_tables=normalized_tables,
-                engine_args={"pool_pre_ping": True, "pool_recycle": 300}
-            )
-            return filtered_db.table_info
+            ddl = self.ddl_cache.get_many(normalized_tables, self._reflect_table_ddl)
+            return "\n\n".join(ddl[table] for table in normalized_tables if table in ddl)
         except Exception as e:
             print(f"Failed to get schema for tables {tables}: {e}")
             try:
@@ -614,47 +784,22 @@ Return format: ["TableName1", "TableName2"]"""),
             except Exception:
                 return "Schema unavailable for requested tables"
     
+    def _reflect_table_ddl(self, tables: List[str]) -> Dict[str, str]:
+        """Live CREATE TABLE text (no sample rows) for tables missing from the DDL cache"""
+        # Sample-free view on the shared engine; tables are reflected once per engine, not per question
+        from database.engines import engine_registry
+        schema_db = engine_registry.variant(self.db, sample_rows_in_table_info=0)
+        return {table: schema_db.get_table_info(table_names=[table]) for table in tables}
+    
     def validate_and_fix_sql(self, sql_query: str, schema: str = "") -> str:
         """Validate and fix SQL query"""
         if "(SELECT *" in sql_query:
             print("Warning: Found SELECT * in subquery context")
         
-        # Fix double qualification: table.alias.column → alias.column
-        # Pattern 1: crm_customer.c.id → c.id
-        sql_query = re.sub(
-            r'\b(\w+)\.([a-z])\.(\w+)\b',
-            r'\2.\3',
-            sql_query,
-            flags=re.IGNORECASE
-        )
-        
-        # Pattern 2: alias.table.column → alias.column
-        sql_query = re.sub(
-            r'\b([a-z])\.(\w+)\.(\w+)\b',
-            r'\1.\3',
-            sql_query,
-            flags=re.IGNORECASE
-        )
-        
-        # Pattern 3: table.table.column → table.column
-        sql_query = re.sub(
-            r'\b(\w+)\.(\1)\.(\w+)\b',
-            r'\1.\3',
-            sql_query,
-            flags=re.IGNORECASE
-        )
-        
+        # Double qualification (crm_customer.c.id → c.id) and schema casing in one tokenizer pass
+        sql_query = fix_identifiers(sql_query, schema)
         print(f"SQL after qualification fix: {sql_query}")
         
-        if schema:
-            col_pattern = r'\b([a-zA-Z_][a-zA-Z0-9_]*)\s+'
-            actual_cols = re.findall(col_pattern, schema)
-            col_map = {col.lower(): col for col in actual_cols}
-            
-            for lower_col, actual_col in col_map.items():
-                pattern = r'\b' + lower_col + r'\b'
-                sql_query = re.sub(pattern, actual_col, sql_query, flags=re.IGNORECASE)
-        
         return sql_query
 
     def _extract_executable_sql(self, llm_content: str) -> str:
@@ -718,21 +863,129 @@ Return format: ["TableName1", "TableName2"]"""),
             
         except Exception as e:
             print(f"JSON parsing failed: {e}")
-            fallback_tables = []
-            known_tables = ["Customer", "Risk_Profile", "Transaction_db_new", 
-                          "Daily_Transaction_Insurance", "Tasks", "EmployeeProfile"]
-            
-            for table in known_tables:
-                if table in response:
-                    fallback_tables.append(table)
-            
-            return fallback_tables
+            # Fall back to this database's table names mentioned in the reply
+            return self.table_retriever.match_names(response)
+    
+    def _previous_tables(self) -> List[str]:
+        """Tables used for the most recent SQL answer (follow-ups like "and their orders?")"""
+        for msg in reversed(self.memory.messages):
+            tables = msg.get("metadata", {}).get("tables_used")
+            if msg["role"] == "assistant" and tables:
+                return list(tables)
+        return []
     
-    def generate_query(self, question: str, selected_tables: list = None, filtered_schema: str = None, geometry: Optional[dict] = None):
-        """Generate SQL query with conversation context. If geometry is provided, PostGIS SQL is generated."""
+    def select_tables(self, question: str, context: str = "") -> tuple:
+        """Pick tables for a question: local BM25 retrieval, with the LLM as optional re-ranker / last resort"""
+        candidates = self.table_retriever.select(question) or self._previous_tables()
+        if candidates and not TABLE_LLM_RERANK:
+            print(f"[TABLE RETRIEVER] Selected {candidates}")
+            return candidates, {}
+        
+        token_usage = {}
+        table_response_obj = (self.table_prompt | self.llm).invoke({
+            "question": question,
+            "table_details": self.get_table_details(candidates),
+            "conversation_context": context
+        })
+        
+        # Extract token usage for table selection
+        if hasattr(table_response_obj, 'response_metadata'):
+            usage = table_response_obj.response_metadata.get('token_usage', {})
+            token_usage = {
+                "prompt_tokens": usage.get('prompt_tokens', 0),
+                "completion_tokens": usage.get('completion_tokens', 0),
+                "total_tokens": usage.get('total_tokens', 0)
+            }
+        
+        selected_tables = self.parse_table_response(table_response_obj.content)
+        if candidates:
+            # Re-rank only: never let the LLM pull in tables retrieval didn't propose
+            selected_tables = [table for table in selected_tables if table in candidates] or candidates
+        print(f"[TABLE RETRIEVER] LLM {'re-ranked' if candidates else 'selected'} {selected_tables}")
+        return selected_tables, token_usage
+    
+    def link_schema(self, question: str, filtered_schema: str) -> tuple:
+        """Drop columns irrelevant to the question (keys always stay); returns (schema, stats)"""
+        return prune_schema(filtered_schema, question, self.column_descriptions)
+    
+    def _fit_prompt(self, prompt: ChatPromptTemplate, inputs: Dict) -> tuple:
+        """Trim prompt variables to the model's token budget; returns (inputs, budget report)"""
+        question = inputs.get("question", "")
+        return self.prompt_budget.fit(
+            prompt.messages[0].prompt.template,
+            inputs,
+            shrink_schema=lambda schema, allowed: prune_schema(schema, question, self.column_descriptions, budget=allowed)[0]
+        )
+    
+    def _sql_prompt_inputs(self, question: str, filtered_schema: str, context: str) -> tuple:
+        """Variables for query_prompt, fitted to the token budget; returns (inputs, budget report)"""
+        chat_history = self.memory.get_langchain_messages()
+        return self._fit_prompt(self.query_prompt, {
+            "schema": filtered_schema,
+            "selected_tables_list": ", ".join(self.selected_tables),
+            "question": question,
+            "conversation_context": context,
+            "few_shot_examples": self.few_shot_examples(question),
+            "chat_history": chat_history[-4:] if chat_history else []
+        })
+    
+    @property
+    def example_store(self) -> Optional[ExampleStore]:
+        """Looked up on every use, so invalidating a database's examples reaches connected sessions too"""
+        if self.example_store_lookup is None:
+            return None
+        return self.example_store_lookup()
+
+    def few_shot_examples(self, question: str) -> str:
+        """Nearest successful (question, SQL) pairs for this database, as prompt text"""
+        example_store = self.example_store
+        if example_store is None:
+            return NO_EXAMPLES
+        examples = example_store.search(question)
+        if examples:
+            print(f"[FEW SHOT] {len(examples)} examples (best similarity {examples[0]['similarity']})")
+        return format_examples(examples)
+    
+    def _run_query_prompt(self, prompt_inputs: Dict, on_event: Optional[Callable[[str, Dict], None]] = None) -> tuple:
+        """(model output, token usage or None) for query_prompt; with on_event, emits sql_token as the model writes"""
+        chain = self.query_prompt | self.llm
+        if on_event is None:
+            query_response = chain.invoke(prompt_inputs)
+            if not hasattr(query_response, 'response_metadata'):
+                return query_response.content, None
+            usage = query_response.response_metadata.get('token_usage', {})
+            print(f"SQL generation token usage: {usage}")
+            return query_response.content, {
+                "prompt_tokens": usage.get('prompt_tokens', 0),
+                "completion_tokens": usage.get('completion_tokens', 0),
+                "total_tokens": usage.get('total_tokens', 0)
+            }
+        
+        parts = []
+        token_usage = None
+        for chunk in chain.stream(prompt_inputs):
+            if chunk.content:
+                parts.append(chunk.content)
+                on_event("sql_token", {"text": chunk.content})
+            usage = getattr(chunk, "usage_metadata", None)
+            if usage:
+                token_usage = {
+                    "prompt_tokens": usage.get('input_tokens', 0),
+                    "completion_tokens": usage.get('output_tokens', 0),
+                    "total_tokens": usage.get('total_tokens', 0)
+                }
+        return "".join(parts), token_usage
+    
+    def generate_query(self, question: str, selected_tables: list = None, filtered_schema: str = None, geometry: Optional[dict] = None,
+                       on_event: Optional[Callable[[str, Dict], None]] = None):
+        """Generate SQL query with conversation context. If geometry is provided, PostGIS SQL is generated.
+        
+        on_event(event, data) receives "tables" once the schema is chosen and "sql_token" per model chunk.
+        """
         import json as _json
         context = self.memory.get_context_summary()
         token_usage = {"table_selection": {}, "sql_generation": {}}
+        retrieval_question = question  # Before any spatial instructions are appended
 
         # Inject geometry context into the question so LLM generates PostGIS SQL
         if geometry:
@@ -787,46 +1040,27 @@ Return format: ["TableName1", "TableName2"]"""),
 
 
         if selected_tables is None or filtered_schema is None:
-            table_details = self.get_table_details()
-            table_response_obj = (self.table_prompt | self.llm).invoke({
-                "question": question,
-                "table_details": table_details,
-                "conversation_context": context
-            })
-            
-            # Extract token usage for table selection
-            if hasattr(table_response_obj, 'response_metadata'):
-                usage = table_response_obj.response_metadata.get('token_usage', {})
-                token_usage["table_selection"] = {
-                    "prompt_tokens": usage.get('prompt_tokens', 0),
-                    "completion_tokens": usage.get('completion_tokens', 0),
-                    "total_tokens": usage.get('total_tokens', 0)
-                }
-            
-            selected_tables = self.parse_table_response(table_response_obj.content)
+            selected_tables, token_usage["table_selection"] = self.select_tables(retrieval_question, context)
             filtered_schema = self.get_filtered_schema(selected_tables)
         
-        # Generate SQL with conversation history
-        chat_history = self.memory.get_langchain_messages()
-        query_response = (self.query_prompt | self.llm).invoke({
-            "schema": filtered_schema,
-            "selected_tables_list": ", ".join(self.selected_tables),
-            "question": question,
-            "conversation_context": context,
-            "chat_history": chat_history[-4:] if chat_history else []
-        })
+        # Column-level pruning (spatial prompts keep every column: geometry columns rarely match the wording)
+        if not geometry:
+            filtered_schema, token_usage["schema_linking"] = self.link_schema(retrieval_question, filtered_schema)
         
-        # Extract token usage for SQL generation
-        if hasattr(query_response, 'response_metadata'):
-            usage = query_response.response_metadata.get('token_usage', {})
-            print(f"SQL generation token usage: {usage}")
-            token_usage["sql_generation"] = {
-                "prompt_tokens": usage.get('prompt_tokens', 0),
-                "completion_tokens": usage.get('completion_tokens', 0),
-                "total_tokens": usage.get('total_tokens', 0)
-            }
+        # Generate SQL with conversation history
+        prompt_inputs, token_usage["prompt_budget"] = self._sql_prompt_inputs(question, filtered_schema, context)
+        filtered_schema = prompt_inputs["schema"]
+        if on_event is not None:
+            on_event("tables", {
+                "tables": selected_tables,
+                "schema_token_size": count_tokens(filtered_schema),
+                "schema_tokens_saved": token_usage.get("schema_linking", {}).get("tokens_saved", 0)
+            })
+        content, sql_usage = self._run_query_prompt(prompt_inputs, on_event)
+        if sql_usage is not None:
+            token_usage["sql_generation"] = sql_usage
         
-        final_sql = self._extract_executable_sql(query_response.content)
+        final_sql = self._extract_executable_sql(content)
 
         # Replace __GEOJSON__ placeholder with the real GeoJSON string
         # This guarantees valid JSON with correct double quotes — no LLM escaping bugs!
@@ -845,6 +1079,178 @@ Return format: ["TableName1", "TableName2"]"""),
 
         return self.validate_and_fix_sql(final_sql, filtered_schema), selected_tables, filtered_schema, token_usage
     
+    def _parse_one_shot(self, content: str) -> Optional[Dict]:
+        """JSON object from a one-shot reply, or None"""
+        content = (content or "").replace("```json", "").replace("```", "").strip()
+        start = content.find('{')
+        end = content.rfind('}') + 1
+        if start == -1 or end <= start:
+            return None
+        try:
+            parsed = json.loads(content[start:end])
+        except json.JSONDecodeError:
+            return None
+        return parsed if isinstance(parsed, dict) else None
+    
+    def generate_one_shot(self, question: str) -> tuple:
+        """Intent, tables and SQL from a single LLM call.
+        
+        Returns (response_data, token_usage, fallback_reason); response_data is None when the
+        multi-stage pipeline should take over.
+        """
+        local = self.intent_classifier.decide(question)
+        if local is not None and local.intent != QueryIntent.SQL_QUERY.value:
+            return None, {}, f"local classifier: {local.intent}"
+        
+        # Compact cached schema for the likely tables only
+        candidates = (self.table_retriever.select(question, top_k=ONE_SHOT_MAX_TABLES)
+                      or self._previous_tables()
+                      or self.selected_tables[:ONE_SHOT_MAX_TABLES])
+        schema, _ = self.link_schema(question, self.get_filtered_schema(candidates))
+        chat_history = self.memory.get_langchain_messages()
+        
+        token_usage = {}
+        try:
+            prompt_inputs, _ = self._fit_prompt(self.one_shot_prompt, {
+                "db_description": self.db_description,
+                "schema": schema,
+                "selected_tables_list": ", ".join(self.selected_tables),
+                "conversation_context": self.memory.get_context_summary(),
+                "chat_history": chat_history[-4:] if chat_history else [],
+                "question": question
+            })
+            response_obj = (self.one_shot_prompt | self.llm).invoke(prompt_inputs)
+        except Exception as e:
+            return None, token_usage, f"one-shot call failed: {e}"
+        
+        if hasattr(response_obj, 'response_metadata'):
+            usage = response_obj.response_metadata.get('token_usage', {})
+            token_usage = {
+                "prompt_tokens": usage.get('prompt_tokens', 0),
+                "completion_tokens": usage.get('completion_tokens', 0),
+                "total_tokens": usage.get('total_tokens', 0)
+            }
+        
+        parsed = self._parse_one_shot(response_obj.content)
+        if parsed is None:
+            return None, token_usage, "invalid JSON"
+        
+        intent_str = str(parsed.get("intent", "")).upper()
+        if intent_str != "SQL_QUERY":
+            return None, token_usage, f"one-shot intent: {intent_str or 'missing'}"
+        try:
+            confidence = float(parsed.get("confidence"))
+        except (TypeError, ValueError):
+            return None, token_usage, "missing confidence"
+        if confidence < ONE_SHOT_MIN_CONFIDENCE:
+            return None, token_usage, f"low confidence ({confidence})"
+        
+        sql_query = self._extract_executable_sql(parsed.get("sql") or "")
+        if not re.match(r"^\s*(SELECT|WITH)\b", sql_query, flags=re.IGNORECASE):
+            return None, token_usage, "no SELECT statement"
+        
+        known_tables = {table.lower(): table for table in self.table_retriever.tables}
+        selected_tables = [known_tables[t.lower()] for t in parsed.get("tables") or [] if isinstance(t, str) and t.lower() in known_tables]
+        selected_tables = selected_tables or candidates
+        filtered_schema, linking = self.link_schema(question, self.get_filtered_schema(selected_tables))
+        
+        no_tokens = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        response_data = {
+            "status": "success",
+            "intent": "sql_query",
+            "sql_query": self.validate_and_fix_sql(sql_query, filtered_schema),
+            "filtered_tables": selected_tables,
+            "filtered_schema": filtered_schema,
+            "schema_token_size": count_tokens(filtered_schema),
+            "schema_tokens_saved": linking["tokens_saved"],
+            "intent_decided_by": "one_shot",
+            "intent_confidence": confidence,
+            "llm_token_usage": {
+                "one_shot": token_usage,
+                "intent_classification": no_tokens,
+                "table_selection": no_tokens,
+                "sql_generation": no_tokens,
+                "total_tokens_used": token_usage.get('total_tokens', 0)
+            }
+        }
+        return response_data, token_usage, None
+    
+    def _start_speculation(self, question: str) -> Optional[Future]:
+        """Select tables (and generate SQL if the budget allows) while the LLM is still classifying intent"""
+        from utils.concurrency import submit_blocking
+        if self.speculative_token_budget <= 0:
+            return None
+        
+        def speculate():
+            context = self.memory.get_context_summary()
+            selected_tables, table_tokens = self.select_tables(question, context)
+            filtered_schema = self.get_filtered_schema(selected_tables)
+            result = {
+                "selected_tables": selected_tables,
+                "filtered_schema": filtered_schema,
+                "table_selection": table_tokens,
+                "generated": None
+            }
+            
+            spent = table_tokens.get('total_tokens', 0)
+            estimated_sql_tokens = self._query_prompt_tokens + count_tokens(filtered_schema) + count_tokens(context) + count_tokens(question)
+            if SPECULATIVE_SQL and spent + estimated_sql_tokens <= self.speculative_token_budget:
+                sql_query, _, linked_schema, gen_tokens = self.generate_query(question, selected_tables=selected_tables, filtered_schema=filtered_schema)
+                result["generated"] = (sql_query, linked_schema, gen_tokens)
+            return result
+        
+        # Shared worker pool and tenant limit; a tenant already at its limit simply doesn't speculate
+        speculation = submit_blocking(speculate, tenant_id=self.tenant_id)
+        if speculation is None:
+            print("[SPECULATION] Skipped: no free worker slot for this tenant")
+        return speculation
+    
+    def _discard_speculation(self, speculation: Future):
+        """Drop speculative work for a non-SQL intent (logs what it cost once it finishes)"""
+        if speculation.cancel():
+            return
+        
+        def log_waste(future: Future):
+            if future.cancelled() or future.exception() is not None:
+                return
+            result = future.result()
+            wasted = result["table_selection"].get('total_tokens', 0)
+            if result["generated"]:
+                wasted += result["generated"][2].get('sql_generation', {}).get('total_tokens', 0)
+            print(f"[SPECULATION] Discarded speculative work ({wasted} tokens)")
+        
+        speculation.add_done_callback(log_waste)
+    
+    def _generate_with_speculation(self, question: str, speculation: Optional[Future],
+                                   on_event: Optional[Callable[[str, Dict], None]] = None) -> tuple:
+        """generate_query(question), reusing whatever speculative work already produced"""
+        result = None
+        # Still queued behind other work: run it here instead of waiting on a worker slot
+        if speculation is not None and not speculation.cancel():
+            try:
+                result = speculation.result()
+            except Exception as e:
+                print(f"[SPECULATION] Speculative work failed, regenerating: {e}")
+        if result is None:
+            return self.generate_query(question, on_event=on_event)
+        
+        if result["generated"]:
+            sql_query, linked_schema, gen_tokens = result["generated"]
+            gen_tokens["table_selection"] = result["table_selection"]
+            if on_event is not None:
+                on_event("tables", {
+                    "tables": result["selected_tables"],
+                    "schema_token_size": count_tokens(linked_schema),
+                    "schema_tokens_saved": gen_tokens.get("schema_linking", {}).get("tokens_saved", 0)
+                })
+            return sql_query, result["selected_tables"], linked_schema, gen_tokens
+        
+        sql_query, selected_tables, filtered_schema, gen_tokens = self.generate_query(
+            question, selected_tables=result["selected_tables"], filtered_schema=result["filtered_schema"], on_event=on_event
+        )
+        gen_tokens["table_selection"] = result["table_selection"]
+        return sql_query, selected_tables, filtered_schema, gen_tokens
+    
     def _build_spatial_sql(self, raw_sql: str, geometry: dict) -> str:
         """Post-process spatial SQL: replace __GEOJSON__ placeholder, clean and format."""
         import re as _re
@@ -870,29 +1276,197 @@ Return format: ["TableName1", "TableName2"]"""),
             sql = sql + ';'
         return sql
 
-    def process_query(self, question: str, geometry: dict = None):
+    @property
+    def question_cache(self) -> Optional[QuestionCache]:
+        """Looked up on every use, so invalidating a database's cache reaches connected sessions too"""
+        if self.question_cache_key is None:
+            return None
+        return get_question_cache(*self.question_cache_key, replace=False)
+
+    def _remember_generated(self, question: str, sql_query: str, filtered_tables: list, filtered_schema: str):
+        """Keep generated SQL until /execute-sql reports whether it ran - only then is it cached"""
+        key = normalize_question(question)
+        self._generated_sql.pop(key, None)
+        self._generated_sql[key] = {
+            "question": question,
+            "sql_query": sql_query,
+            "filtered_tables": filtered_tables,
+            "filtered_schema": filtered_schema,
+            "cacheable": self._question_cacheable(question)
+        }
+        while len(self._generated_sql) > GENERATED_SQL_HISTORY:
+            self._generated_sql.popitem(last=False)
+
+    def _generated_entry(self, question: str, sql_query: str) -> Optional[Dict]:
+        from database.result_cache import normalize_sql
+        entry = self._generated_sql.get(normalize_question(question))
+        if entry is None or normalize_sql(entry["sql_query"]) != normalize_sql(sql_query):
+            return None
+        return entry
+
+    def question_for_sql(self, sql_query: str) -> Optional[str]:
+        """Question this session most recently generated sql_query for (clients may send only the SQL)"""
+        from database.result_cache import normalize_sql
+        wanted = normalize_sql(sql_query)
+        for entry in reversed(self._generated_sql.values()):
+            if normalize_sql(entry["sql_query"]) == wanted:
+                return entry["question"]
+        return None
+
+    def confirm_generated_sql(self, question: str, sql_query: str, final_query: str) -> bool:
+        """
+        sql_query ran (as final_query, after any repairs). True when this session generated it for
+        the question; the question cache then serves final_query for it.
+        """
+        entry = self._generated_entry(question, sql_query)
+        if entry is None:
+            return False
+        cache = self.question_cache
+        if entry["cacheable"] and cache is not None:
+            cache.put(question, {
+                "sql_query": final_query,
+                "filtered_tables": entry["filtered_tables"],
+                "filtered_schema": entry["filtered_schema"]
+            })
+        return True
+
+    def reject_generated_sql(self, question: str, sql_query: str):
+        """Generated SQL failed to run: drop it from the question cache if it was served from there"""
+        entry = self._generated_entry(question, sql_query)
+        cache = self.question_cache
+        if entry is not None and cache is not None and cache.discard(question, entry["sql_query"]):
+            print("[QUESTION CACHE] Dropped cached SQL that failed to run")
+
+    def _question_cacheable(self, question: str) -> bool:
+        """Follow-ups that lean on earlier messages can't be answered from the cache"""
+        if self.question_cache_key is None:
+            return False
+        has_history = len(self.memory.messages) > 1  # The current question is already in memory
+        return not (has_history and is_context_dependent(question))
+    
+    def _cached_sql_response(self, question: str) -> Optional[Dict]:
+        """Serve a repeated (or near-identical) question without any LLM round trip"""
+        if not self._question_cacheable(question):
+            return None
+        cache = self.question_cache
+        cached = cache.lookup(question) if cache is not None else None
+        if cached is None:
+            return None
+        print(f"[QUESTION CACHE] {cached['match']} hit (similarity {cached['similarity']})")
+        self._remember_generated(question, cached["sql_query"], cached["filtered_tables"], cached["filtered_schema"])
+        
+        no_tokens = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        self.memory.add_message("assistant", "Generated SQL query", {
+            "intent": "sql_query",
+            "tables_used": cached["filtered_tables"],
+            "sql": cached["sql_query"]
+        })
+        return {
+            "status": "success",
+            "intent": "sql_query",
+            "sql_query": cached["sql_query"],
+            "filtered_tables": cached["filtered_tables"],
+            "filtered_schema": cached["filtered_schema"],
+            "schema_token_size": count_tokens(cached["filtered_schema"]),
+            "conversation_token_estimate": self.memory.get_token_estimate(),
+            "question_cache": {"hit": True, "match": cached["match"], "similarity": cached["similarity"]},
+            "intent_decided_by": "question_cache",
+            "intent_confidence": None,
+            "llm_token_usage": {
+                "intent_classification": no_tokens,
+                "table_selection": no_tokens,
+                "sql_generation": no_tokens,
+                "total_tokens_used": 0
+            }
+        }
+    
+    @staticmethod
+    def _emit_answer(on_event: Optional[Callable[[str, Dict], None]], response_data: Dict):
+        """Final sql / response event for a streaming caller"""
+        if on_event is None:
+            return
+        if response_data.get("sql_query"):
+            on_event("sql", {"sql_query": response_data["sql_query"], "question_cache": response_data.get("question_cache")})
+        elif response_data.get("response"):
+            on_event("response", {"response": response_data["response"]})
+    
+    def process_query(self, question: str, geometry: dict = None, mode: str = "pipeline",
+                      on_event: Optional[Callable[[str, Dict], None]] = None):
         """Main function: process query with conversation memory.
         
         Args:
             question: Natural language question from the user.
             geometry: Optional GeoJSON geometry dict (Point, Polygon, etc.).
                       If provided, the pipeline automatically routes to SQL_SPATIAL.
+            mode: "pipeline" (intent -> tables -> SQL) or "one_shot" (single combined LLM call,
+                  falling back to the pipeline when its output is unusable).
+            on_event: Optional callback for streaming clients, called with (event, data) as each
+                      stage finishes: intent, tables, sql_token (one per model chunk), then sql or response.
         """
+        started = time.perf_counter()
+        emit = on_event or (lambda event, data: None)
         try:
             # Add user question to memory
             self.memory.add_message("user", question)
 
+            if not geometry:
+                cached_response = self._cached_sql_response(question)
+                if cached_response:
+                    emit("intent", {"intent": "sql_query", "intent_decided_by": "question_cache", "intent_confidence": None})
+                    emit("tables", {"tables": cached_response["filtered_tables"], "schema_token_size": cached_response["schema_token_size"]})
+                    self._emit_answer(on_event, cached_response)
+                    cached_response["processing_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                    return cached_response
+
+            one_shot_tokens, one_shot_fallback = None, None
+            speculation = None
+
             # If geometry is explicitly provided, skip LLM intent check and go spatial directly
             if geometry:
                 intent = QueryIntent.SQL_SPATIAL
                 intent_tokens = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+                intent_decision = {"intent_decided_by": "geometry", "intent_confidence": 1.0}
                 print("[SPATIAL] Geometry provided — forcing SQL_SPATIAL intent (skipping LLM intent call)")
             else:
-                # Classify intent via LLM
-                intent, intent_tokens = self.classify_intent(question)
+                if mode == "one_shot":
+                    one_shot_response, one_shot_tokens, one_shot_fallback = self.generate_one_shot(question)
+                    if one_shot_response is not None:
+                        one_shot_response["conversation_token_estimate"] = self.memory.get_token_estimate()
+                        self.memory.add_message("assistant", "Generated SQL query", {
+                            "intent": "sql_query",
+                            "tables_used": one_shot_response["filtered_tables"],
+                            "sql": one_shot_response["sql_query"]
+                        })
+                        self._remember_generated(
+                            question, one_shot_response["sql_query"],
+                            one_shot_response["filtered_tables"], one_shot_response["filtered_schema"]
+                        )
+                        one_shot_response["generation_mode"] = "one_shot"
+                        emit("intent", {
+                            "intent": one_shot_response["intent"],
+                            "intent_decided_by": one_shot_response.get("intent_decided_by"),
+                            "intent_confidence": one_shot_response.get("intent_confidence")
+                        })
+                        emit("tables", {
+                            "tables": one_shot_response["filtered_tables"],
+                            "schema_token_size": one_shot_response.get("schema_token_size")
+                        })
+                        self._emit_answer(on_event, one_shot_response)
+                        one_shot_response["processing_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                        return one_shot_response
+                    print(f"[ONE SHOT] Falling back to pipeline: {one_shot_fallback}")
+
+                # Only worth speculating when the intent has to come from the LLM
+                if self.speculative_token_budget > 0 and self.intent_classifier.decide(question) is None:
+                    speculation = self._start_speculation(question)
+
+                # Classify intent locally, falling back to the LLM
+                intent, intent_tokens, intent_decision = self.decide_intent(question)
                 print(f"Detected intent: {intent.value}")
+            emit("intent", {"intent": intent.value, **intent_decision})
 
             response_data = None
+            speculation_used = False
             total_tokens_used = intent_tokens.get('total_tokens', 0)
 
             # ── SPATIAL SQL BRANCH ────────────────────────────────────────────────────
@@ -900,7 +1474,8 @@ Return format: ["TableName1", "TableName2"]"""),
                 # generate_query already handles geo_instruction injection + __GEOJSON__ replacement
                 sql_query, selected_tables, filtered_schema, gen_tokens = self.generate_query(
                     question=question,
-                    geometry=geometry
+                    geometry=geometry,
+                    on_event=on_event
                 )
 
                 table_tokens = gen_tokens.get('table_selection', {}).get('total_tokens', 0)
@@ -946,7 +1521,7 @@ Return format: ["TableName1", "TableName2"]"""),
                     "sql_query_clean": sql_clean_final,     # display (Swagger)
                     "sql_query_pgadmin": sql_strict_final,  # alias kept for backward compat
                     "filtered_tables": selected_tables,
-                    "schema_token_size": len(filtered_schema.split()),
+                    "schema_token_size": count_tokens(filtered_schema),
                     "note": "Use 'sql_query' / 'sql_query_pgadmin' for execution. 'sql_query_clean' is for easy reading.",
                     "conversation_token_estimate": self.memory.get_token_estimate(),
                     "llm_token_usage": {
@@ -959,12 +1534,14 @@ Return format: ["TableName1", "TableName2"]"""),
 
                 self.memory.add_message("assistant", "Generated spatial SQL query", {
                     "intent": "sql_spatial",
-                    "tables_used": selected_tables
+                    "tables_used": selected_tables,
+                    "sql": sql_clean_final
                 })
 
             # ── STANDARD SQL BRANCH ───────────────────────────────────────────────────
             elif intent == QueryIntent.SQL_QUERY:
-                sql_query, selected_tables, filtered_schema, gen_tokens = self.generate_query(question)
+                sql_query, selected_tables, filtered_schema, gen_tokens = self._generate_with_speculation(question, speculation, on_event)
+                speculation_used = speculation is not None
 
                 table_tokens = gen_tokens.get('table_selection', {}).get('total_tokens', 0)
                 sql_tokens = gen_tokens.get('sql_generation', {}).get('total_tokens', 0)
@@ -976,21 +1553,26 @@ Return format: ["TableName1", "TableName2"]"""),
                     "sql_query": sql_query,
                     "filtered_tables": selected_tables,
                     "filtered_schema": filtered_schema,
-                    "schema_token_size": len(filtered_schema.split()),
+                    "schema_token_size": count_tokens(filtered_schema),
+                    "schema_tokens_saved": gen_tokens.get('schema_linking', {}).get('tokens_saved', 0),
                     "conversation_token_estimate": self.memory.get_token_estimate(),
                     "llm_token_usage": {
                         "intent_classification": intent_tokens,
                         "table_selection": gen_tokens.get('table_selection', {}),
                         "sql_generation": gen_tokens.get('sql_generation', {}),
+                        "sql_generation_prompt": gen_tokens.get('prompt_budget'),
                         "total_tokens_used": total_tokens_used
                     }
                 }
 
                 self.memory.add_message("assistant", "Generated SQL query", {
                     "intent": "sql_query",
-                    "tables_used": selected_tables
+                    "tables_used": selected_tables,
+                    "sql": sql_query
                 })
 
+                self._remember_generated(question, sql_query, selected_tables, filtered_schema)
+
             # ── CASUAL CHAT ───────────────────────────────────────────────────────────
             elif intent == QueryIntent.CASUAL_CHAT:
                 result = self.handle_casual_chat(question)
@@ -1036,7 +1618,8 @@ Return format: ["TableName1", "TableName2"]"""),
             # ── AMBIGUOUS ─────────────────────────────────────────────────────────────
             else:
                 try:
-                    sql_query, selected_tables, filtered_schema, gen_tokens = self.generate_query(question)
+                    sql_query, selected_tables, filtered_schema, gen_tokens = self._generate_with_speculation(question, speculation, on_event)
+                    speculation_used = speculation is not None
                     table_tokens = gen_tokens.get('table_selection', {}).get('total_tokens', 0)
                     sql_tokens = gen_tokens.get('sql_generation', {}).get('total_tokens', 0)
                     total_tokens_used += table_tokens + sql_tokens
@@ -1046,6 +1629,7 @@ Return format: ["TableName1", "TableName2"]"""),
                         "intent": "sql_query",
                         "sql_query": sql_query,
                         "filtered_schema": filtered_schema,
+                        "schema_tokens_saved": gen_tokens.get('schema_linking', {}).get('tokens_saved', 0),
                         "note": "Intent was ambiguous, attempted SQL generation",
                         "conversation_token_estimate": self.memory.get_token_estimate(),
                         "llm_token_usage": {
@@ -1056,7 +1640,8 @@ Return format: ["TableName1", "TableName2"]"""),
                         }
                     }
                     self.memory.add_message("assistant", "Generated SQL from ambiguous query", {
-                        "intent": "ambiguous_sql"
+                        "intent": "ambiguous_sql",
+                        "sql": sql_query
                     })
                 except Exception as e:
                     response_msg = "Your question is unclear. Please rephrase your question."
@@ -1072,6 +1657,19 @@ Return format: ["TableName1", "TableName2"]"""),
                     }
                     self.memory.add_message("assistant", response_msg, {"intent": "ambiguous_error"})
 
+            response_data.update(intent_decision)
+            response_data["generation_mode"] = "pipeline"
+            if speculation is not None:
+                if not speculation_used:
+                    self._discard_speculation(speculation)
+                response_data["speculation"] = {"started": True, "used": speculation_used}
+            if one_shot_tokens is not None:
+                # Report what the failed one-shot attempt cost on top of the pipeline
+                response_data["one_shot_fallback"] = one_shot_fallback
+                response_data["llm_token_usage"]["one_shot"] = one_shot_tokens
+                response_data["llm_token_usage"]["total_tokens_used"] += one_shot_tokens.get('total_tokens', 0)
+            response_data["processing_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            self._emit_answer(on_event, response_data)
             return response_data
 
         except Exception as e:
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from .text_similarity import cosine, term_vector, tokenize
+
+# Question -> SQL cache (per database, per worker process)
+QUESTION_CACHE_ENABLED = os.getenv("QUESTION_CACHE_ENABLED", "true").lower() == "true"
+QUESTION_CACHE_MAX_ENTRIES = int(os.getenv("QUESTION_CACHE_MAX_ENTRIES", "500"))
+QUESTION_CACHE_TTL_SECONDS = float(os.getenv("QUESTION_CACHE_TTL_SECONDS", "3600"))
+QUESTION_CACHE_SIMILARITY = float(os.getenv("QUESTION_CACHE_SIMILARITY", "0.9"))  # Cosine threshold for near matches
+
+# Follow-ups like "and for last month?" depend on the conversation, not just the text
+_CONTEXT_DEPENDENT_PATTERN = re.compile(
+    r"\b(it|its|they|them|their|those|these|that one|same|previous|above|earlier|instead|again|also|"
+    r"what about|how about|only the|now|then)\b|^\s*(and|but|or)\b",
+    re.IGNORECASE,
+)
+# Numbers and quoted values must match exactly for a near match ("top 5" != "top 10")
+_LITERAL_PATTERN = re.compile(r"'[^']*'|\"[^\"]*\"|\b\d+(?:\.\d+)?\b")
+
+
+def normalize_question(question: str) -> str:
+    cleaned = re.sub(r"[^\w\s'\".-]", " ", question.lower())
+    return re.sub(r"\s+", " ", cleaned).strip(" .?")
+
+
+def is_context_dependent(question: str) -> bool:
+    return bool(_CONTEXT_DEPENDENT_PATTERN.search(question))
+
+
+def schema_fingerprint(schema: Optional[Dict], description: Optional[Dict], selected_tables: Optional[list]) -> str:
+    """Changes whenever Database.schema / description / selected_tables change"""
+    payload = json.dumps([schema or {}, description or {}, selected_tables or []], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def _literals(question: str) -> Tuple[str, ...]:
+    return tuple(sorted(_LITERAL_PATTERN.findall(question.lower())))
+
+
+class QuestionCache:
+    """
+    LRU + TTL map of normalized question -> generated SQL for one database.
+    Exact matches are a dict lookup; near matches use cosine similarity over sparse
+    term vectors, with an inverted index so only questions sharing a term are scored.
+    """
+
+    def __init__(self, fingerprint: str, max_entries: int = QUESTION_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = QUESTION_CACHE_TTL_SECONDS, similarity: float = QUESTION_CACHE_SIMILARITY):
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._index: Dict[str, Set[str]] = {}  # term -> normalized questions containing it
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def _remove_locked(self, key: str):
+        entry = self._entries.pop(key)
+        for term in entry["vector"]:
+            keys = self._index.get(term)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[term]
+
+    def _expired(self, entry: Dict) -> bool:
+        return entry["expires_at"] < time.monotonic()
+
+    def lookup(self, question: str) -> Optional[Dict]:
+        """Cached result for a question (exact or near match), or None"""
+        key = normalize_question(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return {**entry["result"], "match": "exact", "similarity": 1.0}
+            if entry is not None:
+                self._remove_locked(key)
+
+            vector = term_vector(tokenize(key))
+            literals = _literals(question)
+            candidates = set()
+            for term in vector:
+                candidates.update(self._index.get(term, ()))
+
+            best_key, best_score = None, 0.0
+            for candidate in candidates:
+                candidate_entry = self._entries[candidate]
+                if candidate_entry["literals"] != literals or self._expired(candidate_entry):
+                    continue
+                score = cosine(vector, candidate_entry["vector"])
+                if score > best_score:
+                    best_key, best_score = candidate, score
+
+            if best_key is not None and best_score >= self.similarity:
+                self._entries.move_to_end(best_key)
+                self.hits += 1
+                self.near_hits += 1
+                return {**self._entries[best_key]["result"], "match": "similar", "similarity": round(best_score, 4)}
+
+            self.misses += 1
+            return None
+
+    def put(self, question: str, result: Dict):
+        if self.max_entries <= 0 or self.ttl_seconds <= 0:
+            return
+        key = normalize_question(question)
+        vector = term_vector(tokenize(key))
+        with self._lock:
+            if key in self._entries:
+                self._remove_locked(key)
+            self._entries[key] = {
+                "result": result,
+                "vector": vector,
+                "literals": _literals(question),
+                "expires_at": time.monotonic() + self.ttl_seconds
+            }
+            for term in vector:
+                self._index.setdefault(term, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove_locked(next(iter(self._entries)))
+
+    def discard(self, question: str, sql_query: Optional[str] = None) -> bool:
+        """Drop a question's entry (only if it still maps to sql_query, when given)"""
+        key = normalize_question(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (sql_query is not None and entry["result"]["sql_query"] != sql_query):
+                return False
+            self._remove_locked(key)
+            return True
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses
+            }
+
+
+# Database.id -> cache; replaced when the schema fingerprint changes
+_caches: Dict[int, QuestionCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_question_cache(database_id: int, fingerprint: str, replace: bool = True) -> Optional[QuestionCache]:
+    """
+    Cache for a database's current schema. With replace=False a cache built for another
+    fingerprint is left alone and None is returned (the caller's schema is out of date).
+    """
+    if not QUESTION_CACHE_ENABLED:
+        return None
+    with _caches_lock:
+        cache = _caches.get(database_id)
+        if cache is not None and cache.fingerprint != fingerprint and not replace:
+            return None
+        if cache is None or cache.fingerprint != fingerprint:
+            cache = QuestionCache(fingerprint)
+            _caches[database_id] = cache
+        return cache
+
+
+def invalidate_question_cache(database_id: int):
+    with _caches_lock:
+        _caches.pop(database_id, None)
+
+
+def get_question_cache_stats() -> Dict[int, Dict]:
+    with _caches_lock:
+        caches = dict(_caches)
+    return {database_id: cache.stats() for database_id, cache in caches.items()}
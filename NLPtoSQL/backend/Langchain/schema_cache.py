@@ -0,0 +1,47 @@
+import threading
+from typing import Callable, Dict, List, Optional
+
+
+class TableDDLCache:
+    """
+    Per-table CREATE TABLE text used to build prompt schemas.
+    Seeded from Database.schema_ddl; misses are reflected live once and handed to
+    the persist callback so the next session starts warm.
+    """
+
+    def __init__(self, entries: Optional[Dict[str, str]] = None, persist: Optional[Callable[[Dict[str, str]], None]] = None):
+        self._entries: Dict[str, str] = dict(entries or {})
+        self._persist = persist
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, tables: List[str], reflect: Callable[[List[str]], Dict[str, str]]) -> Dict[str, str]:
+        """DDL for each table, reflecting (and persisting) only the ones not cached yet"""
+        with self._lock:
+            found = {table: self._entries[table] for table in tables if table in self._entries}
+            self.hits += len(found)
+        missing = [table for table in tables if table not in found]
+        if not missing:
+            return found
+
+        reflected = reflect(missing)
+        with self._lock:
+            self.misses += len(missing)
+            self._entries.update(reflected)
+        found.update(reflected)
+
+        if reflected and self._persist is not None:
+            try:
+                self._persist(reflected)
+            except Exception as e:
+                print(f"[SCHEMA CACHE] Failed to persist DDL for {list(reflected)}: {e}")
+        return found
+
+    def replace(self, entries: Dict[str, str]):
+        with self._lock:
+            self._entries = dict(entries)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"tables": len(self._entries), "hits": self.hits, "misses": self.misses}
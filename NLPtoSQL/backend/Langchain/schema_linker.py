@@ -0,0 +1,143 @@
+import os
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+from .text_similarity import split_identifier, stem, tokenize
+from .token_budget import count_tokens
+
+# Column-level schema pruning for the SQL generation prompt
+SCHEMA_LINKING_ENABLED = os.getenv("SCHEMA_LINKING_ENABLED", "true").lower() == "true"
+SCHEMA_TOKEN_BUDGET = int(os.getenv("SCHEMA_TOKEN_BUDGET", "1500"))  # Tokens of CREATE TABLE text sent to the model
+SCHEMA_MIN_COLUMNS_PER_TABLE = int(os.getenv("SCHEMA_MIN_COLUMNS_PER_TABLE", "3"))  # Kept even when nothing matches
+
+_TABLE_SPLIT_PATTERN = re.compile(r"(?=^CREATE TABLE )", re.MULTILINE)
+_CONSTRAINT_PATTERN = re.compile(r"^\s*(PRIMARY KEY|FOREIGN KEY|UNIQUE|CONSTRAINT|CHECK|INDEX|KEY)\b", re.IGNORECASE)
+_COLUMN_NAME_PATTERN = re.compile(r'^\s*("[^"]+"|`[^`]+`|\[[^\]]+\]|\S+)')
+_KEY_COLUMNS_PATTERN = re.compile(r"\b(?:PRIMARY KEY|FOREIGN KEY)\s*\(([^)]*)\)", re.IGNORECASE)
+
+
+def _unquote(name: str) -> str:
+    return name.strip().strip('"`[]')
+
+
+def _column_terms(name: str) -> Set[str]:
+    return {stem(part) for part in split_identifier(name)}
+
+
+class _TableDDL:
+    """CREATE TABLE text split into column lines, constraint lines and surrounding text"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.name = ""
+        self.head = ""
+        self.columns: List[Tuple[str, str]] = []  # (column name, line)
+        self.constraints: List[str] = []
+        self.tail = ""
+        self.parsed = self._parse()
+
+    def _parse(self) -> bool:
+        open_at = self.text.find("(")
+        close_at = self.text.rfind("\n)")
+        if not self.text.startswith("CREATE TABLE") or open_at == -1 or close_at < open_at:
+            return False
+        self.name = _unquote(self.text[len("CREATE TABLE"):open_at])
+        self.head = self.text[:open_at + 1]
+        self.tail = self.text[close_at:]
+        for line in self.text[open_at + 1:close_at].split("\n"):
+            line = line.rstrip().rstrip(",").rstrip()
+            if not line.strip():
+                continue
+            if _CONSTRAINT_PATTERN.match(line):
+                self.constraints.append(line)
+                continue
+            match = _COLUMN_NAME_PATTERN.match(line)
+            if match:
+                self.columns.append((_unquote(match.group(1)), line))
+        return bool(self.columns)
+
+    def key_columns(self) -> Set[str]:
+        keys = set()
+        for constraint in self.constraints:
+            for group in _KEY_COLUMNS_PATTERN.findall(constraint):
+                keys.update(_unquote(part) for part in group.split(","))
+        for name, line in self.columns:
+            lowered = name.lower()
+            if "PRIMARY KEY" in line.upper() or "REFERENCES" in line.upper() or lowered == "id" or lowered.endswith("_id") or name.endswith("ID"):
+                keys.add(name)
+        return keys
+
+    def render(self, keep: Set[str]) -> str:
+        lines = [line for name, line in self.columns if name in keep] + self.constraints
+        return self.head + "\n" + ", \n".join(lines) + self.tail
+
+
+def _score_column(name: str, description: str, question_terms: Set[str], question_text: str) -> float:
+    score = 2.0 * len(_column_terms(name) & question_terms)
+    if name.lower() in question_text:
+        score += 2.0
+    if description:
+        score += 0.5 * len({stem(token) for token in tokenize(description)} & question_terms)
+    return score
+
+
+def prune_schema(schema: str, question: str, column_descriptions: Optional[Dict[str, Dict[str, str]]] = None,
+                 budget: int = SCHEMA_TOKEN_BUDGET) -> Tuple[str, Dict]:
+    """
+    Keep keys / foreign keys of every table plus the columns that score best against the
+    question, within a token budget. Text that isn't CREATE TABLE DDL passes through untouched.
+    Returns (schema, stats) where stats reports tokens before / after / saved.
+    """
+    tokens_before = count_tokens(schema)
+    stats = {"tokens_before": tokens_before, "tokens_after": tokens_before, "tokens_saved": 0, "columns_dropped": 0}
+    if not SCHEMA_LINKING_ENABLED or tokens_before <= budget:
+        return schema, stats
+
+    blocks = [_TableDDL(block.strip("\n")) for block in _TABLE_SPLIT_PATTERN.split(schema) if block.strip()]
+    tables = [block for block in blocks if block.parsed]
+    if not tables:
+        return schema, stats
+
+    question_text = question.lower()
+    question_terms = {stem(token) for token in tokenize(question)}
+    column_descriptions = column_descriptions or {}
+
+    keep: Dict[int, Set[str]] = {}
+    candidates = []  # (score, table position, column position, column name, line)
+    for table_index, table in enumerate(tables):
+        keys = table.key_columns()
+        keep[table_index] = set(keys)
+        descriptions = column_descriptions.get(table.name) or {}
+        for column_index, (name, line) in enumerate(table.columns):
+            if name in keys:
+                continue
+            score = _score_column(name, str(descriptions.get(name) or ""), question_terms, question_text)
+            candidates.append((score, table_index, column_index, name, line))
+
+    # Every table keeps a few columns so the model still sees what it holds
+    for table_index, table in enumerate(tables):
+        ranked = sorted((c for c in candidates if c[1] == table_index), key=lambda c: (-c[0], c[2]))
+        for candidate in ranked[:max(0, SCHEMA_MIN_COLUMNS_PER_TABLE - len(keep[table_index]))]:
+            keep[table_index].add(candidate[3])
+
+    used = count_tokens("\n\n".join(table.render(keep[i]) for i, table in enumerate(tables)))
+    for score, table_index, _, name, line in sorted(candidates, key=lambda c: (-c[0], c[1], c[2])):
+        if name in keep[table_index]:
+            continue
+        cost = count_tokens(line) + 1
+        if used + cost > budget:
+            break  # Strictly by score: a cheaper, less relevant column never displaces a better one
+        keep[table_index].add(name)
+        used += cost
+
+    rendered = iter(table.render(keep[i]) for i, table in enumerate(tables))
+    parts = [next(rendered) if block.parsed else block.text for block in blocks]
+    pruned = "\n\n".join(parts)
+
+    tokens_after = count_tokens(pruned)
+    stats.update({
+        "tokens_after": tokens_after,
+        "tokens_saved": max(0, tokens_before - tokens_after),
+        "columns_dropped": sum(len(table.columns) - len(keep[i]) for i, table in enumerate(tables))
+    })
+    return pruned, stats
@@ -0,0 +1,53 @@
+import re
+from functools import lru_cache
+from typing import Dict
+
+# Every word followed by whitespace in the schema text: table / column names (plus DDL keywords and types)
+_SCHEMA_WORD_PATTERN = re.compile(r"\b([a-zA-Z_][a-zA-Z0-9_]*)\s+")
+
+# One scan over the SQL: literals, quoted identifiers and comments are copied as-is
+_SQL_TOKEN_PATTERN = re.compile(
+    r"(?P<skip>'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\]|--[^\n]*|/\*.*?\*/)"
+    r"|(?P<chain>\w+(?:\.\w+)+)"
+    r"|(?P<word>\w+)",
+    re.DOTALL,
+)
+
+
+@lru_cache(maxsize=32)
+def identifier_map(schema: str) -> Dict[str, str]:
+    """lowercase -> schema casing, built once per schema text"""
+    return {word.lower(): word for word in _SCHEMA_WORD_PATTERN.findall(schema)}
+
+
+def _fix_qualification(parts: list) -> list:
+    """Drop the extra part of a three-part column reference"""
+    if len(parts) != 3:
+        return parts
+    first, middle, last = parts
+    if len(middle) == 1 and middle.isalpha():
+        return [middle, last]   # crm_customer.c.id -> c.id
+    if len(first) == 1 and first.isalpha():
+        return [first, last]    # c.crm_customer.id -> c.id
+    if first.lower() == middle.lower():
+        return [first, last]    # orders.orders.id -> orders.id
+    return parts
+
+
+def fix_identifiers(sql_query: str, schema: str = "") -> str:
+    """
+    Single pass over the SQL: collapse double-qualified column references and restore the
+    schema's casing of identifiers with a hash lookup per word.
+    """
+    casing = identifier_map(schema) if schema else {}
+
+    def replace(match) -> str:
+        if match.lastgroup == "skip":
+            return match.group()
+        if match.lastgroup == "chain":
+            parts = _fix_qualification(match.group().split("."))
+            return ".".join(casing.get(part.lower(), part) for part in parts)
+        word = match.group()
+        return casing.get(word.lower(), word)
+
+    return _SQL_TOKEN_PATTERN.sub(replace, sql_query)
@@ -0,0 +1,159 @@
+import difflib
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Optional dependency: SQL parsing for the local repair stage
+try:
+    import sqlglot
+    from sqlglot import exp
+except ImportError:
+    sqlglot = None
+    print("WARNING: sqlglot not installed, failed queries go straight to the LLM fix (no local repair)")
+
+# Deterministic repair tried before asking the LLM to fix a failed query
+SQL_LOCAL_REPAIR_ENABLED = os.getenv("SQL_LOCAL_REPAIR_ENABLED", "true").lower() == "true"
+SQL_REPAIR_NAME_CUTOFF = float(os.getenv("SQL_REPAIR_NAME_CUTOFF", "0.85"))  # difflib ratio for "close" identifiers
+
+_DIALECTS = {"postgres": "postgres", "mysql": "mysql", "mssql": "tsql"}
+_PLAIN_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _squash(name: str) -> str:
+    """Order Date / order_date / OrderDate -> orderdate"""
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def _match_name(name: str, candidates: List[str]) -> Optional[str]:
+    """Exact, case-insensitive, separator-insensitive, then a single close match"""
+    if name in candidates:
+        return name
+    for compare in (str.lower, _squash):
+        matches = [candidate for candidate in candidates if compare(candidate) == compare(name)]
+        if len(matches) == 1:
+            return matches[0]
+    by_squashed = {}
+    for candidate in candidates:
+        by_squashed.setdefault(_squash(candidate), []).append(candidate)
+    close = difflib.get_close_matches(_squash(name), list(by_squashed), n=2, cutoff=SQL_REPAIR_NAME_CUTOFF)
+    if len(close) == 1 and len(by_squashed[close[0]]) == 1:
+        return by_squashed[close[0]][0]
+    return None
+
+
+def _needs_quotes(name: str, provider: str) -> bool:
+    # Postgres folds unquoted identifiers to lower case
+    return not _PLAIN_IDENTIFIER.match(name) or (provider == "postgres" and name != name.lower())
+
+
+def _identifier(name: str, provider: str, quoted: bool):
+    return exp.to_identifier(name, quoted=quoted or _needs_quotes(name, provider))
+
+
+def _schema_columns(stored_schema: Dict) -> Dict[str, List[str]]:
+    columns = {}
+    for table, table_columns in (stored_schema or {}).items():
+        columns[table] = [col["column"] for col in table_columns or [] if isinstance(col, dict) and col.get("column")]
+    return columns
+
+
+def repair_sql(sql: str, stored_schema: Optional[Dict], provider: str) -> Tuple[Optional[str], List[str]]:
+    """
+    Check table / column references against the stored schema and fix the mechanical mistakes
+    (wrong case, missing quotes, near-miss names, ambiguous unqualified columns).
+    Returns (repaired sql, fixes) or (None, []) when nothing could be fixed locally.
+    """
+    if sqlglot is None or not SQL_LOCAL_REPAIR_ENABLED or not stored_schema:
+        return None, []
+    dialect = _DIALECTS.get(provider)
+    try:
+        tree = sqlglot.parse_one(sql, read=dialect)
+    except Exception:
+        return None, []
+    if tree is None:
+        return None, []
+
+    schema_columns = _schema_columns(stored_schema)
+    fixes: List[str] = []
+    cte_names = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+    derived_names = {subquery.alias.lower() for subquery in tree.find_all(exp.Subquery) if subquery.alias}
+
+    # Tables: resolve every reference to a real table name, remember alias -> table
+    aliases: Dict[str, str] = {}
+    query_tables: List[str] = []
+    renamed: Dict[str, str] = {}  # Unaliased tables whose name was fixed: column qualifiers must follow
+    for table in tree.find_all(exp.Table):
+        name = table.name
+        if not name or name.lower() in cte_names:
+            continue
+        real = _match_name(name, list(schema_columns))
+        if real is None:
+            continue
+        identifier = table.this if isinstance(table.this, exp.Identifier) else None
+        quoted = bool(identifier and identifier.quoted)
+        if real != name or (_needs_quotes(real, provider) and not quoted):
+            table.set("this", _identifier(real, provider, quoted))
+            fixes.append(f"table {name} -> {real}" if real != name else f"quoted table {real}")
+            if not table.alias:
+                renamed[name.lower()] = real
+        alias = table.alias
+        aliases[(alias or name).lower()] = real
+        if not alias:
+            aliases[real.lower()] = real
+        if real not in query_tables:
+            query_tables.append(real)
+    if not query_tables:
+        return None, []
+
+    output_aliases = {alias.alias.lower() for alias in tree.find_all(exp.Alias) if alias.alias}
+
+    # Columns: qualified ones are checked against their table, bare ones against every table in the query
+    for column in tree.find_all(exp.Column):
+        identifier = column.this
+        if not isinstance(identifier, exp.Identifier):
+            continue  # SELECT t.*
+        name = identifier.name
+        qualifier = column.table
+        if qualifier:
+            if qualifier.lower() in cte_names or qualifier.lower() in derived_names:
+                continue
+            table = aliases.get(qualifier.lower())
+            if table is None:
+                continue
+            owners = [table]
+            qualifier_identifier = column.args.get("table")
+            if qualifier.lower() in renamed and isinstance(qualifier_identifier, exp.Identifier):
+                if qualifier != table or (_needs_quotes(table, provider) and not qualifier_identifier.quoted):
+                    column.set("table", _identifier(table, provider, qualifier_identifier.quoted))
+        else:
+            if name.lower() in output_aliases:
+                continue  # ORDER BY total
+            # A table with the exact column wins over near misses; only exact matches make it ambiguous
+            owners = [
+                table for table in query_tables
+                if name.lower() in (column_name.lower() for column_name in schema_columns[table])
+            ]
+            if not owners:
+                owners = [table for table in query_tables if _match_name(name, schema_columns[table]) is not None]
+                if len(owners) != 1:
+                    continue  # Unknown, or a near miss in several tables: leave it to the LLM
+
+        real = _match_name(name, schema_columns[owners[0]])
+        if real is None:
+            continue
+        if real != name or (_needs_quotes(real, provider) and not identifier.quoted):
+            column.set("this", _identifier(real, provider, identifier.quoted))
+            fixes.append(f"column {name} -> {real}" if real != name else f"quoted column {real}")
+        if not qualifier and len(owners) > 1:
+            qualified_by = next(
+                (node.alias_or_name for node in tree.find_all(exp.Table) if node.name == owners[0]), owners[0]
+            )
+            column.set("table", exp.to_identifier(qualified_by))
+            fixes.append(f"qualified ambiguous column {real} with {qualified_by}")
+
+    if not fixes:
+        return None, []
+    repaired = tree.sql(dialect=dialect)
+    if repaired == sql:
+        return None, []
+    return repaired, list(dict.fromkeys(fixes))
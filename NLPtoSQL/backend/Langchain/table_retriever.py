@@ -0,0 +1,115 @@
+import math
+import os
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from .text_similarity import split_identifier, stem, tokenize
+
+# Local table selection (replaces the table_prompt LLM call)
+TABLE_RETRIEVER_TOP_K = int(os.getenv("TABLE_RETRIEVER_TOP_K", "5"))
+TABLE_RETRIEVER_RELATIVE_CUTOFF = float(os.getenv("TABLE_RETRIEVER_RELATIVE_CUTOFF", "0.2"))  # Drop tables scoring below this share of the best
+TABLE_LLM_RERANK = os.getenv("TABLE_LLM_RERANK", "false").lower() == "true"  # Let the LLM re-rank the retrieved candidates
+
+# Field weights: a hit on the table name says more than one in a column description
+_TABLE_NAME_WEIGHT = 3
+_COLUMN_NAME_WEIGHT = 2
+_DESCRIPTION_WEIGHT = 1
+
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+
+
+def _identifier_terms(name: str) -> List[str]:
+    return [stem(part) for part in split_identifier(str(name).split(".")[-1]) if not part.isdigit()]
+
+
+def _text_terms(text) -> List[str]:
+    return [stem(token) for token in tokenize(str(text or ""))]
+
+
+def _table_document(table: str, description, columns: List[str]) -> Counter:
+    """Weighted bag of terms for one table: name, column names, table + column descriptions"""
+    terms = Counter()
+    for term in _identifier_terms(table):
+        terms[term] += _TABLE_NAME_WEIGHT
+
+    column_descriptions = {}
+    if isinstance(description, dict):
+        column_descriptions = description.get("columns") or {}
+        if not isinstance(column_descriptions, dict):
+            column_descriptions = {}
+        table_text = description.get("description", "")
+    else:
+        table_text = description or ""
+
+    for column in set(columns) | set(column_descriptions):
+        for term in _identifier_terms(column):
+            terms[term] += _COLUMN_NAME_WEIGHT
+    for term in _text_terms(table_text):
+        terms[term] += _DESCRIPTION_WEIGHT
+    for text in column_descriptions.values():
+        for term in _text_terms(text):
+            terms[term] += _DESCRIPTION_WEIGHT
+    return terms
+
+
+class TableRetriever:
+    """
+    In-memory BM25 index over table names, column names and the table / column
+    descriptions written by auto_document_db.py. Built once per QueryEngine.
+    """
+
+    def __init__(self, table_descriptions: Optional[Dict] = None, stored_schema: Optional[Dict] = None,
+                 tables: Optional[List[str]] = None):
+        table_descriptions = table_descriptions or {}
+        stored_schema = stored_schema or {}
+        if not tables:
+            tables = list(dict.fromkeys(list(table_descriptions) + list(stored_schema)))
+        self.tables: List[str] = list(tables)
+
+        self._lengths: List[int] = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}  # term -> [(table index, weighted tf)]
+        for index, table in enumerate(self.tables):
+            columns = [col["column"] for col in stored_schema.get(table) or [] if isinstance(col, dict) and col.get("column")]
+            document = _table_document(table, table_descriptions.get(table), columns)
+            self._lengths.append(sum(document.values()))
+            for term, frequency in document.items():
+                self._postings.setdefault(term, []).append((index, frequency))
+
+        count = len(self.tables)
+        self._average_length = (sum(self._lengths) / count) if count else 0.0
+        self._idf = {
+            term: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    def search(self, question: str, top_k: int = TABLE_RETRIEVER_TOP_K) -> List[Tuple[str, float]]:
+        """(table, score) pairs, best first; tables sharing no term with the question are omitted"""
+        if not self.tables:
+            return []
+        query_terms = Counter(_text_terms(question))
+        scores: Dict[int, float] = {}
+        for term, query_frequency in query_terms.items():
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf[term]
+            for index, frequency in postings:
+                norm = _BM25_K1 * (1 - _BM25_B + _BM25_B * self._lengths[index] / self._average_length)
+                scores[index] = scores.get(index, 0.0) + query_frequency * idf * frequency * (_BM25_K1 + 1) / (frequency + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [(self.tables[index], round(score, 4)) for index, score in ranked[:top_k]]
+
+    def select(self, question: str, top_k: int = TABLE_RETRIEVER_TOP_K) -> List[str]:
+        """Top tables for a question, dropping the long tail far below the best match"""
+        ranked = self.search(question, top_k)
+        if not ranked:
+            return []
+        cutoff = ranked[0][1] * TABLE_RETRIEVER_RELATIVE_CUTOFF
+        return [table for table, score in ranked if score >= cutoff]
+
+    def match_names(self, text: str) -> List[str]:
+        """Known table names mentioned verbatim in free text (LLM replies that aren't valid JSON)"""
+        lowered = text.lower()
+        return [table for table in self.tables if table.lower() in lowered]
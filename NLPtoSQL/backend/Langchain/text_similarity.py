@@ -0,0 +1,59 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List
+
+_WORD_PATTERN = re.compile(r"[a-z0-9_]+")
+
+# Words that carry no meaning for matching questions to each other or to tables
+STOPWORDS = {
+    "a", "an", "the", "me", "my", "our", "please", "show", "list", "give", "get", "display", "tell",
+    "what", "which", "is", "are", "was", "were", "of", "for", "to", "from", "with", "by", "on", "at",
+    "and", "or", "can", "you", "i", "we", "do", "does", "how", "many", "much", "all", "there", "that",
+    "this", "be", "have", "has", "find", "fetch", "return", "want", "need", "would", "like", "could",
+}
+
+
+def split_identifier(name: str) -> List[str]:
+    """customer_id / CustomerID / Daily_Transaction_Insurance -> lowercase word parts"""
+    spaced = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", name)
+    return [part for part in re.split(r"[^A-Za-z0-9]+", spaced.lower()) if part]
+
+
+def tokenize(text: str, drop_stopwords: bool = True) -> List[str]:
+    tokens = _WORD_PATTERN.findall(text.lower())
+    if drop_stopwords:
+        tokens = [token for token in tokens if token not in STOPWORDS]
+    return tokens
+
+
+def stem(token: str) -> str:
+    """Very small plural/suffix folding so 'customers' matches 'customer'"""
+    if len(token) <= 3 or token.endswith(("ss", "us", "is")):
+        return token
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith(("ches", "shes", "xes", "zes", "sses")):
+        return token[:-2]
+    if token.endswith("s"):
+        return token[:-1]
+    return token
+
+
+def term_vector(tokens: Iterable[str], bigrams: bool = True) -> Dict[str, float]:
+    """L2-normalized sparse term-frequency vector (unigrams + adjacent bigrams)"""
+    tokens = [stem(token) for token in tokens]
+    counts = Counter(tokens)
+    if bigrams:
+        counts.update(f"{left} {right}" for left, right in zip(tokens, tokens[1:]))
+    norm = math.sqrt(sum(value * value for value in counts.values()))
+    if not norm:
+        return {}
+    return {term: value / norm for term, value in counts.items()}
+
+
+def cosine(left: Dict[str, float], right: Dict[str, float]) -> float:
+    """Cosine similarity of two normalized sparse vectors"""
+    if len(left) > len(right):
+        left, right = right, left
+    return sum(value * right.get(term, 0.0) for term, value in left.items())
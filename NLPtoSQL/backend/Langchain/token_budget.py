@@ -0,0 +1,140 @@
+import math
+import os
+import re
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Optional dependency: exact BPE token counts
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+TOKEN_COUNT_CACHE_SIZE = int(os.getenv("TOKEN_COUNT_CACHE_SIZE", "4096"))  # System prompts, schemas and other repeated texts
+
+# Input tokens allowed per LLM call, by model (PROMPT_TOKEN_BUDGET overrides all)
+MODEL_PROMPT_BUDGETS = {
+    "llama-3.3-70b-versatile": 12000,
+}
+DEFAULT_PROMPT_BUDGET = 8000
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "0"))
+
+_PIECE_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+_encoding = None
+if tiktoken is None:
+    print("WARNING: tiktoken not installed, using approximate token counts for prompt budgets")
+else:
+    try:
+        _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception as e:
+        print(f"WARNING: tiktoken encoding '{TOKENIZER_ENCODING}' unavailable, using approximate token counts: {e}")
+
+
+@lru_cache(maxsize=TOKEN_COUNT_CACHE_SIZE)
+def count_tokens(text: str) -> int:
+    """Tokens in text: tiktoken when available, else a BPE-like estimate (~4 characters per word piece)"""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return sum(math.ceil(len(piece) / 4) if piece[0].isalnum() or piece[0] == "_" else 1
+               for piece in _PIECE_PATTERN.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, marker: str = "... [truncated]") -> str:
+    """Cut text to at most max_tokens (plus marker)"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _encoding is not None:
+        return _encoding.decode(_encoding.encode(text, disallowed_special=())[:max_tokens]) + marker
+    # Binary search on character length against the estimate
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low] + marker
+
+
+def _message_tokens(message) -> int:
+    return count_tokens(getattr(message, "content", "") or "") + 4  # Role / framing overhead
+
+
+class PromptBudget:
+    """
+    Measures each part of a prompt and trims the least valuable ones until it fits the
+    model's input budget: least similar few-shot examples first, then the oldest chat history,
+    then the conversation summary, then schema columns. The question and the system prompt
+    are never trimmed.
+    """
+
+    def __init__(self, model_name: str, limit: Optional[int] = None):
+        self.model_name = model_name
+        self.limit = limit or PROMPT_TOKEN_BUDGET or MODEL_PROMPT_BUDGETS.get(model_name, DEFAULT_PROMPT_BUDGET)
+
+    def measure(self, system_template: str, inputs: Dict) -> Dict[str, int]:
+        """Token count per prompt part"""
+        parts = {"system": count_tokens(system_template)}
+        for key, value in inputs.items():
+            if isinstance(value, list):
+                parts[key] = sum(_message_tokens(message) for message in value)
+            else:
+                parts[key] = count_tokens(str(value or ""))
+        return parts
+
+    def fit(self, system_template: str, inputs: Dict,
+            shrink_schema: Optional[Callable[[str, int], str]] = None) -> Tuple[Dict, Dict]:
+        """Trim inputs to the budget; returns (inputs, report)"""
+        inputs = dict(inputs)
+        parts = self.measure(system_template, inputs)
+        trimmed: List[str] = []
+
+        def total() -> int:
+            return sum(parts.values())
+
+        examples = inputs.get("few_shot_examples")
+        if examples and total() > self.limit:
+            from .example_store import NO_EXAMPLES
+            blocks = examples.split("\n\n")  # Best example first
+            while blocks and total() > self.limit:
+                blocks.pop()
+                inputs["few_shot_examples"] = "\n\n".join(blocks) if blocks else NO_EXAMPLES
+                parts["few_shot_examples"] = count_tokens(inputs["few_shot_examples"])
+            trimmed.append("few_shot_examples")
+
+        history = list(inputs.get("chat_history") or [])
+        while history and total() > self.limit:
+            parts["chat_history"] -= _message_tokens(history.pop(0))
+            inputs["chat_history"] = history
+            trimmed.append("chat_history")
+
+        context = inputs.get("conversation_context")
+        if context and total() > self.limit:
+            lines = context.split("\n")
+            while lines and total() > self.limit:
+                lines.pop(0)
+                inputs["conversation_context"] = "\n".join(lines)
+                parts["conversation_context"] = count_tokens(inputs["conversation_context"])
+            trimmed.append("conversation_context")
+
+        schema = inputs.get("schema")
+        if schema and shrink_schema is not None and total() > self.limit:
+            allowed = max(0, self.limit - (total() - parts["schema"]))
+            inputs["schema"] = shrink_schema(schema, allowed)
+            parts["schema"] = count_tokens(inputs["schema"])
+            trimmed.append("schema")
+
+        report = {
+            "budget": self.limit,
+            "prompt_tokens": total(),
+            "parts": parts,
+            "trimmed": list(dict.fromkeys(trimmed)),
+            "exact": _encoding is not None
+        }
+        if total() > self.limit:
+            print(f"[TOKEN BUDGET] Prompt still {total()} tokens after trimming (budget {self.limit})")
+        return inputs, report
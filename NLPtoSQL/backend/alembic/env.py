@@ -20,7 +20,7 @@ from clients.models import Client, Plan
 from database.models import Database
 from users.models import User
 from dashboards.models import SavedDashboard
-from Langchain.models import QueryLog
+from Langchain.models import QueryLog, QueryExample
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,87 @@
+"""
+Micro-benchmark: QueryEngine.process_query with and without speculative execution.
+
+LLM calls (intent classification, table selection, SQL generation) are replaced by sleeps of
+--latency seconds, so this measures only how much of the pipeline overlaps - not real model
+latency. Speculation runs on the shared worker pool from utils/concurrency.py.
+
+    cd NLPtoSQL/backend && python benchmarks/bench_speculation.py [--latency 0.3] [--repeat 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GROQ_API_KEY", "benchmark")  # ChatGroq is built but never called
+
+from langchain_community.utilities.sql_database import SQLDatabase  # noqa: E402
+from sqlalchemy import create_engine, text  # noqa: E402
+
+from Langchain.query_engine import QueryEngine, QueryIntent  # noqa: E402
+from Langchain.schema_cache import TableDDLCache  # noqa: E402
+
+QUESTION = "which ones did best last quarter"  # Not decidable locally: the intent comes from the LLM
+DDL = "CREATE TABLE orders (id INTEGER PRIMARY KEY, region TEXT, total REAL)"
+
+
+def build_engine(latency: float, budget: int) -> QueryEngine:
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(DDL))
+    query_engine = QueryEngine(
+        SQLDatabase(engine), table_descriptions={"orders": {"description": "sales orders"}},
+        selected_tables=["orders"], ddl_cache=TableDDLCache({"orders": DDL}), speculative_token_budget=budget
+    )
+    tokens = {"prompt_tokens": 100, "completion_tokens": 10, "total_tokens": 110}
+
+    def classify_intent(question):
+        time.sleep(latency)
+        return QueryIntent.SQL_QUERY, dict(tokens)
+
+    def select_tables(question, context=""):
+        time.sleep(latency)
+        return ["orders"], dict(tokens)
+
+    def generate_query(question, selected_tables=None, filtered_schema=None, geometry=None, on_event=None):
+        usage = {"table_selection": {}, "sql_generation": dict(tokens)}
+        if selected_tables is None:
+            selected_tables, usage["table_selection"] = select_tables(question)
+            filtered_schema = query_engine.get_filtered_schema(selected_tables)
+        time.sleep(latency)
+        return "SELECT region, SUM(total) FROM orders GROUP BY region;", selected_tables, filtered_schema, usage
+
+    query_engine.classify_intent = classify_intent
+    query_engine.select_tables = select_tables
+    query_engine.generate_query = generate_query
+    return query_engine
+
+
+def measure(latency: float, budget: int, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        query_engine = build_engine(latency, budget)
+        started = time.perf_counter()
+        query_engine.process_query(QUESTION)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.3, help="simulated seconds per LLM call")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    sequential = measure(args.latency, 0, args.repeat)
+    speculative = measure(args.latency, 100000, args.repeat)
+
+    print(f"simulated LLM latency   : {args.latency * 1000:9.0f} ms per call")
+    print(f"sequential (budget 0)   : {sequential * 1000:9.0f} ms")
+    print(f"speculative             : {speculative * 1000:9.0f} ms")
+    print(f"speedup                 : {sequential / speculative:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
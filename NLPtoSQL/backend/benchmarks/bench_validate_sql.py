@@ -0,0 +1,79 @@
+"""
+Micro-benchmark: QueryEngine.validate_and_fix_sql identifier fixing on large schemas.
+
+Compares the previous implementation (three regex passes + one re.sub per schema word)
+with the single-pass tokenizer in Langchain/sql_identifiers.py.
+
+    cd NLPtoSQL/backend && python benchmarks/bench_validate_sql.py [--tables 500] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Langchain.sql_identifiers import fix_identifiers, identifier_map  # noqa: E402
+
+
+def legacy_fix(sql_query: str, schema: str = "") -> str:
+    """validate_and_fix_sql before the tokenizer rewrite"""
+    sql_query = re.sub(r'\b(\w+)\.([a-z])\.(\w+)\b', r'\2.\3', sql_query, flags=re.IGNORECASE)
+    sql_query = re.sub(r'\b([a-z])\.(\w+)\.(\w+)\b', r'\1.\3', sql_query, flags=re.IGNORECASE)
+    sql_query = re.sub(r'\b(\w+)\.(\1)\.(\w+)\b', r'\1.\3', sql_query, flags=re.IGNORECASE)
+    if schema:
+        actual_cols = re.findall(r'\b([a-zA-Z_][a-zA-Z0-9_]*)\s+', schema)
+        col_map = {col.lower(): col for col in actual_cols}
+        for lower_col, actual_col in col_map.items():
+            sql_query = re.sub(r'\b' + lower_col + r'\b', actual_col, sql_query, flags=re.IGNORECASE)
+    return sql_query
+
+
+def build_schema(tables: int, columns: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    words = ["Customer", "Order", "Invoice", "Amount", "Status", "Region", "Created", "Updated", "Code", "Name",
+             "Total", "Tax", "Product", "Quantity", "Price", "Branch", "Account", "Balance", "Type", "Date"]
+    blocks = []
+    for t in range(tables):
+        lines = [f"\t{rng.choice(words)}{rng.choice(words)}{c} VARCHAR(50)" for c in range(columns)]
+        lines.insert(0, f"\tTbl{t}ID INTEGER NOT NULL")
+        blocks.append(f"CREATE TABLE Table{t}_{rng.choice(words)} (\n" + ", \n".join(lines) + f", \n\tPRIMARY KEY (Tbl{t}ID)\n)")
+    return "\n\n".join(blocks)
+
+
+def build_query(schema: str) -> str:
+    names = re.findall(r"CREATE TABLE (\w+)", schema)
+    return (
+        f"select t.tbl1id, t.{names[1].lower()}.tbl1id, count(*) as total from {names[1].lower()} t "
+        f"join {names[2].lower()} u on u.tbl2id = t.tbl1id join {names[3]}.{names[3]}.tbl3id "
+        "where t.tbl1id > 10 group by t.tbl1id order by total desc limit 50"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tables", type=int, default=500)
+    parser.add_argument("--columns", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    schema = build_schema(args.tables, args.columns)
+    sql_query = build_query(schema)
+    assert legacy_fix(sql_query, schema) == fix_identifiers(sql_query, schema), "implementations disagree"
+
+    identifier_map.cache_clear()
+    cold = timeit.timeit(lambda: fix_identifiers(sql_query, schema), number=1)
+    legacy = min(timeit.repeat(lambda: legacy_fix(sql_query, schema), number=1, repeat=args.repeat))
+    warm = min(timeit.repeat(lambda: fix_identifiers(sql_query, schema), number=1, repeat=args.repeat))
+
+    print(f"schema: {args.tables} tables, {len(identifier_map(schema))} distinct words, {len(schema)} chars")
+    print(f"legacy regex passes     : {legacy * 1000:9.3f} ms")
+    print(f"tokenizer (map cold)    : {cold * 1000:9.3f} ms")
+    print(f"tokenizer (map cached)  : {warm * 1000:9.3f} ms")
+    print(f"speedup (cached)        : {legacy / warm:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
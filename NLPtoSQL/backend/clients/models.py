@@ -14,6 +14,8 @@ class Plan(Base):
     total_query_allowed = Column(Integer, nullable=False)
     tokens = Column(Integer, nullable=True)
     users = Column(Integer, nullable=False)
+    query_timeout_seconds = Column(Integer, nullable=True)  # Max runtime of one SQL statement (None = server default)
+    speculative_token_budget = Column(Integer, nullable=True)  # Extra LLM tokens per question spent on speculative work (None = server default, 0 = off)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -40,6 +42,8 @@ class PlanBase(BaseModel):
     total_query_allowed: Optional[int] = None
     tokens: Optional[int] = None
     users: Optional[int] = None
+    query_timeout_seconds: Optional[int] = None
+    speculative_token_budget: Optional[int] = None
 
 class PlanCreate(PlanBase):
     pass
@@ -49,6 +53,8 @@ class PlanUpdate(BaseModel):
     total_query_allowed: Optional[int] = None
     tokens: Optional[int] = None
     users: Optional[int] = None
+    query_timeout_seconds: Optional[int] = None
+    speculative_token_budget: Optional[int] = None
 
 class PlanResponse(PlanBase):
     id: int
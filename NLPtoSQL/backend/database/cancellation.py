@@ -0,0 +1,57 @@
+import re
+import threading
+from typing import Callable, Optional
+
+_TIMEOUT_ERROR_PATTERN = re.compile(
+    r"statement timeout|canceling statement due to user request|maximum statement execution time exceeded"
+    r"|query execution was interrupted|timeout expired|adaptive server connection timed out",
+    re.IGNORECASE,
+)
+
+
+class QueryCancelledError(Exception):
+    """The running statement was cancelled (client disconnect or request deadline)"""
+    pass
+
+
+class QueryCancelScope:
+    """
+    Shared between an async request handler and the worker thread running its SQL.
+    The worker binds a cancel callback for the statement in flight; the handler calls
+    cancel() when the client goes away or the deadline passes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancel_fn: Optional[Callable] = None
+        self.cancelled = False
+        self.reason: Optional[str] = None
+
+    def bind(self, cancel_fn: Callable):
+        with self._lock:
+            if self.cancelled:
+                raise QueryCancelledError(self.reason or "Query cancelled")
+            self._cancel_fn = cancel_fn
+
+    def unbind(self):
+        with self._lock:
+            self._cancel_fn = None
+
+    def cancel(self, reason: str):
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            self.reason = reason
+            cancel_fn = self._cancel_fn
+        if cancel_fn is not None:
+            try:
+                cancel_fn()
+                print(f"[SQL CANCEL] Cancelled running statement: {reason}")
+            except Exception as e:
+                print(f"[SQL CANCEL] Server-side cancel failed: {e}")
+
+
+def is_timeout_error(error_message: str) -> bool:
+    """True for driver errors raised by statement timeouts / cancellation (not worth an LLM fix)"""
+    return bool(_TIMEOUT_ERROR_PATTERN.search(error_message or ""))
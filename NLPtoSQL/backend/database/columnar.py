@@ -0,0 +1,71 @@
+from datetime import datetime
+from typing import Dict, List
+
+# Optional dependency: Arrow IPC output
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+class ColumnarResultBuilder:
+    """
+    Accumulates cursor batches column-major.
+    Scalar/array detection and datetime serialization are decided per column
+    while the batch is transposed, instead of re-scanning row dicts afterwards.
+    """
+
+    def __init__(self, columns: List[str]):
+        self.columns = list(columns) if columns else ["result"]
+        self.values: List[list] = [[] for _ in self.columns]
+        self._is_array = [False] * len(self.columns)
+        self._raw_rows = not columns  # No description: keep str(row) like the row format does
+        self.row_count = 0
+
+    def add_batch(self, rows):
+        if not rows:
+            return
+        self.row_count += len(rows)
+
+        if self._raw_rows:
+            self.values[0].extend(str(row) for row in rows)
+            return
+
+        for index, column_values in enumerate(zip(*rows)):
+            value_types = set(map(type, column_values))
+            if any(issubclass(t, datetime) for t in value_types):
+                column_values = [v.isoformat() if isinstance(v, datetime) else v for v in column_values]
+            if not self._is_array[index] and any(issubclass(t, (list, dict)) for t in value_types):
+                self._is_array[index] = True
+            self.values[index].extend(column_values)
+
+    def data_types(self) -> Dict[str, str]:
+        return {col: ("array" if is_array else "scalar") for col, is_array in zip(self.columns, self._is_array)}
+
+    def result(self) -> Dict:
+        return {
+            "columns": self.columns,
+            "values": self.values,
+            "data_types": self.data_types(),
+            "row_count": self.row_count
+        }
+
+
+def columnar_to_arrow_ipc(columns: List[str], values: List[list]) -> bytes:
+    """Encode a columnar result as an Arrow IPC stream"""
+    if pa is None:
+        raise RuntimeError("Arrow output requires the 'pyarrow' package")
+
+    arrays = []
+    for column_values in values:
+        try:
+            arrays.append(pa.array(column_values))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed / driver-specific types: fall back to text
+            arrays.append(pa.array([None if v is None else str(v) for v in column_values], type=pa.string()))
+
+    table = pa.Table.from_arrays(arrays, names=columns)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -1,23 +1,45 @@
-from fastapi import APIRouter, HTTPException, Depends, Body
+from fastapi import APIRouter, HTTPException, Depends, Body, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from langchain_community.utilities.sql_database import SQLDatabase
 from urllib.parse import quote
 from pydantic import BaseModel
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 from Langchain import QueryEngine
+from Langchain.schema_cache import TableDDLCache
+from Langchain.question_cache import get_question_cache, get_question_cache_stats, schema_fingerprint
+from Langchain.sql_repair import repair_sql
+from Langchain.example_store import FEW_SHOT_MAX_EXAMPLES, get_example_store, get_example_store_stats
+from Langchain.models import QueryExample
 from auth import get_current_user
 from users.models import User
+from clients.models import Client, Plan
 from database.models import Database as DBModel
-from db_config import get_db
+from database.engines import engine_registry
+from database.pool import get_pool, get_pool_stats, set_statement_timeout, reset_statement_timeout
+from database.cancellation import QueryCancelScope, QueryCancelledError, is_timeout_error
+from database.result_cache import result_cache, normalize_sql
+from database.fix_cache import fix_cache
+from database.singleflight import SQL_COALESCE_ENABLED, execution_flights
+from database.paging import PageRequest, build_page_request, build_page_sql, finish_page
+from database.preflight import SQL_PREFLIGHT_DEFAULT, SQL_PREFLIGHT_LIMIT_ROWS, explain_query, decide_action
+from database.columnar import ColumnarResultBuilder, columnar_to_arrow_ipc, pa
+from database.export import ThreadedExport, ExportAborted, copy_postgres_csv, write_cursor_csv, write_cursor_parquet, EXPORT_FETCH_SIZE
+from db_config import get_db, SessionLocal
+from utils.concurrency import run_blocking, submit_blocking, TenantBusyError, get_concurrency_stats
 
-import psycopg2
 import pymysql
-import pymssql
+import asyncio
 import json
+import os
 import re
+import time
+import uuid
 import warnings
-from datetime import datetime
-from typing import Optional, Dict
+from datetime import datetime, date, time as dt_time
+from decimal import Decimal
+from typing import Optional, Dict, Literal
 from utils.encryption import decrypt_password
 
 # Suppress SQLAlchemy warnings for unknown column types
@@ -28,6 +50,20 @@ router = APIRouter(prefix="/database", tags=["database"])
 # In-memory store for user database connections (acts as Redis for now)
 user_db_store: Dict[int, Dict] = {}
 
+# Streaming execution: rows fetched per round trip from the server-side cursor
+SQL_STREAM_FETCH_SIZE = int(os.getenv("SQL_STREAM_FETCH_SIZE", "2000"))
+SQL_STREAM_MAX_FETCH_SIZE = int(os.getenv("SQL_STREAM_MAX_FETCH_SIZE", "50000"))
+
+COLUMNAR_RESULT_FORMATS = {"columnar", "arrow"}
+
+# Statement timeout when the client's plan sets none (0 disables), and the overall budget for
+# /execute-sql including LLM-corrected retries
+SQL_STATEMENT_TIMEOUT_SECONDS = float(os.getenv("SQL_STATEMENT_TIMEOUT_SECONDS", "60"))
+SQL_REQUEST_DEADLINE_SECONDS = float(os.getenv("SQL_REQUEST_DEADLINE_SECONDS", "120"))
+SQL_CANCEL_POLL_INTERVAL = 0.5  # Seconds between client-disconnect / deadline checks
+SQL_EXPORT_TIMEOUT_SECONDS = float(os.getenv("SQL_EXPORT_TIMEOUT_SECONDS", "900"))  # Exports run longer than interactive queries
+QUERY_STREAM_FIRST_PAGE_ROWS = int(os.getenv("QUERY_STREAM_FIRST_PAGE_ROWS", "100"))  # Rows sent in the "results" event of /query/stream
+
 class ConnectRequest(BaseModel):
     database_id: int
 
@@ -45,6 +81,132 @@ def create_connection_uri(db_record: DBModel, plain_password: str) -> str:
         raise ValueError(f"Unsupported database provider: {db_record.provider}")
 
 
+def _tenant_id(current_user: User):
+    """Concurrency limits are applied per client account"""
+    return current_user.client_id if current_user.client_id is not None else f"user_{current_user.id}"
+
+def _get_client_plan(db: Session, client_id: Optional[int]) -> Optional[Plan]:
+    """Plan attached to the client, if any"""
+    if client_id is None:
+        return None
+    return db.query(Plan).join(Client, Client.plan_id == Plan.id).filter(Client.id == client_id).first()
+
+def _persist_schema_ddl(database_id: int, entries: Dict[str, str], replace: bool = False):
+    """Merge reflected CREATE TABLE text into Database.schema_ddl (runs on a worker thread)"""
+    session = SessionLocal()
+    try:
+        record = session.query(DBModel).filter(DBModel.id == database_id).first()
+        if record is None:
+            return
+        merged = {} if replace else dict(record.schema_ddl or {})
+        merged.update(entries)
+        record.schema_ddl = merged
+        session.commit()
+    finally:
+        session.close()
+
+def _load_query_examples(database_id: int, fingerprint: str) -> list:
+    """Newest stored examples for the current schema, oldest first"""
+    session = SessionLocal()
+    try:
+        rows = (
+            session.query(QueryExample)
+            .filter(QueryExample.database_id == database_id, QueryExample.schema_fingerprint == fingerprint)
+            .order_by(QueryExample.id.desc())
+            .limit(FEW_SHOT_MAX_EXAMPLES)
+            .all()
+        )
+        return [{"question": row.question, "sql_query": row.sql_query} for row in reversed(rows)]
+    finally:
+        session.close()
+
+def _persist_query_example(database_id: int, fingerprint: str, question: str, sql_query: str):
+    """Insert or update the stored SQL for a question, keeping at most FEW_SHOT_MAX_EXAMPLES rows per database"""
+    session = SessionLocal()
+    try:
+        row = session.query(QueryExample).filter(
+            QueryExample.database_id == database_id,
+            QueryExample.schema_fingerprint == fingerprint,
+            QueryExample.question == question
+        ).first()
+        if row is None:
+            session.add(QueryExample(database_id=database_id, schema_fingerprint=fingerprint, question=question, sql_query=sql_query))
+        else:
+            row.sql_query = sql_query
+        session.flush()
+        # Examples for an older schema are never loaded again; past the cap the oldest go first
+        session.query(QueryExample).filter(
+            QueryExample.database_id == database_id,
+            QueryExample.schema_fingerprint != fingerprint
+        ).delete(synchronize_session=False)
+        cutoff = (
+            session.query(QueryExample.id)
+            .filter(QueryExample.database_id == database_id)
+            .order_by(QueryExample.id.desc())
+            .offset(FEW_SHOT_MAX_EXAMPLES)
+            .first()
+        )
+        if cutoff is not None:
+            session.query(QueryExample).filter(
+                QueryExample.database_id == database_id,
+                QueryExample.id <= cutoff[0]
+            ).delete(synchronize_session=False)
+        session.commit()
+    finally:
+        session.close()
+
+def _selected_table_names(sql_db: SQLDatabase, db_record: DBModel) -> list:
+    """Usable tables limited to the record's selected_tables (schema prefix stripped)"""
+    usable = list(sql_db.get_usable_table_names())
+    if not db_record.selected_tables:
+        return usable
+    selected = {t.split('.')[-1] for t in db_record.selected_tables}
+    return [t for t in usable if t in selected]
+
+def _open_query_engine(db_record: DBModel, plain_password: str, user_id: int, speculative_token_budget: Optional[int] = None,
+                       session_tenant=None):
+    """Create the SQLDatabase + QueryEngine for a user session (blocking); session_tenant scopes its background work"""
+    connection_uri = create_connection_uri(db_record, plain_password)
+    # Shared engine: reconnects and other sessions on the same database reuse its pool and reflected tables
+    sql_db = engine_registry.acquire(connection_uri, sample_rows_in_table_info=1)
+    
+    fingerprint = schema_fingerprint(db_record.schema, db_record.description, db_record.selected_tables)
+    get_question_cache(db_record.id, fingerprint)  # Claim the database's question cache for the current schema
+    
+    def example_store(replace: bool = False):
+        return get_example_store(
+            db_record.id,
+            fingerprint,
+            load=lambda: _load_query_examples(db_record.id, fingerprint),
+            persist=lambda question, sql_query: _persist_query_example(db_record.id, fingerprint, question, sql_query),
+            replace=replace
+        )
+    
+    example_store(replace=True)  # Load (or claim) the stored examples for the current schema
+    try:
+        # Initialize QueryEngine with dynamic metadata
+        query_engine = QueryEngine(
+            db=sql_db,
+            db_description=db_record.db_description or "database",
+            table_descriptions=db_record.description or {},
+            selected_tables=db_record.selected_tables or [],
+            session_id=f"user_{user_id}_db_{db_record.id}",
+            stored_schema=db_record.schema,  # Pass stored schema to QueryEngine
+            ddl_cache=TableDDLCache(
+                db_record.schema_ddl,
+                persist=lambda entries: _persist_schema_ddl(db_record.id, entries)
+            ),
+            question_cache_key=(db_record.id, fingerprint),
+            tenant_id=session_tenant,
+            speculative_token_budget=speculative_token_budget,
+            example_store_lookup=example_store
+        )
+        table_count = len(sql_db.get_usable_table_names())
+    except Exception:
+        engine_registry.release(sql_db)
+        raise
+    return sql_db, query_engine, table_count
+
 
 @router.post("/connect")
 async def connect_database(
@@ -66,25 +228,21 @@ async def connect_database(
         # Decrypt password
         plain_password = decrypt_password(db_record.password)
         
-        # Create connection
-        connection_uri = create_connection_uri(db_record, plain_password)
-        sql_db = SQLDatabase.from_uri(
-            connection_uri,
-            sample_rows_in_table_info=1,
-            engine_args={"pool_pre_ping": True, "pool_recycle": 300}
-        )
+        plan = _get_client_plan(db, db_record.client_id)
         
-        # Initialize QueryEngine with dynamic metadata
-        query_engine = QueryEngine(
-            db=sql_db,
-            db_description=db_record.db_description or "database",
-            table_descriptions=db_record.description or {},
-            selected_tables=db_record.selected_tables or [],
-            session_id=f"user_{current_user.id}_db_{request.database_id}",
-            stored_schema=db_record.schema  # Pass stored schema to QueryEngine
+        # Engine creation and table reflection block - keep them off the event loop
+        # tenant_id is consumed by run_blocking for slot accounting; session_tenant reaches the QueryEngine
+        tenant = _tenant_id(current_user)
+        sql_db, query_engine, table_count = await run_blocking(
+            _open_query_engine, db_record, plain_password, current_user.id,
+            plan.speculative_token_budget if plan else None,
+            session_tenant=tenant, tenant_id=tenant
         )
         
-        # Store in user_db_store
+        # Store in user_db_store, dropping the reference held by a previous connection
+        previous = user_db_store.get(current_user.id)
+        if previous and previous.get("db_instance") is not None:
+            engine_registry.release(previous["db_instance"])
         user_db_store[current_user.id] = {
             "db_instance": sql_db,
             "query_engine": query_engine,
@@ -92,6 +250,7 @@ async def connect_database(
             "description": db_record.description,
             "db_description": db_record.db_description,
             "plain_password": plain_password,
+            "plan_query_timeout": plan.query_timeout_seconds if plan and plan.query_timeout_seconds else None,
             "connected_at": datetime.now().isoformat()
         }
         
@@ -103,7 +262,7 @@ async def connect_database(
             "session_id": query_engine.memory.session_id,
             "database_info": {
                 "provider": db_record.provider.value,
-                "table_count": len(sql_db.get_usable_table_names()),
+                "table_count": table_count,
                 "has_description": bool(db_record.description)
             }
         }
@@ -120,6 +279,7 @@ async def connect_database(
 
 class QueryRequest(BaseModel):
     question: str
+    mode: Literal["pipeline", "one_shot"] = "pipeline"  # one_shot: intent + tables + SQL in a single LLM call
 
     class Config:
         json_schema_extra = {
@@ -136,11 +296,19 @@ class QueryResponse(BaseModel):
     response: Optional[str] = None
     filtered_tables: Optional[list] = None
     schema_token_size: Optional[int] = None
+    schema_tokens_saved: Optional[int] = None  # Estimated prompt tokens removed by column-level schema pruning
     conversation_token_estimate: Optional[int] = None
     llm_token_usage: Optional[Dict] = None
     note: Optional[str] = None
     data: Optional[list] = None
     columns: Optional[list] = None
+    question_cache: Optional[Dict] = None
+    intent_decided_by: Optional[str] = None  # local | llm | geometry | question_cache | one_shot
+    intent_confidence: Optional[float] = None
+    generation_mode: Optional[str] = None
+    one_shot_fallback: Optional[str] = None  # Why one_shot mode fell back to the pipeline
+    processing_ms: Optional[float] = None
+    speculation: Optional[Dict] = None
 
 class GeoQueryRequest(BaseModel):
     question: str
@@ -165,6 +333,21 @@ class GeoQueryRequest(BaseModel):
 class SQLExecuteRequest(BaseModel):
     sql_query: str
     filtered_tables: Optional[list] = None
+    stream: bool = False  # Stream rows as NDJSON using a server-side cursor
+    fetch_size: Optional[int] = None  # Rows per fetch when streaming
+    result_format: Literal["rows", "columnar", "arrow"] = "rows"  # columnar: {"columns": [...], "values": [[col0...], ...]}
+    use_cache: bool = True  # Set False to always hit the database
+    page_size: Optional[int] = None  # Rows per page; opt-in (default SQL_DEFAULT_PAGE_SIZE, 0 = no paging)
+    cursor: Optional[str] = None  # next_cursor from the previous page
+    timeout_seconds: Optional[float] = None  # Statement timeout; capped by the client's plan
+    preflight: Optional[bool] = None  # EXPLAIN first and reject / limit / stream by estimated size (default SQL_PREFLIGHT_DEFAULT)
+    question: Optional[str] = None  # Question the SQL was generated for (default: looked up from this session's generated SQL)
+
+class ExportRequest(BaseModel):
+    sql_query: str
+    format: Literal["csv", "parquet"] = "csv"
+    filename: Optional[str] = None  # Download name without extension
+    timeout_seconds: Optional[float] = None  # Capped by the client's plan
 
 class ConversationHistoryRequest(BaseModel):
     history_data: Dict
@@ -390,7 +573,7 @@ async def execute_nlp_query(
         query_engine = user_data["query_engine"]
 
         # /query no longer takes geometry, it is purely string-based
-        result = query_engine.process_query(request.question)
+        result = await run_blocking(query_engine.process_query, request.question, mode=request.mode, tenant_id=_tenant_id(current_user))
 
         intent = result.get("intent")
 
@@ -399,7 +582,13 @@ async def execute_nlp_query(
             "intent": intent or "unknown",
             "question": request.question,
             "conversation_token_estimate": result.get("conversation_token_estimate", 0),
-            "llm_token_usage": result.get("llm_token_usage", {})
+            "llm_token_usage": result.get("llm_token_usage", {}),
+            "intent_decided_by": result.get("intent_decided_by"),
+            "intent_confidence": result.get("intent_confidence"),
+            "generation_mode": result.get("generation_mode"),
+            "one_shot_fallback": result.get("one_shot_fallback"),
+            "processing_ms": result.get("processing_ms"),
+            "speculation": result.get("speculation")
         }
 
         if intent == "sql_query":
@@ -407,7 +596,9 @@ async def execute_nlp_query(
                 "sql_query": result.get("sql_query"),
                 "filtered_tables": result.get("filtered_tables"),
                 "schema_token_size": result.get("schema_token_size"),
-                "note": result.get("note")
+                "schema_tokens_saved": result.get("schema_tokens_saved"),
+                "note": result.get("note"),
+                "question_cache": result.get("question_cache")
             })
 
         elif intent == "sql_spatial":
@@ -446,6 +637,88 @@ async def execute_nlp_query(
         raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
 
 
+def _sse_event(event: str, data: Dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, default=_json_default)}\n\n".encode("utf-8")
+
+def _query_event_producer(query_engine: QueryEngine, question: str, mode: str, db_record: DBModel, plain_password: str,
+                          timeout_seconds: Optional[float], cancel_scope: QueryCancelScope):
+    """Blocking /query/stream body: process_query's stage events, then the first page of the generated SQL's results"""
+    def produce(writer):
+        def send(event: str, data: Dict):
+            writer.write(_sse_event(event, data))
+            writer.flush()  # One event per chunk: clients render each stage as soon as it lands
+        
+        try:
+            result = query_engine.process_query(question, mode=mode, on_event=send)
+        except ExportAborted:
+            raise
+        except Exception as e:
+            send("error", {"stage": "pipeline", "detail": f"Query failed: {str(e)}"})
+            return
+        
+        sql_query = result.get("sql_query")
+        if sql_query and result.get("status") == "success":
+            try:
+                _assert_select_only_sql(sql_query)
+                page_result = execute_sql_direct(
+                    sql_query, db_record, plain_password,
+                    page=build_page_request(sql_query, QUERY_STREAM_FIRST_PAGE_ROWS, None),
+                    timeout_seconds=timeout_seconds, cancel_scope=cancel_scope
+                )
+                send("results", {
+                    "columns": page_result["columns"],
+                    "data": page_result["data"],
+                    "row_count": len(page_result["data"]),
+                    "page": page_result.get("page")
+                })
+            except HTTPException as e:
+                send("error", {"stage": "execution", "detail": e.detail})
+            except ExportAborted:
+                raise
+            except Exception as e:
+                send("error", {"stage": "execution", "detail": str(e)})
+        send("done", {
+            key: result.get(key) for key in (
+                "status", "intent", "sql_query", "llm_token_usage", "generation_mode",
+                "one_shot_fallback", "speculation", "processing_ms"
+            ) if result.get(key) is not None
+        })
+    
+    return produce
+
+@router.post("/query/stream")
+async def stream_nlp_query(
+    request: QueryRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    /query as server-sent events: intent, tables, SQL tokens as the model writes them,
+    the final SQL (or a text response), then the first page of results (continue with
+    /execute-sql and page.next_cursor). Honors mode like /query.
+    """
+    if current_user.id not in user_db_store:
+        raise HTTPException(
+            status_code=503,
+            detail="No database connected. Please connect to a database first using /database/connect"
+        )
+    
+    user_data = user_db_store[current_user.id]
+    cancel_scope = QueryCancelScope()
+    stream = ThreadedExport(
+        _query_event_producer(
+            user_data["query_engine"], request.question, request.mode, user_data["db_record"], user_data.get("plain_password"),
+            _resolve_statement_timeout(None, user_data.get("plan_query_timeout")), cancel_scope
+        ),
+        on_abort=lambda: cancel_scope.cancel("client disconnected")
+    )
+    first_chunk = await stream.start(tenant_id=_tenant_id(current_user))
+    return StreamingResponse(
+        stream.body(first_chunk),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/geo-query")
 async def execute_geo_nlp_query(
     request: GeoQueryRequest = Body(
@@ -492,10 +765,14 @@ async def execute_geo_nlp_query(
                 )
 
             db_instance = user_data["db_instance"]
-            geometry_payload = _resolve_city_geometry_from_db(db_instance, city_name)
+            geometry_payload = await run_blocking(
+                _resolve_city_geometry_from_db, db_instance, city_name, tenant_id=_tenant_id(current_user)
+            )
 
         # Route through the unified process_query with geometry
-        result = qe.process_query(request.question, geometry=geometry_payload)
+        result = await run_blocking(
+            qe.process_query, request.question, geometry=geometry_payload, tenant_id=_tenant_id(current_user)
+        )
 
         # Extra guard: never return non-select SQL from geo endpoint
         generated_sql = result.get("sql_query_pgadmin") or result.get("sql_query")
@@ -654,9 +931,111 @@ async def test_intent_classification(request: QueryRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Intent classification failed: {str(e)}")
 
+def _build_execute_response(request: SQLExecuteRequest, result: Dict, final_query: str, attempt: int, retry_token_usage: list, cache_status: str,
+                            preflight: Optional[Dict] = None):
+    """Shape an execute_sql_direct result into the /execute-sql response (cards, tables, format)"""
+    if request.result_format in COLUMNAR_RESULT_FORMATS:
+        data_types = result["data_types"]
+        first_row = [col_values[0] for col_values in result["values"]] if result["row_count"] == 1 else None
+    else:
+        data_types = dict(result.get("data_types", {}))
+        if not data_types and result["data"]:
+            for col in result["columns"]:
+                is_array = any(isinstance(row.get(col), list) for row in result["data"])
+                data_types[col] = "array" if is_array else "scalar"
+        first_row = list(result["data"][0].values()) if len(result["data"]) == 1 else None
+    
+    # Segregate data into cards and tables
+    cards = []
+    tables = []
+    
+    if first_row is not None:
+        for key, value in zip(result["columns"], first_row):
+            data_type = data_types.get(key, "scalar")
+            if data_type == "array" and isinstance(value, list):
+                tables.append({"name": key, "data": value})
+            elif data_type == "scalar":
+                cards.append({"label": key, "value": value})
+    
+    if request.result_format == "arrow":
+        return Response(
+            content=columnar_to_arrow_ipc(result["columns"], result["values"]),
+            media_type="application/vnd.apache.arrow.stream",
+            headers={
+                "X-Row-Count": str(result["row_count"]),
+                "X-Retry-Count": str(attempt),
+                "X-Cache": cache_status,
+                "X-Has-More": str(result.get("page", {}).get("has_more", False)).lower(),
+                "X-Next-Cursor": result.get("page", {}).get("next_cursor") or "",
+                "X-Estimated-Rows": str((preflight or {}).get("estimated_rows") or "")
+            }
+        )
+    
+    response = {
+        "status": "success",
+        "original_query": request.sql_query,
+        "columns": result["columns"],
+        "data_types": data_types,
+        "cards": cards,
+        "tables": tables,
+        "cache": cache_status
+    }
+    if request.result_format == "columnar":
+        response.update({
+            "format": "columnar",
+            "values": result["values"],
+            "row_count": result["row_count"]
+        })
+    else:
+        response.update({
+            "data": result["data"],
+            "row_count": len(result["data"])
+        })
+    
+    if "page" in result:
+        response.update(result["page"])
+    if preflight is not None:
+        response["preflight"] = preflight
+    
+    if attempt > 0:
+        response["retry_count"] = attempt
+        response["final_query"] = final_query
+        response["retry_token_usage"] = retry_token_usage
+    elif normalize_sql(final_query) != normalize_sql(request.sql_query):
+        # Cached result of a query that needed correction earlier
+        response["final_query"] = final_query
+    
+    return response
+
+def _resolve_statement_timeout(requested: Optional[float], plan_timeout: Optional[int]) -> Optional[float]:
+    """Request may lower the timeout but never exceed the plan's (or the server default)"""
+    ceiling = plan_timeout or SQL_STATEMENT_TIMEOUT_SECONDS
+    if requested and requested > 0:
+        return min(requested, ceiling) if ceiling > 0 else requested
+    return ceiling if ceiling > 0 else None
+
+async def _run_cancellable(http_request: Request, cancel_scope: QueryCancelScope, deadline: float, func, *args, tenant_id=None):
+    """Run a blocking DB call, cancelling it server-side if the client disconnects or the deadline passes"""
+    task = asyncio.ensure_future(run_blocking(func, *args, tenant_id=tenant_id))
+    while not task.done():
+        await asyncio.wait({task}, timeout=SQL_CANCEL_POLL_INTERVAL)
+        if task.done() or cancel_scope.cancelled:
+            continue
+        if time.monotonic() >= deadline:
+            cancel_scope.cancel("request deadline exceeded")
+        elif await http_request.is_disconnected():
+            cancel_scope.cancel("client disconnected")
+    return task.result()
+
+def _cancelled_error(cancel_scope: QueryCancelScope) -> HTTPException:
+    if cancel_scope.reason == "client disconnected":
+        return HTTPException(status_code=499, detail="Client closed request; query cancelled")
+    return HTTPException(status_code=504, detail=f"SQL execution exceeded the {SQL_REQUEST_DEADLINE_SECONDS:g}s request deadline; query cancelled")
+
 @router.post("/execute-sql")
 async def execute_sql_query(
     request: SQLExecuteRequest,
+    http_request: Request,
     current_user: User = Depends(get_current_user)
 ):
     """Execute SQL query with auto-retry and LLM correction (max 5 attempts) with token tracking"""
@@ -664,6 +1043,9 @@ async def execute_sql_query(
     if "I can only generate SELECT queries" in request.sql_query or "cannot modify the database" in request.sql_query:
         raise HTTPException(status_code=400, detail="Query rejected: Data modification not allowed. Only SELECT queries are permitted.")
     
+    if request.result_format == "arrow" and pa is None:
+        raise HTTPException(status_code=400, detail="Arrow output is not available: install 'pyarrow' on the server.")
+    
     # Get user's database connection
     if current_user.id not in user_db_store:
         raise HTTPException(status_code=503, detail="No database connected")
@@ -674,82 +1056,391 @@ async def execute_sql_query(
     db_record = user_data["db_record"]
     plain_password = user_data.get("plain_password")
     
+    # Clients may send the SQL alone: recover the question this session generated it for
+    question = request.question
+    if question is None and query_engine:
+        question = query_engine.question_for_sql(request.sql_query)
+    
     max_retries = 5
     current_query = request.sql_query
     filtered_tables = request.filtered_tables
     retry_token_usage = []
+    repaired_locally = set()  # Queries already run through the local repair
+    failures = []  # (failed query, error) pairs, learned by the fix cache once a query runs
+    cached_fix_key = None  # Fix cache entry behind the query being tried
+    
+    # Row limit / continuation cursor (streaming always returns the full result)
+    page = None
+    if not request.stream:
+        try:
+            page = build_page_request(request.sql_query, request.page_size, request.cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     
-    # Get filtered schema once if tables provided
-    schema = None
-    if filtered_tables and query_engine:
-        schema = query_engine.get_filtered_schema(filtered_tables)
+    tenant_id = _tenant_id(current_user)
+    schema = None  # Filtered schema, loaded only if a correction is needed
     
-    for attempt in range(max_retries):
+    # One deadline covers every attempt; each statement gets at most the time that is left
+    statement_timeout = _resolve_statement_timeout(request.timeout_seconds, user_data.get("plan_query_timeout"))
+    deadline = time.monotonic() + SQL_REQUEST_DEADLINE_SECONDS if SQL_REQUEST_DEADLINE_SECONDS > 0 else float("inf")
+    cancel_scope = QueryCancelScope()
+    
+    # Cost preflight: planner estimates for the SQL as it will run (paged if paging applies)
+    # decide whether to reject, limit or stream the query
+    stream = request.stream
+    preflight = None
+    if request.preflight if request.preflight is not None else SQL_PREFLIGHT_DEFAULT:
         try:
-            result = execute_sql_direct(current_query, db_record, plain_password)
-            
-            data_types = result.get("data_types", {})
-            if not data_types and result["data"]:
-                for col in result["columns"]:
-                    is_array = any(isinstance(row.get(col), list) for row in result["data"])
-                    data_types[col] = "array" if is_array else "scalar"
-            
-            # Segregate data into cards and tables
-            cards = []
-            tables = []
+            preflight = await _run_cancellable(
+                http_request, cancel_scope, deadline,
+                preflight_sql_direct, request.sql_query, db_record, plain_password, statement_timeout, page, cancel_scope,
+                tenant_id=tenant_id
+            )
+        except TenantBusyError:
+            raise
+        except Exception as e:
+            if cancel_scope.cancelled:
+                raise _cancelled_error(cancel_scope)
+            # EXPLAIN failing usually means the SQL itself is broken - let the retry loop deal with it
+            print(f"[SQL PREFLIGHT] EXPLAIN failed: {e}")
+            preflight = {"action": "skipped", "reason": str(e)[:200]}
+        else:
+            action, reason = decide_action(
+                preflight, streaming=stream, paged=page is not None, can_stream=request.result_format == "rows"
+            )
+            preflight.update({"action": action, "reason": reason})
+            if action == "reject":
+                raise HTTPException(status_code=400, detail=f"Query rejected by cost preflight: {reason}. Add filters or a LIMIT and try again.")
+            if action == "limit":
+                page = build_page_request(request.sql_query, SQL_PREFLIGHT_LIMIT_ROWS, None)
+            elif action == "stream":
+                stream = True
+    
+    # Serve repeated dashboard/chat SQL from the result cache (streaming always hits the database).
+    # The key describes the final shape, so it is built after preflight may have limited the query
+    use_cache = request.use_cache and not stream
+    cache_variant = "columnar" if request.result_format in COLUMNAR_RESULT_FORMATS else "rows"
+    if page is not None:
+        cache_variant += f":{page.size}:{request.cursor or ''}"
+    cache_status = "miss" if use_cache else "bypass"
+    if use_cache:
+        cached = result_cache.get(db_record.id, request.sql_query, variant=cache_variant)
+        if cached is not None:
+            if question:
+                query_engine.confirm_generated_sql(question, request.sql_query, cached["final_query"])
+            return _build_execute_response(request, cached["result"], cached["final_query"], 0, [], "hit", preflight)
+    
+    def remember_question() -> bool:
+        # Generated SQL enters the question cache only once it has actually run.
+        # True when this session generated the SQL for the question
+        if not question:
+            return False
+        return query_engine.confirm_generated_sql(question, request.sql_query, current_query)
+    
+    def remember_fix():
+        if cached_fix_key is not None:
+            fix_cache.confirm(cached_fix_key)
+        if failures:
+            fix_cache.learn(db_record.id, failures, current_query)
+    
+    def remember_example(row_count: int):
+        # Only pairs the server generated are shared with other users' prompts, and an empty
+        # result is as likely a wrong filter as a right answer - don't teach it
+        example_store = getattr(query_engine, "example_store", None)
+        if example_store is None or row_count == 0:
+            return
+        # Off the response path; skipped when the tenant has no free worker slot
+        if submit_blocking(example_store.add, question, current_query, tenant_id=tenant_id) is None:
+            print("[FEW SHOT] Skipped storing example: no free worker slot for this tenant")
+    
+    async def run_execution():
+        """
+        Retry loop: execute, and on failure ask the LLM for a corrected query.
+        Returns the raw outcome (not the response) so coalesced requests can each build their own.
+        """
+        nonlocal current_query, schema, cached_fix_key
+        for attempt in range(max_retries):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                cancel_scope.cancel("request deadline exceeded")
+                raise _cancelled_error(cancel_scope)
+            attempt_timeout = remaining if statement_timeout is None else min(statement_timeout, remaining)
+            if attempt_timeout == float("inf"):
+                attempt_timeout = None
+        
+            try:
+                if stream:
+                    # Priming the generator runs the query, so execution errors still go through the retry loop
+                    batches = stream_sql_direct(current_query, db_record, plain_password, request.fetch_size, attempt_timeout, cancel_scope)
+                    columns = await _run_cancellable(http_request, cancel_scope, deadline, next, batches, tenant_id=tenant_id)
+                    remember_fix()
+                    remember_question()
+                    return StreamingResponse(
+                        _ndjson_result_stream(columns, batches, request.sql_query, current_query, preflight),
+                        media_type="application/x-ndjson"
+                    )
+
+                result = await _run_cancellable(
+                    http_request, cancel_scope, deadline,
+                    execute_sql_direct, current_query, db_record, plain_password, request.result_format, page,
+                    attempt_timeout, cancel_scope,
+                    tenant_id=tenant_id
+                )
+                remember_fix()
+                if use_cache:
+                    result_cache.put(db_record.id, request.sql_query, {"result": result, "final_query": current_query}, variant=cache_variant)
             
-            if result["data"] and len(result["data"]) == 1:
-                row = result["data"][0]
-                for key, value in row.items():
-                    data_type = data_types.get(key, "scalar")
-                    if data_type == "array" and isinstance(value, list):
-                        tables.append({"name": key, "data": value})
-                    elif data_type == "scalar":
-                        cards.append({"label": key, "value": value})
+                return {"result": result, "final_query": current_query, "attempt": attempt, "retry_token_usage": retry_token_usage}
             
-            response = {
-                "status": "success",
-                "original_query": request.sql_query,
-                "data": result["data"],
-                "columns": result["columns"],
-                "data_types": data_types,
-                "row_count": len(result["data"]),
-                "cards": cards,
-                "tables": tables
-            }
-            
-            if attempt > 0:
-                response["retry_count"] = attempt
-                response["final_query"] = current_query
-                response["retry_token_usage"] = retry_token_usage
+            except TenantBusyError:
+                raise
+            except Exception as e:
+                error_msg = str(e)
+                print(f"Attempt {attempt + 1} failed: {error_msg}")
             
-            return response
+                if cancel_scope.cancelled or isinstance(e, QueryCancelledError):
+                    raise _cancelled_error(cancel_scope)
+                # A timed-out query is not a syntax problem - don't burn more attempts on it
+                if attempt_timeout and is_timeout_error(error_msg):
+                    raise HTTPException(
+                        status_code=504,
+                        detail=f"SQL execution exceeded the statement timeout ({attempt_timeout:.0f}s): {error_msg}"
+                    )
             
-        except Exception as e:
-            error_msg = str(e)
-            print(f"Attempt {attempt + 1} failed: {error_msg}")
+                failures.append((current_query, error_msg))
+                if attempt == 0 and question:
+                    query_engine.reject_generated_sql(question, request.sql_query)
+                if cached_fix_key is not None:
+                    fix_cache.reject(cached_fix_key)
+                    cached_fix_key = None
             
-            # Last attempt - return error
-            if attempt == max_retries - 1:
-                raise HTTPException(status_code=500, detail=f"SQL execution failed after {max_retries} attempts: {error_msg}")
+                # Last attempt - return error
+                if attempt == max_retries - 1:
+                    raise HTTPException(status_code=500, detail=f"SQL execution failed after {max_retries} attempts: {error_msg}")
             
-            # Try to fix with LLM
-            try:
-                print(f"Attempting LLM fix for attempt {attempt + 2}...")
-                # Use filtered schema if available, otherwise full schema
-                fix_schema = schema if schema else (db_instance.table_info if db_instance else "")
-                if not fix_schema:
-                    print("No schema available for fixing")
+                # Same error seen before on this database: replay the rewrite that fixed it
+                repaired, cached_fix_key = fix_cache.lookup(db_record.id, current_query, error_msg)
+                if repaired:
+                    print(f"[FIX CACHE] Applied cached fix for: {cached_fix_key[1]}")
+                    retry_token_usage.append({
+                        "attempt": attempt + 1,
+                        "error": error_msg[:100],
+                        "tokens": {},
+                        "repaired_by": "fix_cache"
+                    })
+                    current_query = repaired
                     continue
-                current_query, fix_tokens = query_engine.fix_sql_query(current_query, error_msg, fix_schema)
-                retry_token_usage.append({
-                    "attempt": attempt + 1,
-                    "error": error_msg[:100],
-                    "tokens": fix_tokens
-                })
-                print(f"Fixed query: {current_query}")
-            except Exception as fix_error:
-                print(f"LLM fix failed: {fix_error}")
+            
+                # Cheap deterministic repair first: names / quoting checked against the stored schema
+                if query_engine and current_query not in repaired_locally:
+                    repaired_locally.add(current_query)
+                    repaired, fixes = repair_sql(current_query, query_engine.stored_schema, db_record.provider.value)
+                    if repaired:
+                        print(f"[SQL REPAIR] Local fixes: {fixes}")
+                        retry_token_usage.append({
+                            "attempt": attempt + 1,
+                            "error": error_msg[:100],
+                            "tokens": {},
+                            "repaired_by": "local",
+                            "fixes": fixes
+                        })
+                        current_query = repaired
+                        repaired_locally.add(current_query)
+                        continue
+                
+                # Try to fix with LLM
+                try:
+                    print(f"Attempting LLM fix for attempt {attempt + 2}...")
+                    # Get filtered schema once if tables provided
+                    if schema is None and filtered_tables and query_engine:
+                        schema = await run_blocking(query_engine.get_filtered_schema, filtered_tables, tenant_id=tenant_id)
+                    # Use filtered schema if available, otherwise full schema
+                    fix_schema = schema if schema else (
+                        await run_blocking(query_engine.get_filtered_schema, None, tenant_id=tenant_id) if query_engine else ""
+                    )
+                    if not fix_schema:
+                        print("No schema available for fixing")
+                        continue
+                    current_query, fix_tokens = await run_blocking(
+                        query_engine.fix_sql_query, current_query, error_msg, fix_schema, tenant_id=tenant_id
+                    )
+                    retry_token_usage.append({
+                        "attempt": attempt + 1,
+                        "error": error_msg[:100],
+                        "tokens": fix_tokens
+                    })
+                    print(f"Fixed query: {current_query}")
+                except Exception as fix_error:
+                    print(f"LLM fix failed: {fix_error}")
+    
+    if stream:
+        return await run_execution()
+    
+    if not SQL_COALESCE_ENABLED:
+        outcome, shared = await run_execution(), False
+    else:
+        # Identical SQL already running against this database: wait for it instead of running it again
+        flight_key = (db_record.id, normalize_sql(request.sql_query), request.result_format, cache_variant, request.timeout_seconds)
+        try:
+            outcome, shared = await execution_flights.do(flight_key, run_execution)
+        except HTTPException as e:
+            if e.status_code != 499 or await http_request.is_disconnected():
+                raise
+            # The request we were sharing with disconnected and cancelled the query - run our own
+            outcome, shared = await run_execution(), False
+    
+    # Per request, also when the execution was shared: this session's question bookkeeping
+    # and a response echoing this request's own SQL, preflight and cache status
+    current_query = outcome["final_query"]
+    result = outcome["result"]
+    if remember_question():
+        remember_example(result.get("row_count", len(result.get("data") or [])))
+    response = _build_execute_response(
+        request, result, current_query, outcome["attempt"], outcome["retry_token_usage"], cache_status, preflight
+    )
+    if not shared:
+        return response
+    if isinstance(response, Response):
+        response.headers["X-Coalesced"] = "true"
+        return response
+    return JSONResponse(content=jsonable_encoder(response), headers={"X-Coalesced": "true"})
+
+def _export_producer(sql_query: str, db_record: DBModel, plain_password: str, export_format: str,
+                     timeout_seconds: Optional[float], cancel_scope: QueryCancelScope):
+    """Blocking export body run by ThreadedExport: COPY for Postgres CSV, unbuffered cursor otherwise"""
+    cleaned_query = _prepare_sql_for_execution(sql_query, db_record)
+    provider = db_record.provider.value
+    
+    def produce(writer):
+        pool = get_pool(db_record, plain_password)
+        conn = pool.acquire()
+        completed = False
+        try:
+            _begin_guarded_statement(pool, conn, provider, timeout_seconds, cancel_scope)
+            if provider == "postgres" and export_format == "csv":
+                copy_postgres_csv(conn, cleaned_query, writer)
+            else:
+                cursor = _open_streaming_cursor(conn, provider, EXPORT_FETCH_SIZE)
+                try:
+                    cursor.execute(cleaned_query)
+                    if export_format == "parquet":
+                        write_cursor_parquet(cursor, writer, EXPORT_FETCH_SIZE, provider=provider)
+                    else:
+                        write_cursor_csv(cursor, writer, EXPORT_FETCH_SIZE)
+                finally:
+                    cursor.close()
+            completed = True
+        finally:
+            if completed:
+                completed = _end_guarded_statement(conn, provider, timeout_seconds, cancel_scope)
+            else:
+                cancel_scope.unbind()
+            pool.release(conn, discard=not completed)
+    
+    return produce
+
+@router.post("/export")
+async def export_sql_result(
+    request: ExportRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Stream a SELECT result as CSV or Parquet without materializing it in memory"""
+    _assert_select_only_sql(request.sql_query)
+    
+    if request.format == "parquet" and pa is None:
+        raise HTTPException(status_code=400, detail="Parquet export is not available: install 'pyarrow' on the server.")
+    
+    if current_user.id not in user_db_store:
+        raise HTTPException(status_code=503, detail="No database connected")
+    
+    user_data = user_db_store[current_user.id]
+    db_record = user_data["db_record"]
+    plain_password = user_data.get("plain_password")
+    
+    ceiling = user_data.get("plan_query_timeout") or SQL_EXPORT_TIMEOUT_SECONDS
+    timeout_seconds = min(request.timeout_seconds, ceiling) if request.timeout_seconds and request.timeout_seconds > 0 else ceiling
+    
+    cancel_scope = QueryCancelScope()
+    export = ThreadedExport(
+        _export_producer(request.sql_query, db_record, plain_password, request.format, timeout_seconds, cancel_scope),
+        on_abort=lambda: cancel_scope.cancel("client disconnected")
+    )
+    try:
+        first_chunk = await export.start(tenant_id=_tenant_id(current_user))
+    except TenantBusyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Export failed: {str(e)}")
+    
+    filename = re.sub(r"[^\w.-]", "_", request.filename or f"{db_record.db_name}_export")
+    media_type = "text/csv" if request.format == "csv" else "application/vnd.apache.parquet"
+    return StreamingResponse(
+        export.body(first_chunk),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{request.format}"'}
+    )
+
+def _refresh_schema_ddl(db_record: DBModel, plain_password: str) -> Dict[str, str]:
+    """Re-reflect every selected table live and replace the persisted DDL cache (blocking)"""
+    sql_db = engine_registry.acquire(create_connection_uri(db_record, plain_password), sample_rows_in_table_info=1)
+    try:
+        engine_registry.forget_reflection(sql_db)
+        schema_db = engine_registry.variant(sql_db, sample_rows_in_table_info=0)
+        entries = {table: schema_db.get_table_info(table_names=[table]) for table in _selected_table_names(sql_db, db_record)}
+    finally:
+        engine_registry.release(sql_db)
+    _persist_schema_ddl(db_record.id, entries, replace=True)
+    return entries
+
+@router.post("/schema-cache/refresh")
+async def refresh_schema_cache(
+    request: ConnectRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Rebuild the cached CREATE TABLE text used for prompts (e.g. after a migration on the source DB)"""
+    db_record = db.query(DBModel).filter(DBModel.id == request.database_id).first()
+    if not db_record:
+        raise HTTPException(status_code=404, detail="Database not found")
+    if current_user.role.value != "internal_superuser" and db_record.client_id != current_user.client_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    try:
+        plain_password = decrypt_password(db_record.password)
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Invalid database password")
+    
+    try:
+        entries = await run_blocking(_refresh_schema_ddl, db_record, plain_password, tenant_id=_tenant_id(current_user))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Schema refresh failed: {str(e)}")
+    
+    # Sessions already connected to this database pick up the new DDL immediately
+    for user_data in user_db_store.values():
+        if user_data["db_record"].id == db_record.id:
+            user_data["query_engine"].ddl_cache.replace(entries)
+    
+    return {
+        "status": "success",
+        "database_id": db_record.id,
+        "tables_cached": len(entries)
+    }
+
+@router.get("/execution-metrics")
+async def get_execution_metrics(current_user: User = Depends(get_current_user)):
+    """Coalescing, result / fix cache, connection pool and worker pool counters for /execute-sql"""
+    if current_user.role.value != "internal_superuser":
+        raise HTTPException(status_code=403, detail="Access denied")
+    return {
+        "coalescing": execution_flights.stats(),
+        "result_cache": result_cache.stats(),
+        "connection_pools": get_pool_stats(),
+        "engines": engine_registry.stats(),
+        "question_cache": get_question_cache_stats(),
+        "fix_cache": fix_cache.stats(),
+        "few_shot_examples": get_example_store_stats(),
+        "concurrency": get_concurrency_stats()
+    }
 
 def serialize_datetime(obj):
     """Serialize datetime objects"""
@@ -776,13 +1467,8 @@ def categorize_columns(data, columns):
         data_types[col] = "array" if is_array else "scalar"
     return data_types
 
-def execute_sql_direct(sql_query: str, db_record: DBModel = None, plain_password: str = None):
-    """Execute SQL directly on database"""
-    if db_record is None:
-        raise Exception("No database configuration available")
-    if plain_password is None:
-        raise Exception("Database password required")
-    
+def _prepare_sql_for_execution(sql_query: str, db_record: DBModel) -> str:
+    """Strip markdown fences / extra statements and apply provider-specific fixes"""
     cleaned_query = sql_query.strip().replace("```sql", "").replace("```", "")
     
     statements = [s.strip() for s in cleaned_query.split(';') if s.strip()]
@@ -808,54 +1494,110 @@ def execute_sql_direct(sql_query: str, db_record: DBModel = None, plain_password
     
     if db_record.provider.value == "postgres":
         cleaned_query = fix_column_casing(cleaned_query)
-    #postgres connection -----------------
+    return cleaned_query
+
+def _begin_guarded_statement(pool, conn, provider: str, timeout_seconds: Optional[float], cancel_scope: Optional[QueryCancelScope]):
+    """Apply the statement timeout and register the connection with the request's cancel scope"""
+    if timeout_seconds:
+        set_statement_timeout(conn, provider, timeout_seconds)
+    if cancel_scope is not None:
+        cancel_scope.bind(lambda: pool.cancel(conn))
+
+def _end_guarded_statement(conn, provider: str, timeout_seconds: Optional[float], cancel_scope: Optional[QueryCancelScope]) -> bool:
+    """Undo _begin_guarded_statement; returns False if the connection should not be reused"""
+    if cancel_scope is not None:
+        cancel_scope.unbind()
+    if timeout_seconds:
+        try:
+            reset_statement_timeout(conn, provider)
+        except Exception:
+            return False
+    return True
+
+def preflight_sql_direct(sql_query: str, db_record: DBModel, plain_password: str, timeout_seconds: Optional[float] = None,
+                         page: Optional[PageRequest] = None, cancel_scope: Optional[QueryCancelScope] = None) -> Dict:
+    """EXPLAIN the query (wrapped for the page when paging applies) and return the planner's estimates"""
+    cleaned_query = _prepare_sql_for_execution(sql_query, db_record)
+    provider = db_record.provider.value
+    params = None
+    if page is not None:
+        cleaned_query, params, _ = build_page_sql(cleaned_query, provider, page)
+    pool = get_pool(db_record, plain_password)
+    conn = pool.acquire()
+    reusable = False
     try:
-        if db_record.provider.value == "postgres":
-            conn = psycopg2.connect(
-                host=db_record.host,
-                port=db_record.port,
-                database=db_record.db_name,
-                user=db_record.user,
-                password=plain_password
-            )
-            
+        # Same guard as execution: a disconnect or deadline cancels a slow EXPLAIN too
+        _begin_guarded_statement(pool, conn, provider, timeout_seconds, cancel_scope)
+        explained = False
+        try:
+            estimate = explain_query(conn, provider, cleaned_query, params)
+            explained = True
+        finally:
+            reusable = _end_guarded_statement(conn, provider, timeout_seconds, cancel_scope) and explained
+    finally:
+        pool.release(conn, discard=not reusable)
+    return estimate
+
+def execute_sql_direct(sql_query: str, db_record: DBModel = None, plain_password: str = None, result_format: str = "rows",
+                       page: Optional[PageRequest] = None, timeout_seconds: Optional[float] = None,
+                       cancel_scope: Optional[QueryCancelScope] = None):
+    """Execute SQL directly on database.
+    
+    result_format="rows" returns a list of row dicts; "columnar" (also used for "arrow")
+    returns column-major values built straight from cursor batches.
+    When page is given the query is wrapped with a provider-specific row limit and the
+    result carries a "page" block (has_more / next_cursor).
+    timeout_seconds sets a server-side statement timeout; cancel_scope lets the caller
+    cancel the running statement from another thread.
+    """
+    if db_record is None:
+        raise Exception("No database configuration available")
+    if plain_password is None:
+        raise Exception("Database password required")
+    
+    cleaned_query = _prepare_sql_for_execution(sql_query, db_record)
+    columnar = result_format in COLUMNAR_RESULT_FORMATS
+    params = None
+    if page is not None:
+        cleaned_query, params, page_plan = build_page_sql(cleaned_query, db_record.provider.value, page)
+
+    provider = db_record.provider.value
+
+    # All providers share the pooled connection for this database record
+    try:
+        pool = get_pool(db_record, plain_password)
+        conn = pool.acquire()
+        reusable = False
+        try:
+            _begin_guarded_statement(pool, conn, provider, timeout_seconds, cancel_scope)
             cursor = conn.cursor()
-            cursor.execute(cleaned_query)
-            
-            columns = [desc[0] for desc in cursor.description] if cursor.description else []
-            results = cursor.fetchall()
-            
-            data = []
-            for row in results:
-                if len(columns) > 0:
-                    row_dict = {}
-                    for col, val in zip(columns, row):
-                        row_dict[col] = serialize_datetime(val)
-                    data.append(row_dict)
+            try:
+                cursor.execute(cleaned_query, params)
+                columns = [desc[0] for desc in cursor.description] if cursor.description else []
+                if columnar and page is None:
+                    builder = ColumnarResultBuilder(columns)
+                    batch = cursor.fetchmany(SQL_STREAM_FETCH_SIZE)
+                    while batch:
+                        builder.add_batch(batch)
+                        batch = cursor.fetchmany(SQL_STREAM_FETCH_SIZE)
                 else:
-                    data.append({"result": str(row)})
-            
-            cursor.close()
-            conn.close()
-            
-            data_types = categorize_columns(data, columns)
-            return {"data": data, "columns": columns if columns else ["result"], "data_types": data_types}
-            
-        elif db_record.provider.value == "mysql":
-            conn = pymysql.connect(
-                host=db_record.host,
-                port=db_record.port,
-                database=db_record.db_name,
-                user=db_record.user,
-                password=plain_password
-            )
-            
-            cursor = conn.cursor()
-            cursor.execute(cleaned_query)
-            
-            columns = [desc[0] for desc in cursor.description] if cursor.description else []
-            results = cursor.fetchall()
-            
+                    results = cursor.fetchall()
+            finally:
+                cursor.close()
+                reusable = _end_guarded_statement(conn, provider, timeout_seconds, cancel_scope)
+        finally:
+            pool.release(conn, discard=not reusable)
+
+        page_meta = None
+        if page is not None:
+            results, page_meta = finish_page(results, columns, page, page_plan)
+            if columnar:
+                builder = ColumnarResultBuilder(columns)
+                builder.add_batch(results)
+
+        if columnar:
+            result = builder.result()
+        else:
             data = []
             for row in results:
                 if len(columns) > 0:
@@ -865,46 +1607,117 @@ def execute_sql_direct(sql_query: str, db_record: DBModel = None, plain_password
                     data.append(row_dict)
                 else:
                     data.append({"result": str(row)})
-            
-            cursor.close()
-            conn.close()
-            
+
             data_types = categorize_columns(data, columns)
-            return {"data": data, "columns": columns if columns else ["result"], "data_types": data_types}
-            
-        elif db_record.provider.value == "mssql":
-            conn = pymssql.connect(
-                server=db_record.host,
-                port=db_record.port,
-                database=db_record.db_name,
-                user=db_record.user,
-                password=plain_password
-            )
-            
-            cursor = conn.cursor()
+            result = {"data": data, "columns": columns if columns else ["result"], "data_types": data_types}
+
+        if page_meta is not None:
+            result["page"] = page_meta
+        return result
+
+    except Exception as e:
+        raise Exception(f"SQL execution failed: {str(e)}")
+
+def _open_streaming_cursor(conn, provider: str, fetch_size: int):
+    """Server-side cursor so rows are pulled from the database in batches"""
+    if provider == "postgres":
+        # Named cursor => DECLARE ... CURSOR on the server
+        cursor = conn.cursor(name=f"nlp_stream_{uuid.uuid4().hex}")
+        cursor.itersize = fetch_size
+        return cursor
+    elif provider == "mysql":
+        return conn.cursor(pymysql.cursors.SSCursor)
+    # pymssql reads rows from the TDS stream as they are fetched
+    return conn.cursor()
+
+def stream_sql_direct(sql_query: str, db_record: DBModel = None, plain_password: str = None, fetch_size: int = None,
+                      timeout_seconds: Optional[float] = None, cancel_scope: Optional[QueryCancelScope] = None):
+    """
+    Execute SQL with a server-side cursor.
+    Yields the column list first, then lists of row dicts of at most fetch_size rows,
+    so memory stays flat regardless of result size.
+    """
+    if db_record is None:
+        raise Exception("No database configuration available")
+    if plain_password is None:
+        raise Exception("Database password required")
+    
+    fetch_size = max(1, min(fetch_size or SQL_STREAM_FETCH_SIZE, SQL_STREAM_MAX_FETCH_SIZE))
+    cleaned_query = _prepare_sql_for_execution(sql_query, db_record)
+    provider = db_record.provider.value
+    
+    try:
+        pool = get_pool(db_record, plain_password)
+        conn = pool.acquire()
+    except Exception as e:
+        raise Exception(f"SQL execution failed: {str(e)}")
+    
+    completed = False
+    try:
+        try:
+            # Timeout applies to each fetch round trip as well as the initial execute
+            _begin_guarded_statement(pool, conn, provider, timeout_seconds, cancel_scope)
+            cursor = _open_streaming_cursor(conn, provider, fetch_size)
             cursor.execute(cleaned_query)
-            
+            # psycopg2 named cursors only expose description after the first fetch
+            batch = cursor.fetchmany(fetch_size)
             columns = [desc[0] for desc in cursor.description] if cursor.description else []
-            results = cursor.fetchall()
-            
-            data = []
-            for row in results:
-                if len(columns) > 0:
-                    row_dict = {}
-                    for col, val in zip(columns, row):
-                        row_dict[col] = serialize_datetime(val)
-                    data.append(row_dict)
-                else:
-                    data.append({"result": str(row)})
-            
-            cursor.close()
-            conn.close()
-            
-            data_types = categorize_columns(data, columns)
-            return {"data": data, "columns": columns if columns else ["result"], "data_types": data_types}
-            
+        except Exception as e:
+            raise Exception(f"SQL execution failed: {str(e)}")
+        
+        yield columns if columns else ["result"]
+        
+        while batch:
+            if columns:
+                yield [{col: serialize_datetime(val) for col, val in zip(columns, row)} for row in batch]
+            else:
+                yield [{"result": str(row)} for row in batch]
+            batch = cursor.fetchmany(fetch_size)
+        
+        cursor.close()
+        completed = True
+    finally:
+        if completed:
+            completed = _end_guarded_statement(conn, provider, timeout_seconds, cancel_scope)
+        elif cancel_scope is not None:
+            cancel_scope.unbind()
+        # A half-read server-side cursor leaves the connection busy - don't reuse it
+        pool.release(conn, discard=not completed)
+
+def _json_default(obj):
+    """JSON fallback for driver types (Decimal, date, UUID, bytes...)"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime, date, dt_time)):
+        return obj.isoformat()
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return bytes(obj).hex()
+    return str(obj)
+
+def _ndjson_result_stream(columns: list, batches, original_query: str, final_query: str, preflight: Optional[Dict] = None):
+    """Encode a primed stream_sql_direct generator as NDJSON lines"""
+    header = {
+        "type": "columns",
+        "status": "success",
+        "original_query": original_query,
+        "final_query": final_query,
+        "columns": columns
+    }
+    if preflight is not None:
+        header["preflight"] = preflight
+    yield json.dumps(header, default=_json_default) + "\n"
+    
+    row_count = 0
+    try:
+        for rows in batches:
+            row_count += len(rows)
+            yield json.dumps({"type": "rows", "rows": rows}, default=_json_default) + "\n"
     except Exception as e:
-        raise Exception(f"SQL execution failed: {str(e)}")
+        # Headers are already sent - report the failure in-band
+        yield json.dumps({"type": "error", "detail": str(e), "row_count": row_count}) + "\n"
+        return
+    
+    yield json.dumps({"type": "end", "row_count": row_count}) + "\n"
 
 @router.get("/health")
 async def health_check():
@@ -935,6 +1748,7 @@ async def health_check():
         "endpoints": {
             "/database/connect": "Connect database with session ID",
             "/database/query": "NLP query with memory",
+            "/database/query/stream": "NLP query as server-sent events (stages, SQL tokens, first page)",
             "/database/query-and-execute": "Generate & execute SQL",
             "/database/conversation/history": "Get conversation history",
             "/database/conversation/clear": "Clear conversation",
@@ -1007,6 +1821,7 @@ async def test_geo_resolver_endpoint(request: dict):
         # Get database config from DB (bypassing auth for this test endpoint)
         from db_config import SessionLocal
         db_session = SessionLocal()
+        db_instance = None
         try:
             db_record = db_session.query(DBModel).filter_by(id=database_id).first()
             if not db_record:
@@ -1020,7 +1835,7 @@ async def test_geo_resolver_endpoint(request: dict):
             connection_uri = create_connection_uri(db_record, plain_password)
             
             try:
-                db_instance = SQLDatabase.from_uri(connection_uri)
+                db_instance = engine_registry.acquire(connection_uri, sample_rows_in_table_info=1)
                 print(f"[TEST ENDPOINT] Connected to database: {db_record.db_name}")
             except Exception as e:
                 return {
@@ -1058,6 +1873,8 @@ async def test_geo_resolver_endpoint(request: dict):
                 }
         finally:
             db_session.close()
+            if db_instance is not None:
+                engine_registry.release(db_instance)
     
     except Exception as e:
         import traceback
@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from langchain_community.utilities.sql_database import SQLDatabase
+from sqlalchemy import MetaData, create_engine
+
+# Engines with no users left are disposed after this many seconds
+ENGINE_IDLE_TIMEOUT = float(os.getenv("ENGINE_IDLE_TIMEOUT", "900"))
+ENGINE_REAP_INTERVAL = float(os.getenv("ENGINE_REAP_INTERVAL", "60"))  # Background dispose_idle sweep (0 = only on acquire)
+
+DEFAULT_ENGINE_ARGS = {"pool_pre_ping": True, "pool_recycle": 300}
+
+
+class _EngineEntry:
+    def __init__(self, engine):
+        self.engine = engine
+        self.metadata = MetaData()  # Shared by every SQLDatabase view, so each table is reflected once
+        self.reflect_lock = threading.Lock()
+        self.databases: Dict[Tuple, SQLDatabase] = {}
+        self.refcount = 0
+        self.idle_since: Optional[float] = time.monotonic()
+
+
+class _SharedSQLDatabase(SQLDatabase):
+    """SQLDatabase whose MetaData is shared with other views: reflection and reads of it are serialized per engine"""
+
+    def __init__(self, engine, reflect_lock: threading.Lock, **kwargs):
+        self._reflect_lock = reflect_lock
+        super().__init__(engine, **kwargs)
+
+    def get_table_info(self, table_names: Optional[List[str]] = None, get_col_comments: bool = False) -> str:
+        wanted = set(table_names if table_names is not None else self.get_usable_table_names())
+        with self._reflect_lock:
+            reflected = {table.name for table in self._metadata.sorted_tables}
+            missing = (wanted & set(self.get_usable_table_names())) - reflected
+            if missing:
+                self._metadata.reflect(views=self._view_support, bind=self._engine, only=list(missing), schema=self._schema)
+            # The base implementation iterates the shared MetaData: another view reflecting
+            # concurrently would change its table dict mid-iteration
+            return super().get_table_info(table_names=table_names, get_col_comments=get_col_comments)
+
+
+def _freeze(options: Dict) -> Tuple:
+    return tuple(sorted((key, tuple(value) if isinstance(value, list) else value) for key, value in options.items()))
+
+
+class EngineRegistry:
+    """
+    Process-wide SQLAlchemy engines keyed by connection URI + engine options.
+    SQLDatabase wrappers built on an engine share its pool and reflected metadata;
+    reference counts decide when an unused engine may be disposed.
+    """
+
+    def __init__(self, idle_timeout: float = ENGINE_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._entries: Dict[Tuple, _EngineEntry] = {}
+        self._lock = threading.Lock()
+        self._reaper_stop = threading.Event()
+        self._reaper: Optional[threading.Thread] = None
+
+    def _reap(self, interval: float, stop: threading.Event):
+        while not stop.wait(interval):
+            try:
+                disposed = self.dispose_idle()
+                if disposed:
+                    print(f"[ENGINES] Disposed {disposed} idle engine(s)")
+            except Exception as e:
+                print(f"[ENGINES] Idle sweep failed: {e}")
+
+    def _ensure_reaper_locked(self):
+        if ENGINE_REAP_INTERVAL <= 0 or (self._reaper is not None and not self._reaper_stop.is_set()):
+            return
+        self._reaper_stop = threading.Event()  # A stopping reaper keeps its own, already set event
+        self._reaper = threading.Thread(
+            target=self._reap, args=(ENGINE_REAP_INTERVAL, self._reaper_stop), name="engine-reaper", daemon=True
+        )
+        self._reaper.start()
+
+    def _get_entry_locked(self, uri: str, engine_args: Dict) -> _EngineEntry:
+        key = (uri, _freeze(engine_args))
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = _EngineEntry(create_engine(uri, **engine_args))
+            self._entries[key] = entry
+        return entry
+
+    def _entry_for_engine_locked(self, engine) -> Optional[_EngineEntry]:
+        for entry in self._entries.values():
+            if entry.engine is engine:
+                return entry
+        return None
+
+    def _database_for_entry(self, entry: _EngineEntry, options: Dict) -> SQLDatabase:
+        key = _freeze(options)
+        with self._lock:
+            database = entry.databases.get(key)
+        if database is not None:
+            return database
+        # Built outside the lock (lists tables over the network). Lazy reflection: tables are
+        # reflected the first time their schema is asked for
+        database = _SharedSQLDatabase(
+            entry.engine, entry.reflect_lock, metadata=entry.metadata, lazy_table_reflection=True, **options
+        )
+        with self._lock:
+            return entry.databases.setdefault(key, database)
+
+    def acquire(self, uri: str, engine_args: Optional[Dict] = None, **options) -> SQLDatabase:
+        """Shared SQLDatabase for a URI; pair every acquire() with a release()"""
+        engine_args = DEFAULT_ENGINE_ARGS if engine_args is None else engine_args
+        self.dispose_idle()
+        with self._lock:
+            entry = self._get_entry_locked(uri, engine_args)
+            entry.refcount += 1
+            entry.idle_since = None
+            self._ensure_reaper_locked()
+        try:
+            return self._database_for_entry(entry, options)
+        except Exception:
+            self.release_engine(entry.engine)
+            raise
+
+    def release(self, database: SQLDatabase):
+        self.release_engine(database._engine)
+
+    def release_engine(self, engine):
+        with self._lock:
+            entry = self._entry_for_engine_locked(engine)
+            if entry is None or entry.refcount == 0:
+                return
+            entry.refcount -= 1
+            if entry.refcount == 0:
+                entry.idle_since = time.monotonic()
+
+    def variant(self, database: SQLDatabase, **options) -> SQLDatabase:
+        """Another view (e.g. without sample rows) on the engine of an already acquired SQLDatabase"""
+        with self._lock:
+            entry = self._entry_for_engine_locked(database._engine)
+        if entry is None:
+            # Not registry-managed: build a one-off view on the same engine
+            return SQLDatabase(database._engine, lazy_table_reflection=True, **options)
+        return self._database_for_entry(entry, options)
+
+    def forget_reflection(self, database: SQLDatabase):
+        """Drop reflected tables for an engine so the next lookup reflects them again"""
+        with self._lock:
+            entry = self._entry_for_engine_locked(database._engine)
+        if entry is not None:
+            with entry.reflect_lock:
+                entry.metadata.clear()
+
+    def dispose_idle(self) -> int:
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            expired = [
+                key for key, entry in self._entries.items()
+                if entry.refcount == 0 and entry.idle_since is not None and entry.idle_since < cutoff
+            ]
+            entries = [self._entries.pop(key) for key in expired]
+        for entry in entries:
+            entry.engine.dispose()
+        return len(entries)
+
+    def dispose_all(self):
+        self._reaper_stop.set()
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            entry.engine.dispose()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "engines": len(self._entries),
+                "in_use": sum(1 for entry in self._entries.values() if entry.refcount > 0),
+                "views": sum(len(entry.databases) for entry in self._entries.values()),
+                "reflected_tables": sum(len(entry.metadata.tables) for entry in self._entries.values())
+            }
+
+
+# Shared instance for connect, schema lookups and the geo test endpoint
+engine_registry = EngineRegistry()
@@ -0,0 +1,296 @@
+import asyncio
+import csv
+import io
+import os
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+from typing import Callable, List, Optional
+
+from utils.concurrency import run_blocking
+
+# Optional dependency: Parquet export
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Bulk export (/database/export) tuning
+EXPORT_FETCH_SIZE = int(os.getenv("EXPORT_FETCH_SIZE", "10000"))              # Rows per cursor round trip
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", str(256 * 1024)))     # Bytes per chunk sent to the client
+EXPORT_QUEUE_CHUNKS = int(os.getenv("EXPORT_QUEUE_CHUNKS", "8"))               # Chunks buffered ahead of a slow client
+EXPORT_PARQUET_ROW_GROUP_ROWS = int(os.getenv("EXPORT_PARQUET_ROW_GROUP_ROWS", "100000"))
+
+_DONE = object()
+
+
+class ExportAborted(Exception):
+    """The client went away; stop producing"""
+    pass
+
+
+class _ChunkWriter:
+    """File-like sink that groups small writes into EXPORT_CHUNK_BYTES chunks"""
+
+    def __init__(self, emit: Callable[[bytes], None]):
+        self._emit = emit
+        self._buffer = bytearray()
+        self.closed = False
+        self._position = 0
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self._buffer += data
+        self._position += len(data)
+        if len(self._buffer) >= EXPORT_CHUNK_BYTES:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if self._buffer:
+            self._emit(bytes(self._buffer))
+            self._buffer = bytearray()
+
+    def tell(self):
+        return self._position
+
+    def close(self):
+        self.flush()
+        self.closed = True
+
+
+class ThreadedExport:
+    """
+    Runs a blocking producer on the worker pool and exposes its output as an async byte stream.
+    The queue is bounded, so a slow client back-pressures the database read instead of
+    buffering the whole extract in memory.
+    """
+
+    def __init__(self, produce: Callable[[_ChunkWriter], None], on_abort: Optional[Callable] = None):
+        self._produce = produce
+        self._on_abort = on_abort
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, EXPORT_QUEUE_CHUNKS))
+        self._loop = None
+        self._task = None
+        self._stopped = False
+        self._finished = False
+
+    def _emit(self, chunk: bytes):
+        if self._stopped:
+            raise ExportAborted()
+        asyncio.run_coroutine_threadsafe(self._queue.put(chunk), self._loop).result()
+
+    def _run(self):
+        outcome = _DONE
+        try:
+            writer = _ChunkWriter(self._emit)
+            self._produce(writer)
+            writer.close()
+        except BaseException as e:
+            outcome = e
+        if not self._stopped:
+            asyncio.run_coroutine_threadsafe(self._queue.put(outcome), self._loop).result()
+
+    async def _next(self):
+        item = await self._queue.get()
+        if item is _DONE:
+            self._finished = True
+            return None
+        if isinstance(item, BaseException):
+            self._finished = True
+            raise item
+        return item
+
+    async def start(self, tenant_id=None) -> Optional[bytes]:
+        """Start producing and wait for the first chunk, so setup/SQL errors surface before headers are sent"""
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.ensure_future(run_blocking(self._run, tenant_id=tenant_id))
+        try:
+            return await self._next()
+        except BaseException:
+            await self._task
+            raise
+
+    async def body(self, first_chunk: Optional[bytes]):
+        try:
+            if first_chunk is not None:
+                yield first_chunk
+            while True:
+                chunk = await self._next()
+                if chunk is None:
+                    break
+                yield chunk
+        except Exception as e:
+            # Headers are already sent; the client sees a truncated download
+            print(f"[EXPORT] Failed mid-stream: {e}")
+            raise
+        finally:
+            if not self._finished:
+                self._stopped = True
+                if self._on_abort is not None:
+                    self._on_abort()
+                # Unblock a producer waiting on a full queue
+                while not self._queue.empty():
+                    self._queue.get_nowait()
+
+
+def _csv_value(value):
+    if isinstance(value, (datetime, date, dt_time)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    return value
+
+
+def copy_postgres_csv(conn, sql_query: str, writer):
+    """Postgres: let the server format CSV via COPY ... TO STDOUT"""
+    cursor = conn.cursor()
+    try:
+        cursor.copy_expert(f"COPY ({sql_query}) TO STDOUT WITH (FORMAT CSV, HEADER)", writer)
+    finally:
+        cursor.close()
+
+
+def _read_batches(cursor, fetch_size: int):
+    """(columns, first batch) - psycopg2 named cursors only expose description after a fetch"""
+    batch = cursor.fetchmany(fetch_size)
+    columns = [desc[0] for desc in cursor.description] if cursor.description else ["result"]
+    return columns, batch
+
+
+def write_cursor_csv(cursor, writer, fetch_size: int = EXPORT_FETCH_SIZE):
+    """CSV from an executed unbuffered cursor, one batch at a time"""
+    columns, batch = _read_batches(cursor, fetch_size)
+    text = io.StringIO()
+    csv_writer = csv.writer(text)
+    csv_writer.writerow(columns)
+    while batch:
+        csv_writer.writerows([[_csv_value(v) for v in row] for row in batch])
+        writer.write(text.getvalue())
+        text.seek(0)
+        text.truncate()
+        batch = cursor.fetchmany(fetch_size)
+    writer.write(text.getvalue())
+
+
+# DB-API type codes whose Parquet type is fixed by the driver, per provider
+_DECLARED_KINDS = {
+    "postgres": {16: "bool", 20: "int", 21: "int", 23: "int", 700: "float", 701: "float", 1700: "decimal"},   # psycopg2 OIDs
+    "mysql": {1: "int", 2: "int", 3: "int", 8: "int", 9: "int", 13: "int", 4: "float", 5: "float", 0: "decimal", 246: "decimal"},  # pymysql FIELD_TYPE
+    "mssql": {5: "decimal"},  # pymssql DECIMAL
+}
+_WIDE_DECIMAL_PRECISION = 76   # decimal256: 38 integer and 38 fractional digits
+_WIDE_DECIMAL_SCALE = 38
+
+
+def _declared_type(provider: Optional[str], description) -> Optional["pa.DataType"]:
+    """Parquet type from cursor.description when the driver reports one"""
+    kind = _DECLARED_KINDS.get(provider or "", {}).get(description[1])
+    if kind == "bool":
+        return pa.bool_()
+    if kind == "int":
+        return pa.int64()
+    if kind == "float":
+        return pa.float64()
+    if kind == "decimal":
+        precision = description[4] if len(description) > 4 else None
+        scale = description[5] if len(description) > 5 else None
+        if isinstance(scale, int) and 0 <= scale <= 38 and (precision is None or precision <= 38):
+            return pa.decimal128(38, scale)
+        # Unconstrained NUMERIC (e.g. AVG/SUM results): scale is not known until the values arrive
+        return pa.decimal256(_WIDE_DECIMAL_PRECISION, _WIDE_DECIMAL_SCALE)
+    return None
+
+
+def _inferred_type(values) -> "pa.DataType":
+    """Widest type the sampled values need: ints -> int64, any float -> float64, decimals -> wide decimal"""
+    kinds = {type(v) for v in values if v is not None}
+    if not kinds:
+        return pa.string()
+    if kinds == {bool}:
+        return pa.bool_()
+    if kinds == {int}:
+        return pa.int64() if all(-2 ** 63 <= v < 2 ** 63 for v in values if v is not None) else pa.string()
+    if kinds <= {int, float}:
+        return pa.float64()
+    if kinds <= {int, Decimal}:
+        return pa.decimal256(_WIDE_DECIMAL_PRECISION, _WIDE_DECIMAL_SCALE)
+    if kinds <= {int, float, Decimal}:
+        return pa.float64()
+    try:
+        arrow_type = pa.array(values).type
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        return pa.string()
+    return pa.string() if pa.types.is_null(arrow_type) else arrow_type
+
+
+def _parquet_schema(columns: List[str], rows, description=None, provider: Optional[str] = None) -> "pa.Schema":
+    """Column types from cursor.description where the driver declares them, otherwise from the first row group"""
+    fields = []
+    for index, name in enumerate(columns):
+        arrow_type = None
+        if description and index < len(description):
+            arrow_type = _declared_type(provider, description[index])
+        if arrow_type is None:
+            arrow_type = _inferred_type([row[index] for row in rows])
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+def _parquet_column(field: "pa.Field", values) -> "pa.Array":
+    """One column, converted without losing data - a value that does not fit raises instead of being truncated"""
+    if pa.types.is_string(field.type):
+        values = [None if v is None else (v if isinstance(v, str) else str(_csv_value(v))) for v in values]
+    elif pa.types.is_integer(field.type):
+        for v in values:
+            if v is not None and not isinstance(v, int):
+                raise ValueError(f"Column {field.name!r}: {v!r} is not an integer")
+    elif pa.types.is_floating(field.type):
+        values = [float(v) if isinstance(v, Decimal) else v for v in values]
+    # Decimal conversion raises ArrowInvalid rather than rounding
+    return pa.array(values, type=field.type)
+
+
+def _parquet_batch(schema: "pa.Schema", rows) -> "pa.RecordBatch":
+    arrays = [_parquet_column(field, [row[index] for row in rows]) for index, field in enumerate(schema)]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write_cursor_parquet(cursor, writer, fetch_size: int = EXPORT_FETCH_SIZE, provider: Optional[str] = None):
+    """
+    Parquet from an executed unbuffered cursor; row groups are flushed as they fill.
+    The schema is fixed before the first row group is written, from the driver's declared
+    types plus the whole first row group, so later batches never need a narrower type.
+    """
+    if pa is None:
+        raise RuntimeError("Parquet export requires the 'pyarrow' package")
+
+    columns, batch = _read_batches(cursor, fetch_size)
+    description = cursor.description
+    pending_rows = []
+    while batch:
+        pending_rows.extend(batch)
+        if len(pending_rows) >= EXPORT_PARQUET_ROW_GROUP_ROWS:
+            break
+        batch = cursor.fetchmany(fetch_size)
+
+    schema = _parquet_schema(columns, pending_rows, description, provider)
+    parquet_writer = pq.ParquetWriter(writer, schema, compression="snappy")
+    try:
+        pending = [_parquet_batch(schema, pending_rows)] if pending_rows else []
+        pending_count = len(pending_rows)
+        del pending_rows
+        while batch:
+            if pending_count >= EXPORT_PARQUET_ROW_GROUP_ROWS:
+                parquet_writer.write_table(pa.Table.from_batches(pending, schema=schema))
+                pending, pending_count = [], 0
+            batch = cursor.fetchmany(fetch_size)
+            if batch:
+                pending.append(_parquet_batch(schema, batch))
+                pending_count += len(batch)
+        if pending:
+            parquet_writer.write_table(pa.Table.from_batches(pending, schema=schema))
+    finally:
+        parquet_writer.close()
@@ -0,0 +1,239 @@
+import difflib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Error-signature -> SQL rewrite cache (per worker process)
+SQL_FIX_CACHE_ENABLED = os.getenv("SQL_FIX_CACHE_ENABLED", "true").lower() == "true"
+SQL_FIX_CACHE_MAX_ENTRIES = int(os.getenv("SQL_FIX_CACHE_MAX_ENTRIES", "1000"))
+SQL_FIX_MAX_EDITS = 4           # More edits than this is a rewrite, not a reusable fix
+SQL_FIX_MAX_FRAGMENT_TOKENS = 6
+SQL_FIX_ANCHOR_WINDOW = 2       # Tokens either side of the spot the error points at
+
+_TOKEN_PATTERN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\[[^\]]*\]|`[^`]*`|\w+|[^\w\s]")
+_ERROR_PREFIX_PATTERN = re.compile(r"^(sql execution failed:\s*)+", re.IGNORECASE)
+_ERROR_NOISE_PATTERN = re.compile(r"\b(line|position|at character|char)\s+\d+\b|db-lib error message.*$", re.IGNORECASE)
+_ERROR_QUOTED_PATTERN = re.compile(r'"([^"]+)"|\'([^\']+)\'')
+_ERROR_POSITION_PATTERN = re.compile(r"\b(?:at character|position)\s+(\d+)\b", re.IGNORECASE)
+_KEYWORDS = frozenset("""
+    select from where and or not in is null as on join inner left right full outer cross group by order having
+    limit offset top distinct union all except intersect with case when then else end asc desc between like
+    exists any insert update delete set values into
+""".split())
+
+Rewrite = Tuple[Tuple[str, ...], str]  # (failing token fragment, replacement text)
+FixKey = Tuple[int, str, Tuple[str, ...]]  # (database_id, error signature, normalized fragment)
+
+
+def error_signature(error_message: str) -> str:
+    """First line of the driver error without positions: same mistake -> same signature"""
+    text = _ERROR_PREFIX_PATTERN.sub("", error_message.strip())
+    text = text.split("\n", 1)[0]
+    text = _ERROR_NOISE_PATTERN.sub("", text)
+    return re.sub(r"\s+", " ", text).strip().lower()[:200]
+
+
+def _tokens(sql_query: str) -> List[Tuple[str, int, int]]:
+    return [(match.group(), match.start(), match.end()) for match in _TOKEN_PATTERN.finditer(sql_query)]
+
+
+def _normalize_token(token: str) -> str:
+    # Quoted identifiers and literals are case-sensitive, bare words are not
+    return token if token[0] in "'\"[`" else token.lower()
+
+
+def normalize_fragment(fragment: Tuple[str, ...]) -> Tuple[str, ...]:
+    return tuple(_normalize_token(token) for token in fragment)
+
+
+def is_trivial_fragment(fragment: Tuple[str, ...]) -> bool:
+    """Bare punctuation/keywords occur all over any query - rewriting them is never a safe replay"""
+    return all((len(token) == 1 and not re.match(r"\w", token)) or token.lower() in _KEYWORDS for token in fragment)
+
+
+def error_anchors(sql_query: str, error_message: str) -> List[int]:
+    """Token indexes the error points at: a character position, or the names/text it quotes"""
+    tokens = _tokens(sql_query)
+    first_line = _ERROR_PREFIX_PATTERN.sub("", error_message.strip()).split("\n", 1)[0]
+    anchors = set()
+    position = _ERROR_POSITION_PATTERN.search(first_line)
+    if position:
+        offset = int(position.group(1)) - 1
+        anchors.update(index for index, token in enumerate(tokens) if token[1] <= offset < token[2])
+    for match in _ERROR_QUOTED_PATTERN.finditer(first_line):
+        quoted = [token[0] for token in _tokens(match.group(1) or match.group(2))]
+        # A long quote is the rest of the query (MySQL "near '...'"): only its first token is the spot
+        wanted = {_normalize_token(token).strip('"`[]') for token in (quoted if len(quoted) <= 3 else quoted[:1])}
+        wanted = {token for token in wanted if re.match(r"\w", token)}
+        anchors.update(
+            index for index, token in enumerate(tokens)
+            if _normalize_token(token[0]).strip('"`[]') in wanted
+        )
+    return sorted(anchors)
+
+
+def _near(start: int, end: int, anchors: List[int]) -> bool:
+    return any(start - SQL_FIX_ANCHOR_WINDOW <= anchor < end + SQL_FIX_ANCHOR_WINDOW for anchor in anchors)
+
+
+def _diff(failed_query: str, fixed_query: str) -> Optional[List[Tuple[Tuple[str, ...], str, int]]]:
+    """Token-level edits (fragment, replacement, token index) turning the failed query into the fixed one"""
+    old, new = _tokens(failed_query), _tokens(fixed_query)
+    matcher = difflib.SequenceMatcher(None, [t[0] for t in old], [t[0] for t in new], autojunk=False)
+    rewrites = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        if tag == "insert":
+            if i1 == 0:
+                return None
+            i1, j1 = i1 - 1, j1 - 1  # Anchor the insertion on the token before it
+        if i2 - i1 > SQL_FIX_MAX_FRAGMENT_TOKENS:
+            return None
+        replacement = fixed_query[new[j1][1]:new[j2 - 1][2]] if j2 > j1 else ""
+        rewrites.append((tuple(t[0] for t in old[i1:i2]), replacement, i1))
+    if not rewrites or len(rewrites) > SQL_FIX_MAX_EDITS:
+        return None
+    return rewrites
+
+
+def diff_rewrites(failed_query: str, fixed_query: str) -> Optional[List[Rewrite]]:
+    """Token-level edits turning the failed query into the fixed one, or None if it was rewritten wholesale"""
+    edits = _diff(failed_query, fixed_query)
+    return None if edits is None else [(fragment, replacement) for fragment, replacement, _ in edits]
+
+
+def fix_rewrites(failed_query: str, error_message: str, next_query: str) -> List[Rewrite]:
+    """The edits of the next attempt that sit where the error points, minus punctuation/keyword-only ones"""
+    edits = _diff(failed_query, next_query)
+    anchors = error_anchors(failed_query, error_message)
+    if edits is None or not anchors:
+        return []
+    return [
+        (fragment, replacement) for fragment, replacement, index in edits
+        if not is_trivial_fragment(fragment) and _near(index, index + len(fragment), anchors)
+    ]
+
+
+def apply_rewrites(sql_query: str, rewrites: List[Rewrite], error_message: str) -> Optional[str]:
+    """Apply rewrites only where the error points; None when none applies"""
+    tokens = _tokens(sql_query)
+    texts = [_normalize_token(t[0]) for t in tokens]
+    anchors = error_anchors(sql_query, error_message)
+    spans = []  # (start, end, replacement)
+    taken = set()
+    for fragment, replacement in rewrites:
+        fragment = normalize_fragment(fragment)
+        if is_trivial_fragment(fragment):
+            continue
+        size = len(fragment)
+        index = 0
+        while index + size <= len(texts):
+            if (tuple(texts[index:index + size]) == fragment and not taken & set(range(index, index + size))
+                    and _near(index, index + size, anchors)):
+                spans.append((tokens[index][1], tokens[index + size - 1][2], replacement))
+                taken.update(range(index, index + size))
+                index += size
+            else:
+                index += 1
+    if not spans:
+        return None
+    repaired = sql_query
+    for start, end, replacement in sorted(spans, reverse=True):
+        repaired = repaired[:start] + replacement + repaired[end:]
+    return repaired if repaired != sql_query else None
+
+
+class FixCache:
+    """
+    LRU map of (database_id, error signature, failing fragment) -> the rewrite that made it run.
+    A fix is only learned from a failed attempt and the attempt right after it, and only replayed
+    on the part of a query the error points at. It is dropped as soon as it doesn't produce a working query.
+    """
+
+    def __init__(self, max_entries: int = SQL_FIX_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[FixKey, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.confirmed = 0
+        self.rejected = 0
+
+    def lookup(self, database_id: int, sql_query: str, error_message: str) -> Tuple[Optional[str], Optional[FixKey]]:
+        """(rewritten query, entry key) when a known fix applies to this failure, else (None, None)"""
+        if not SQL_FIX_CACHE_ENABLED:
+            return None, None
+        signature = error_signature(error_message)
+        with self._lock:
+            self.lookups += 1
+            # Most recently used first
+            for key in reversed([key for key in self._entries if key[:2] == (database_id, signature)]):
+                repaired = apply_rewrites(sql_query, [(key[2], self._entries[key]["replacement"])], error_message)
+                if repaired is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return repaired, key
+            return None, None
+
+    def learn(self, database_id: int, failures: List[Tuple[str, str]], fixed_query: str) -> int:
+        """
+        Remember how each (failed query, error) of a request was changed by the attempt after it.
+        An attempt that failed again with the same error didn't fix anything and teaches nothing.
+        """
+        if not SQL_FIX_CACHE_ENABLED or self.max_entries <= 0:
+            return 0
+        learned = 0
+        for index, (failed_query, error_message) in enumerate(failures):
+            signature = error_signature(error_message)
+            if index + 1 < len(failures):
+                next_query, next_error = failures[index + 1]
+                if error_signature(next_error) == signature:
+                    continue
+            else:
+                next_query = fixed_query
+            for fragment, replacement in fix_rewrites(failed_query, error_message, next_query):
+                key = (database_id, signature, normalize_fragment(fragment))
+                with self._lock:
+                    entry = self._entries.pop(key, None) or {"uses": 0}
+                    entry["replacement"] = replacement
+                    self._entries[key] = entry
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                learned += 1
+        return learned
+
+    def confirm(self, key: FixKey):
+        with self._lock:
+            self.confirmed += 1
+            if key in self._entries:
+                self._entries[key]["uses"] += 1
+
+    def reject(self, key: FixKey):
+        with self._lock:
+            self.rejected += 1
+            self._entries.pop(key, None)
+
+    def invalidate_database(self, database_id: int) -> int:
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == database_id]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "confirmed": self.confirmed,
+                "rejected": self.rejected,
+                "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0
+            }
+
+
+# Shared instance used by /database/execute-sql
+fix_cache = FixCache()
@@ -28,6 +28,7 @@ class Database(Base):
     private_columns = Column(JSON, nullable=True)
     selected_tables = Column(JSON, nullable=True)
     schema = Column(JSON, nullable=True)
+    schema_ddl = Column(JSON, nullable=True)  # {table: "CREATE TABLE ..."} cache for prompt schemas
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
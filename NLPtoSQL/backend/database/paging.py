@@ -0,0 +1,233 @@
+import base64
+import hashlib
+import json
+import os
+import re
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+# Row limit for /execute-sql when the request sends no page_size (0: paging is opt-in per request)
+SQL_DEFAULT_PAGE_SIZE = int(os.getenv("SQL_DEFAULT_PAGE_SIZE", "0"))
+SQL_MAX_PAGE_SIZE = int(os.getenv("SQL_MAX_PAGE_SIZE", "10000"))
+
+_ORDER_ITEM_PATTERN = re.compile(
+    r'^\s*(?:[\w"`\[\]]+\s*\.\s*)?([\w"`\[\]]+)(?:\s+(ASC|DESC))?(?:\s+NULLS\s+(?:FIRST|LAST))?\s*$',
+    re.IGNORECASE,
+)
+_LIMIT_WORDS = {"LIMIT", "OFFSET", "FETCH", "TOP"}
+
+
+class PageRequest:
+    """Page size + decoded continuation state for one execution"""
+
+    def __init__(self, size: int, query_key: str, state: Optional[Dict] = None):
+        self.size = size
+        self.query_key = query_key
+        self.state = state or {"offset": 0}
+
+
+def _query_key(sql_query: str) -> str:
+    normalized = re.sub(r"\s+", " ", sql_query.strip()).rstrip(";").strip()
+    return hashlib.sha256(normalized.encode()).hexdigest()[:16]
+
+
+def encode_cursor(state: Dict) -> str:
+    raw = json.dumps(state, separators=(",", ":"), default=_cursor_default).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _cursor_default(obj):
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, (datetime, date, dt_time)):
+        return obj.isoformat()
+    return str(obj)
+
+
+def build_page_request(sql_query: str, page_size: Optional[int], cursor: Optional[str]) -> Optional[PageRequest]:
+    """Resolve request paging options; raises ValueError for a malformed or foreign cursor"""
+    size = SQL_DEFAULT_PAGE_SIZE if page_size is None else page_size
+    if size <= 0:
+        if cursor:
+            raise ValueError("A cursor requires a positive page_size")
+        return None
+    size = min(size, SQL_MAX_PAGE_SIZE)
+    query_key = _query_key(sql_query)
+
+    if not cursor:
+        return PageRequest(size, query_key)
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+    if not isinstance(state, dict) or state.get("q") != query_key or not isinstance(state.get("offset"), int):
+        raise ValueError("Pagination cursor does not belong to this query")
+    return PageRequest(size, query_key, state)
+
+
+def _top_level_words(sql: str) -> List[Tuple[str, int]]:
+    """(UPPERCASE word, start index) for words outside quotes, comments and parentheses"""
+    words = []
+    depth = 0
+    i = 0
+    n = len(sql)
+    while i < n:
+        ch = sql[i]
+        if ch in ("'", '"', "`", "["):
+            closing = "]" if ch == "[" else ch
+            i += 1
+            while i < n:
+                if sql[i] == closing:
+                    if closing != "]" and i + 1 < n and sql[i + 1] == closing:
+                        i += 2
+                        continue
+                    break
+                i += 1
+            i += 1
+        elif sql.startswith("--", i):
+            newline = sql.find("\n", i)
+            i = n if newline == -1 else newline + 1
+        elif sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+        elif ch == "(":
+            depth += 1
+            i += 1
+        elif ch == ")":
+            depth -= 1
+            i += 1
+        elif ch.isalpha() or ch == "_":
+            start = i
+            while i < n and (sql[i].isalnum() or sql[i] == "_"):
+                i += 1
+            if depth == 0:
+                words.append((sql[start:i].upper(), start))
+        else:
+            i += 1
+    return words
+
+
+def _analyze(sql: str) -> Dict:
+    words = _top_level_words(sql)
+    order_by_pos = None
+    for index in range(len(words) - 1):
+        if words[index][0] == "ORDER" and words[index + 1][0] == "BY":
+            order_by_pos = words[index][1]
+
+    has_limit = any(word in _LIMIT_WORDS for word, _ in words)
+
+    # Keyset paging needs a single, trailing "ORDER BY <column> [ASC|DESC]"
+    key = key_token = direction = None
+    if order_by_pos is not None:
+        clause = sql[order_by_pos:]
+        clause = re.sub(r"^ORDER\s+BY\s+", "", clause, flags=re.IGNORECASE)
+        match = _ORDER_ITEM_PATTERN.match(clause)
+        if match:
+            key_token = match.group(1)  # As written: re-quoting would change case folding on Postgres
+            key = key_token.strip('"`[]')
+            direction = (match.group(2) or "ASC").upper()
+
+    return {
+        "order_by_pos": order_by_pos,
+        "has_limit": has_limit,
+        "is_cte": bool(words) and words[0][0] == "WITH",
+        "key": key,
+        "key_token": key_token,
+        "direction": direction,
+    }
+
+
+def build_page_sql(sql: str, provider: str, page: PageRequest) -> Tuple[str, Optional[tuple], Dict]:
+    """
+    Wrap a single SELECT so it returns at most page.size + 1 rows (the extra row signals has_more).
+    Returns (sql, params, plan); plan records which mode was used for building the next cursor.
+    """
+    info = _analyze(sql)
+    limit = page.size + 1
+    state = page.state
+    offset = state["offset"]
+    plan = {"mode": "offset", "offset": offset, "key": info["key"], "direction": info["direction"]}
+
+    keyset = state.get("mode") == "keyset" and info["key"] and state.get("key") == info["key"] and state.get("last") is not None
+    if keyset and provider == "mssql" and info["is_cte"]:
+        keyset = False  # T-SQL does not allow a CTE inside a derived table
+
+    if keyset:
+        base = sql[:info["order_by_pos"]].rstrip()
+        column = info["key_token"]
+        operator = ">=" if info["direction"] == "ASC" else "<="
+        skip = state.get("dup", 0)
+        plan.update({"mode": "keyset", "dup": skip, "last": state["last"]})
+        # Driver paramstyle is %s for psycopg2, pymysql and pymssql - escape literal percents
+        base = base.replace("%", "%%")
+        if provider == "mssql":
+            page_sql = (
+                f"SELECT * FROM ({base}) AS _page WHERE _page.{column} {operator} %s "
+                f"ORDER BY _page.{column} {info['direction']} OFFSET {skip} ROWS FETCH NEXT {limit} ROWS ONLY"
+            )
+        else:
+            page_sql = (
+                f"SELECT * FROM ({base}) AS _page WHERE _page.{column} {operator} %s "
+                f"ORDER BY _page.{column} {info['direction']} LIMIT {limit} OFFSET {skip}"
+            )
+        return page_sql, (state["last"],), plan
+
+    if provider == "mssql":
+        # OFFSET needs an ORDER BY; the first output column keeps pages stable between requests
+        if not info["has_limit"]:
+            order = "" if info["order_by_pos"] is not None else " ORDER BY 1"
+            return f"{sql}{order} OFFSET {offset} ROWS FETCH NEXT {limit} ROWS ONLY", None, plan
+        if info["is_cte"]:
+            # TOP/OFFSET already present inside a CTE query - run it as written
+            plan["mode"] = "none"
+            return sql, None, plan
+        return (
+            f"SELECT * FROM ({sql}) AS _page ORDER BY 1 OFFSET {offset} ROWS FETCH NEXT {limit} ROWS ONLY",
+            None,
+            plan,
+        )
+
+    if not info["has_limit"]:
+        return f"{sql} LIMIT {limit} OFFSET {offset}", None, plan
+    # Query already limits itself: page over its result
+    return f"SELECT * FROM ({sql}) AS _page LIMIT {limit} OFFSET {offset}", None, plan
+
+
+def finish_page(rows: list, columns: List[str], page: PageRequest, plan: Dict) -> Tuple[list, Dict]:
+    """Trim the look-ahead row and build the page metadata with an opaque continuation cursor"""
+    if plan["mode"] == "none":
+        return rows, {"page_size": page.size, "has_more": False, "next_cursor": None}
+
+    has_more = len(rows) > page.size
+    rows = rows[:page.size]
+    meta = {"page_size": page.size, "has_more": has_more, "next_cursor": None}
+    if not has_more:
+        return rows, meta
+
+    state = {"q": page.query_key, "offset": plan["offset"] + len(rows)}
+
+    key = plan.get("key")
+    lowered = [col.lower() for col in columns]
+    if key and key.lower() in lowered and rows:
+        key_index = lowered.index(key.lower())
+        last = rows[-1][key_index]
+        if last is not None:
+            # Rows sharing the last key value were already returned - skip them next time
+            dup = 0
+            for row in reversed(rows):
+                if row[key_index] != last:
+                    break
+                dup += 1
+            if dup == len(rows) and plan["mode"] == "keyset" and plan.get("last") == _cursor_value(last):
+                dup += plan.get("dup", 0)
+            state.update({"mode": "keyset", "key": key, "last": _cursor_value(last), "dup": dup})
+
+    meta["next_cursor"] = encode_cursor(state)
+    return rows, meta
+
+
+def _cursor_value(value):
+    return json.loads(json.dumps(value, default=_cursor_default))
@@ -0,0 +1,388 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+import psycopg2
+import pymysql
+import pymssql
+
+# Pool sizing / lifetime (per customer database, per worker process)
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "5"))
+POOL_IDLE_TIMEOUT = float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300"))        # Close idle connections after 5 minutes
+POOL_CHECKOUT_TIMEOUT = float(os.getenv("DB_POOL_CHECKOUT_TIMEOUT", "30"))  # Wait this long for a free connection
+POOL_PING_INTERVAL = float(os.getenv("DB_POOL_PING_INTERVAL", "5"))         # Ping connections idle longer than this on checkout
+POOL_CONNECT_TIMEOUT = int(os.getenv("DB_POOL_CONNECT_TIMEOUT", "10"))
+POOL_REAP_INTERVAL = float(os.getenv("DB_POOL_REAP_INTERVAL", "60"))        # Background idle-eviction sweep (0 = only on checkout)
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes available within the checkout timeout"""
+    pass
+
+
+def open_connection(db_record, plain_password: str):
+    """Open a new driver connection for a database record"""
+    provider = db_record.provider.value
+    if provider == "postgres":
+        return psycopg2.connect(
+            host=db_record.host,
+            port=db_record.port,
+            database=db_record.db_name,
+            user=db_record.user,
+            password=plain_password,
+            connect_timeout=POOL_CONNECT_TIMEOUT
+        )
+    elif provider == "mysql":
+        return pymysql.connect(
+            host=db_record.host,
+            port=db_record.port,
+            database=db_record.db_name,
+            user=db_record.user,
+            password=plain_password,
+            connect_timeout=POOL_CONNECT_TIMEOUT
+        )
+    elif provider == "mssql":
+        return pymssql.connect(
+            server=db_record.host,
+            port=db_record.port,
+            database=db_record.db_name,
+            user=db_record.user,
+            password=plain_password,
+            login_timeout=POOL_CONNECT_TIMEOUT
+        )
+    else:
+        raise ValueError(f"Unsupported database provider: {provider}")
+
+
+def _mssql_connection(conn):
+    """
+    pymssql.Connection exposes no timeout / cancel API; both live on its low-level
+    _mssql.MSSQLConnection, which is only reachable through Connection._conn
+    """
+    low_level = getattr(conn, "_conn", None)
+    if low_level is None or not hasattr(low_level, "query_timeout") or not hasattr(low_level, "cancel"):
+        raise RuntimeError(
+            f"pymssql {getattr(pymssql, '__version__', '?')} connection has no query_timeout/cancel support; "
+            "statement timeouts and cancellation are unavailable for SQL Server"
+        )
+    return low_level
+
+
+def set_statement_timeout(conn, provider: str, timeout_seconds: float):
+    """Apply a server-side statement timeout to the next statements on this connection"""
+    timeout_ms = max(1, int(timeout_seconds * 1000))
+    if provider == "postgres":
+        # SET LOCAL ends with the transaction, which release() rolls back
+        cursor = conn.cursor()
+        cursor.execute(f"SET LOCAL statement_timeout = {timeout_ms}")
+        cursor.close()
+    elif provider == "mysql":
+        cursor = conn.cursor()
+        cursor.execute(f"SET SESSION MAX_EXECUTION_TIME = {timeout_ms}")
+        cursor.close()
+    elif provider == "mssql":
+        _mssql_connection(conn).query_timeout = max(1, math.ceil(timeout_seconds))
+
+
+def reset_statement_timeout(conn, provider: str):
+    """Undo set_statement_timeout for session-scoped settings before the connection is reused"""
+    if provider == "mysql":
+        cursor = conn.cursor()
+        cursor.execute("SET SESSION MAX_EXECUTION_TIME = 0")
+        cursor.close()
+    elif provider == "mssql":
+        _mssql_connection(conn).query_timeout = 0
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of DB-API connections for a single customer database"""
+
+    def __init__(self, connect: Callable, provider: str, min_size: int = POOL_MIN_SIZE, max_size: int = POOL_MAX_SIZE,
+                 idle_timeout: float = POOL_IDLE_TIMEOUT, checkout_timeout: float = POOL_CHECKOUT_TIMEOUT,
+                 ping_interval: float = POOL_PING_INTERVAL):
+        self._connect = connect
+        self.provider = provider
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.ping_interval = ping_interval
+
+        self._idle: List[Tuple[object, float]] = []  # (connection, last_used); oldest first
+        self._size = 0  # idle + checked out
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _is_healthy(self, conn, idle_for: float) -> bool:
+        """Health check on checkout: cheap local check, plus a ping if the connection sat idle"""
+        if self.provider == "postgres" and conn.closed:
+            return False
+        if idle_for < self.ping_interval:
+            return True
+        try:
+            if self.provider == "mysql":
+                conn.ping(reconnect=False)
+            else:
+                cursor = conn.cursor()
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def warm(self):
+        """Open connections up to min_size ahead of the first checkout"""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception as e:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                print(f"[DB POOL] Pre-warming {self.provider} pool failed: {e}")
+                return
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def evict_idle(self) -> int:
+        """Close idle connections past idle_timeout (run by the background reaper)"""
+        with self._cond:
+            expired = self._evict_idle_locked()
+        for conn in expired:
+            _close_quietly(conn)
+        return len(expired)
+
+    def _evict_idle_locked(self) -> List:
+        """Drop idle connections past idle_timeout, keeping at least min_size open"""
+        expired = []
+        cutoff = time.monotonic() - self.idle_timeout
+        while self._idle and self._size > self.min_size and self._idle[0][1] < cutoff:
+            conn, _ = self._idle.pop(0)
+            self._size -= 1
+            expired.append(conn)
+        return expired
+
+    def acquire(self):
+        """Check out a healthy connection, opening one if the pool is below max_size"""
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeoutError("Connection pool has been closed")
+                expired = self._evict_idle_locked()
+                candidate, last_used = None, None
+                if self._idle:
+                    candidate, last_used = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(
+                            f"Timed out after {self.checkout_timeout}s waiting for a database connection "
+                            f"(pool max_size={self.max_size})"
+                        )
+                    self._cond.wait(remaining)
+                    continue
+
+            for conn in expired:
+                _close_quietly(conn)
+
+            if candidate is None:
+                try:
+                    return self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+
+            if self._is_healthy(candidate, time.monotonic() - last_used):
+                return candidate
+
+            print(f"[DB POOL] Discarding unhealthy {self.provider} connection")
+            self._discard(candidate)
+
+    def cancel(self, conn):
+        """Cancel the statement currently running on a checked-out connection (called from another thread)"""
+        if self.provider == "postgres":
+            conn.cancel()
+        elif self.provider == "mysql":
+            # MySQL has no in-band cancel: KILL QUERY from a side connection
+            killer = self._connect()
+            try:
+                cursor = killer.cursor()
+                cursor.execute(f"KILL QUERY {int(conn.thread_id())}")
+                cursor.close()
+            finally:
+                _close_quietly(killer)
+        elif self.provider == "mssql":
+            _mssql_connection(conn).cancel()
+
+    def _discard(self, conn):
+        _close_quietly(conn)
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def release(self, conn, discard: bool = False):
+        """Return a connection to the pool, rolling back any open transaction"""
+        if not discard:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            if discard or self._closed:
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+                conn = None
+            self._cond.notify()
+
+        if conn is not None:
+            _close_quietly(conn)
+
+    @contextmanager
+    def connection(self):
+        """Context manager: check out a connection and always hand it back"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """Close idle connections; checked-out ones are closed when released"""
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            _close_quietly(conn)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "provider": self.provider,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size
+            }
+
+
+# Registry: Database.id -> (connection fingerprint, pool, record version)
+_pools: Dict[int, Tuple[tuple, ConnectionPool, object]] = {}
+_registry_lock = threading.Lock()
+_reaper_stop = threading.Event()
+_reaper_thread = None
+
+
+def _reap_idle_connections():
+    while not _reaper_stop.wait(POOL_REAP_INTERVAL):
+        with _registry_lock:
+            pools = [entry[1] for entry in _pools.values()]
+        for pool in pools:
+            try:
+                closed = pool.evict_idle()
+                if closed:
+                    print(f"[DB POOL] Closed {closed} idle {pool.provider} connection(s)")
+            except Exception as e:
+                print(f"[DB POOL] Idle sweep failed: {e}")
+
+
+def _ensure_reaper_locked():
+    global _reaper_thread
+    if POOL_REAP_INTERVAL <= 0 or (_reaper_thread is not None and _reaper_thread.is_alive()):
+        return
+    _reaper_stop.clear()
+    _reaper_thread = threading.Thread(target=_reap_idle_connections, name="db-pool-reaper", daemon=True)
+    _reaper_thread.start()
+
+
+def _fingerprint(db_record, plain_password: str) -> tuple:
+    return (db_record.provider.value, db_record.host, db_record.port, db_record.db_name, db_record.user, plain_password)
+
+
+def _record_version(db_record):
+    """When the record was last saved; None if unknown (e.g. a detached record with expired attributes)"""
+    try:
+        return db_record.updated_at or db_record.created_at
+    except Exception:
+        return None
+
+
+def get_pool(db_record, plain_password: str) -> ConnectionPool:
+    """
+    Get (or create) the pool for a database record; rebuilt if connection settings changed.
+    A session still holding the record from before an update keeps using the current pool
+    instead of rebuilding it with the old settings.
+    """
+    fingerprint = _fingerprint(db_record, plain_password)
+    version = _record_version(db_record)
+    stale = None
+    with _registry_lock:
+        entry = _pools.get(db_record.id)
+        if entry and entry[0] == fingerprint:
+            return entry[1]
+        if entry and version is not None and entry[2] is not None and version < entry[2]:
+            return entry[1]
+        if entry:
+            stale = entry[1]
+        pool = ConnectionPool(
+            connect=lambda: open_connection(db_record, plain_password),
+            provider=db_record.provider.value
+        )
+        _pools[db_record.id] = (fingerprint, pool, version)
+        _ensure_reaper_locked()
+
+    if stale:
+        stale.close()
+    pool.warm()
+    return pool
+
+
+def invalidate_pool(database_id: int):
+    """Close and forget the pool for a database (called when its record changes or is deleted)"""
+    with _registry_lock:
+        entry = _pools.pop(database_id, None)
+    if entry:
+        entry[1].close()
+        print(f"[DB POOL] Invalidated pool for database {database_id}")
+
+
+def close_all_pools():
+    _reaper_stop.set()
+    with _registry_lock:
+        entries = list(_pools.values())
+        _pools.clear()
+    for entry in entries:
+        entry[1].close()
+
+
+def get_pool_stats() -> Dict[int, Dict]:
+    with _registry_lock:
+        entries = dict(_pools)
+    return {database_id: entry[1].stats() for database_id, entry in entries.items()}
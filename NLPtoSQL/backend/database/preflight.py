@@ -0,0 +1,130 @@
+import json
+import os
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Tuple
+
+# Cost preflight for /execute-sql: EXPLAIN the query first and act on the planner's estimates
+SQL_PREFLIGHT_DEFAULT = os.getenv("SQL_PREFLIGHT_DEFAULT", "false").lower() == "true"  # Run when the request doesn't say
+SQL_PREFLIGHT_MAX_ROWS = float(os.getenv("SQL_PREFLIGHT_MAX_ROWS", "10000000"))  # Reject above this estimate (0 = never)
+SQL_PREFLIGHT_MAX_COST = float(os.getenv("SQL_PREFLIGHT_MAX_COST", "0"))  # Reject above this planner cost (0 = never; units differ per provider)
+SQL_PREFLIGHT_LARGE_RESULT_ROWS = float(os.getenv("SQL_PREFLIGHT_LARGE_RESULT_ROWS", "100000"))
+SQL_PREFLIGHT_LARGE_RESULT_ACTION = os.getenv("SQL_PREFLIGHT_LARGE_RESULT_ACTION", "limit")  # "limit" or "stream"
+SQL_PREFLIGHT_LIMIT_ROWS = int(os.getenv("SQL_PREFLIGHT_LIMIT_ROWS", "1000"))  # Page size applied by the "limit" action
+
+_MSSQL_PLAN_NS = "{http://schemas.microsoft.com/sqlserver/2004/07/showplan}"
+_MSSQL_FULL_SCAN_OPS = {"Table Scan", "Clustered Index Scan"}
+
+
+def _walk_postgres_plan(node: Dict, full_scans: List[Dict]):
+    if node.get("Node Type") == "Seq Scan":
+        full_scans.append({"table": node.get("Relation Name"), "estimated_rows": node.get("Plan Rows")})
+    for child in node.get("Plans", []):
+        _walk_postgres_plan(child, full_scans)
+
+
+def _parse_postgres(raw) -> Dict:
+    data = json.loads(raw) if isinstance(raw, str) else raw
+    plan = data[0]["Plan"]
+    full_scans = []
+    _walk_postgres_plan(plan, full_scans)
+    return {"estimated_rows": plan.get("Plan Rows"), "estimated_cost": plan.get("Total Cost"), "full_scans": full_scans}
+
+
+def _walk_mysql_plan(node, tables: List[Dict]):
+    if isinstance(node, dict):
+        if "table_name" in node and "access_type" in node:
+            tables.append(node)
+        for value in node.values():
+            _walk_mysql_plan(value, tables)
+    elif isinstance(node, list):
+        for item in node:
+            _walk_mysql_plan(item, tables)
+
+
+def _parse_mysql(raw) -> Dict:
+    data = json.loads(raw)
+    block = data.get("query_block", {})
+    tables = []
+    _walk_mysql_plan(block, tables)
+    # The last table in join order produces the result rows
+    estimated_rows = None
+    if tables:
+        estimated_rows = tables[-1].get("rows_produced_per_join", tables[-1].get("rows_examined_per_scan"))
+    cost = block.get("cost_info", {}).get("query_cost")
+    return {
+        "estimated_rows": float(estimated_rows) if estimated_rows is not None else None,
+        "estimated_cost": float(cost) if cost is not None else None,
+        "full_scans": [
+            {"table": t["table_name"], "estimated_rows": t.get("rows_examined_per_scan")}
+            for t in tables if t.get("access_type") == "ALL"
+        ]
+    }
+
+
+def _parse_mssql(raw) -> Dict:
+    root = ET.fromstring(raw)
+    statement = root.find(f".//{_MSSQL_PLAN_NS}StmtSimple")
+    if statement is None:
+        raise ValueError("SHOWPLAN_XML returned no statement")
+    full_scans = []
+    for rel_op in root.iter(f"{_MSSQL_PLAN_NS}RelOp"):
+        if rel_op.get("PhysicalOp") in _MSSQL_FULL_SCAN_OPS:
+            obj = rel_op.find(f".//{_MSSQL_PLAN_NS}Object")
+            full_scans.append({
+                "table": obj.get("Table", "").strip("[]") if obj is not None else None,
+                "estimated_rows": float(rel_op.get("EstimateRows", 0))
+            })
+    rows = statement.get("StatementEstRows")
+    cost = statement.get("StatementSubTreeCost")
+    return {
+        "estimated_rows": float(rows) if rows is not None else None,
+        "estimated_cost": float(cost) if cost is not None else None,
+        "full_scans": full_scans
+    }
+
+
+def explain_query(conn, provider: str, sql_query: str, params: Optional[tuple] = None) -> Dict:
+    """Ask the planner for row/cost estimates without running the query"""
+    cursor = conn.cursor()
+    try:
+        if provider == "postgres":
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql_query}", params)
+            estimate = _parse_postgres(cursor.fetchone()[0])
+        elif provider == "mysql":
+            cursor.execute(f"EXPLAIN FORMAT=JSON {sql_query}", params)
+            estimate = _parse_mysql(cursor.fetchone()[0])
+        elif provider == "mssql":
+            # SHOWPLAN must be the only statement in its batch
+            cursor.execute("SET SHOWPLAN_XML ON")
+            try:
+                cursor.execute(sql_query, params)
+                estimate = _parse_mssql(cursor.fetchone()[0])
+            finally:
+                cursor.execute("SET SHOWPLAN_XML OFF")
+        else:
+            raise ValueError(f"Unsupported database provider: {provider}")
+    finally:
+        cursor.close()
+    estimate["provider"] = provider
+    return estimate
+
+
+def decide_action(estimate: Dict, streaming: bool, paged: bool, can_stream: bool) -> Tuple[str, Optional[str]]:
+    """
+    Map an estimate to one of: "reject", "stream", "limit", "ok".
+    Returns (action, reason).
+    """
+    rows = estimate.get("estimated_rows") or 0
+    cost = estimate.get("estimated_cost") or 0
+
+    if SQL_PREFLIGHT_MAX_ROWS > 0 and rows > SQL_PREFLIGHT_MAX_ROWS:
+        return "reject", f"estimated {rows:,.0f} rows exceeds the limit of {SQL_PREFLIGHT_MAX_ROWS:,.0f}"
+    if SQL_PREFLIGHT_MAX_COST > 0 and cost > SQL_PREFLIGHT_MAX_COST:
+        return "reject", f"estimated cost {cost:,.0f} exceeds the limit of {SQL_PREFLIGHT_MAX_COST:,.0f}"
+
+    if streaming or paged or rows <= SQL_PREFLIGHT_LARGE_RESULT_ROWS:
+        return "ok", None
+    reason = f"estimated {rows:,.0f} rows is above {SQL_PREFLIGHT_LARGE_RESULT_ROWS:,.0f}"
+    if SQL_PREFLIGHT_LARGE_RESULT_ACTION == "stream" and can_stream:
+        return "stream", reason
+    return "limit", reason
@@ -0,0 +1,119 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Result cache limits (per worker process)
+SQL_RESULT_CACHE_MAX_ENTRIES = int(os.getenv("SQL_RESULT_CACHE_MAX_ENTRIES", "256"))
+SQL_RESULT_CACHE_MAX_BYTES = int(os.getenv("SQL_RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))       # 64 MB total
+SQL_RESULT_CACHE_MAX_ENTRY_BYTES = int(os.getenv("SQL_RESULT_CACHE_MAX_ENTRY_BYTES", str(8 * 1024 * 1024)))  # Skip huge results
+SQL_RESULT_CACHE_TTL_SECONDS = float(os.getenv("SQL_RESULT_CACHE_TTL_SECONDS", "300"))
+
+_QUOTED_OR_SPACE = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|\s+")
+
+
+def normalize_sql(sql_query: str) -> str:
+    """Canonical SQL text for cache keys: collapse whitespace outside quotes, drop trailing ';'"""
+    cleaned = sql_query.strip().replace("```sql", "").replace("```", "").strip()
+    cleaned = _QUOTED_OR_SPACE.sub(lambda m: m.group(1) or " ", cleaned)
+    return cleaned.rstrip(";").strip()
+
+
+def _estimate_size(value: Any) -> int:
+    return len(json.dumps(value, default=str))
+
+
+class ResultCache:
+    """LRU + TTL cache of SQL results keyed by (database_id, normalized SQL, variant) with byte accounting"""
+
+    def __init__(self, max_entries: int = SQL_RESULT_CACHE_MAX_ENTRIES, max_bytes: int = SQL_RESULT_CACHE_MAX_BYTES,
+                 ttl_seconds: float = SQL_RESULT_CACHE_TTL_SECONDS, max_entry_bytes: int = SQL_RESULT_CACHE_MAX_ENTRY_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_entry_bytes = max_entry_bytes
+
+        self._entries: "OrderedDict[Tuple, Tuple[Any, int, float]]" = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(database_id: int, sql_query: str, variant: str = "") -> Tuple:
+        return (database_id, normalize_sql(sql_query), variant)
+
+    def _remove_locked(self, key: Tuple):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, database_id: int, sql_query: str, variant: str = "") -> Optional[Any]:
+        key = self.make_key(database_id, sql_query, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[2] < time.monotonic():
+                self._remove_locked(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, database_id: int, sql_query: str, value: Any, variant: str = "", ttl_seconds: float = None) -> bool:
+        if self.max_entries <= 0 or self.ttl_seconds <= 0:
+            return False
+        size = _estimate_size(value)
+        if size > self.max_entry_bytes or size > self.max_bytes:
+            return False
+
+        key = self.make_key(database_id, sql_query, variant)
+        expires_at = time.monotonic() + (ttl_seconds if ttl_seconds is not None else self.ttl_seconds)
+        with self._lock:
+            if key in self._entries:
+                self._remove_locked(key)
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            # Evict least recently used until both limits hold
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove_locked(oldest)
+                self.evictions += 1
+        return True
+
+    def invalidate_database(self, database_id: int) -> int:
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == database_id]
+            for key in keys:
+                self._remove_locked(key)
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+# Shared instance used by /database/execute-sql
+result_cache = ResultCache()
@@ -4,6 +4,11 @@ from typing import List
 import psycopg2
 import pymysql
 import pymssql
+from .pool import invalidate_pool
+from .result_cache import result_cache
+from .fix_cache import fix_cache
+from Langchain.question_cache import invalidate_question_cache
+from Langchain.example_store import invalidate_example_store
 from .models import Database, DatabaseCreate, DatabaseUpdate, DatabaseResponse, DatabaseTestConnection, GetTablesViewsRequest, GenerateSchemaRequest
 from db_config import get_db
 from auth import get_current_user
@@ -12,6 +17,14 @@ from utils.encryption import encrypt_password, decrypt_password
 
 router = APIRouter(prefix="/databases", tags=["databases"])
 
+def _invalidate_database_state(database_id: int):
+    """Drop pooled connections and cached results / generated SQL / SQL fixes / few-shot examples for a database whose record changed"""
+    invalidate_pool(database_id)
+    result_cache.invalidate_database(database_id)
+    fix_cache.invalidate_database(database_id)
+    invalidate_question_cache(database_id)
+    invalidate_example_store(database_id)
+
 @router.post("/", response_model=DatabaseResponse)
 def create_database(
     database: DatabaseCreate, 
@@ -100,8 +113,15 @@ def update_database(
     for key, value in update_data.items():
         setattr(database, key, value)
     
+    # Cached DDL belongs to the old target database
+    if update_data.keys() & {"provider", "host", "port", "db_name", "user"}:
+        database.schema_ddl = None
+    
     db.commit()
     db.refresh(database)
+    
+    # Connection settings, schema or descriptions may have changed
+    _invalidate_database_state(database_id)
     return database
 
 @router.delete("/{database_id}")
@@ -119,6 +139,7 @@ def delete_database(
     
     db.delete(database)
     db.commit()
+    _invalidate_database_state(database_id)
     return {"message": "Database deleted successfully"}
 
 @router.post("/test-connection")
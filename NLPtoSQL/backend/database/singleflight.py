@@ -0,0 +1,67 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+# Share one execution between concurrent identical /execute-sql requests
+SQL_COALESCE_ENABLED = os.getenv("SQL_COALESCE_ENABLED", "true").lower() == "true"
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller (leader) runs the work,
+    callers arriving while it is in flight await the leader's result instead of repeating it.
+    Only used from the event loop thread, so no locking is needed.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, work: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Returns (result, shared); shared is True when another request did the work"""
+        future = self._in_flight.get(key)
+        while future is not None:
+            self.coalesced += 1
+            try:
+                # shield: a follower giving up must not cancel the leader's result for everyone else
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise  # This caller was cancelled
+            # The leader was cancelled: the first follower to get here runs the work itself
+            self.coalesced -= 1
+            future = self._in_flight.get(key)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        self.executions += 1
+        try:
+            result = await work()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved so an unshared failure isn't logged as unhandled
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def stats(self) -> Dict:
+        requests = self.executions + self.coalesced
+        return {
+            "enabled": SQL_COALESCE_ENABLED,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+            "coalesce_rate": round(self.coalesced / requests, 4) if requests else 0.0
+        }
+
+
+# Shared instance used by /database/execute-sql
+execution_flights = SingleFlight()
@@ -2,6 +2,9 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from database.connection import initialize_db_connection, router as database_router
 from database.router import router as db_config_router
+from database.pool import close_all_pools
+from utils.concurrency import shutdown_executor
+from database.engines import engine_registry
 from clients.router import router as client_router
 from users.router import router as user_router, query_router
 from dashboards.router import dashboard_router, plan_router
@@ -22,6 +25,12 @@ async def startup_event():
     init_db()
     initialize_db_connection()
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    close_all_pools()
+    engine_registry.dispose_all()
+    shutdown_executor()
+
 app.include_router(database_router)
 app.include_router(client_router)
 app.include_router(db_config_router)
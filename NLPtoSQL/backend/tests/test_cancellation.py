@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from database import connection
+from database.cancellation import QueryCancelledError, QueryCancelScope, is_timeout_error
+from database.pool import reset_statement_timeout, set_statement_timeout
+
+
+class LoggingConnection:
+    def __init__(self):
+        self.log = []
+
+    def cursor(self):
+        log = self.log
+
+        class Cursor:
+            def execute(self, sql):
+                log.append(sql)
+
+            def close(self):
+                pass
+
+        return Cursor()
+
+
+def test_cancel_runs_the_bound_callback_once():
+    calls = []
+    scope = QueryCancelScope()
+    scope.bind(lambda: calls.append("cancel"))
+    scope.cancel("client disconnected")
+    scope.cancel("request deadline exceeded")
+    assert calls == ["cancel"] and scope.reason == "client disconnected"
+    with pytest.raises(QueryCancelledError):
+        scope.bind(lambda: calls.append("late"))
+
+
+def test_unbound_scope_cancels_nothing():
+    calls = []
+    scope = QueryCancelScope()
+    scope.bind(lambda: calls.append("cancel"))
+    scope.unbind()
+    scope.cancel("request deadline exceeded")
+    assert calls == [] and scope.cancelled
+
+
+def test_timeout_errors_are_recognised():
+    assert is_timeout_error("canceling statement due to statement timeout")
+    assert is_timeout_error("Query execution was interrupted, maximum statement execution time exceeded")
+    assert not is_timeout_error('column "custname" does not exist')
+
+
+def test_statement_timeout_sql_per_provider():
+    postgres, mysql = LoggingConnection(), LoggingConnection()
+    set_statement_timeout(postgres, "postgres", 2.5)
+    reset_statement_timeout(postgres, "postgres")  # SET LOCAL ends with the transaction
+    set_statement_timeout(mysql, "mysql", 2.5)
+    reset_statement_timeout(mysql, "mysql")
+    assert postgres.log == ["SET LOCAL statement_timeout = 2500"]
+    assert mysql.log == ["SET SESSION MAX_EXECUTION_TIME = 2500", "SET SESSION MAX_EXECUTION_TIME = 0"]
+
+
+def test_request_timeout_never_exceeds_the_plan(monkeypatch):
+    monkeypatch.setattr(connection, "SQL_STATEMENT_TIMEOUT_SECONDS", 30)
+    assert connection._resolve_statement_timeout(None, None) == 30
+    assert connection._resolve_statement_timeout(10, None) == 10
+    assert connection._resolve_statement_timeout(120, 60) == 60
+    monkeypatch.setattr(connection, "SQL_STATEMENT_TIMEOUT_SECONDS", 0)
+    assert connection._resolve_statement_timeout(None, None) is None
+
+
+class FakeRequest:
+    def __init__(self, disconnected=False):
+        self.disconnected = disconnected
+
+    async def is_disconnected(self):
+        return self.disconnected
+
+
+def run_until_cancelled(http_request, deadline):
+    scope = QueryCancelScope()
+    cancelled = threading.Event()
+
+    def statement():
+        scope.bind(cancelled.set)  # What the pool's cancel would do to the server
+        if not cancelled.wait(2):
+            return "finished"
+        raise QueryCancelledError(scope.reason)
+
+    with pytest.raises(QueryCancelledError):
+        asyncio.run(connection._run_cancellable(http_request, scope, deadline, statement))
+    return scope
+
+
+def test_deadline_cancels_the_running_statement():
+    scope = run_until_cancelled(FakeRequest(), time.monotonic())
+    assert scope.reason == "request deadline exceeded"
+    assert connection._cancelled_error(scope).status_code == 504
+
+
+def test_client_disconnect_cancels_the_running_statement():
+    scope = run_until_cancelled(FakeRequest(disconnected=True), float("inf"))
+    assert scope.reason == "client disconnected"
+    assert connection._cancelled_error(scope).status_code == 499
@@ -0,0 +1,34 @@
+from datetime import datetime
+
+import pytest
+
+from database.columnar import ColumnarResultBuilder, columnar_to_arrow_ipc
+
+
+def test_batches_are_transposed_column_major():
+    builder = ColumnarResultBuilder(["id", "created", "tags"])
+    builder.add_batch([(1, datetime(2024, 5, 1, 12, 0), None)])
+    builder.add_batch([(2, None, ["a", "b"])])
+    builder.add_batch([])
+    assert builder.result() == {
+        "columns": ["id", "created", "tags"],
+        "values": [[1, 2], ["2024-05-01T12:00:00", None], [None, ["a", "b"]]],
+        "data_types": {"id": "scalar", "created": "scalar", "tags": "array"},
+        "row_count": 2
+    }
+
+
+def test_rows_without_description_are_kept_as_text():
+    builder = ColumnarResultBuilder([])
+    builder.add_batch([(1, "x")])
+    assert builder.result()["columns"] == ["result"]
+    assert builder.result()["values"] == [["(1, 'x')"]]
+
+
+def test_arrow_ipc_round_trip_with_text_fallback():
+    pa = pytest.importorskip("pyarrow")
+    payload = columnar_to_arrow_ipc(["id", "mixed"], [[1, 2], [1, "two"]])
+    table = pa.ipc.open_stream(payload).read_all()
+    assert table.column("id").to_pylist() == [1, 2]
+    assert table.schema.field("mixed").type == pa.string()
+    assert table.column("mixed").to_pylist() == ["1", "two"]
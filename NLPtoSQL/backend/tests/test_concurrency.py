@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils import concurrency
+from utils.concurrency import TenantBusyError, _TenantSlots, run_blocking, submit_blocking
+
+
+@pytest.fixture
+def one_slot(monkeypatch):
+    slots = _TenantSlots(1)
+    monkeypatch.setattr(concurrency, "_tenant_slots", slots)
+    return slots
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.01)
+
+
+def test_cancelled_request_keeps_slot_until_worker_finishes(one_slot):
+    started, finish = threading.Event(), threading.Event()
+
+    def work():
+        started.set()
+        finish.wait(2)
+
+    async def scenario():
+        task = asyncio.create_task(run_blocking(work, tenant_id="t1"))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # The thread is still running: the tenant must not get a second slot
+        assert one_slot.try_acquire("t1") is False
+        finish.set()
+
+    asyncio.run(scenario())
+    wait_until(lambda: one_slot.stats() == {})
+
+
+def test_waiter_gets_slot_when_running_call_finishes(one_slot):
+    order = []
+
+    def work(name):
+        order.append(name)
+        time.sleep(0.05)
+        return name
+
+    async def scenario():
+        return await asyncio.gather(run_blocking(work, "a", tenant_id="t1"), run_blocking(work, "b", tenant_id="t1"))
+
+    assert asyncio.run(scenario()) == ["a", "b"]
+    assert order == ["a", "b"]
+    assert one_slot.stats() == {}
+
+
+def test_busy_tenant_times_out(one_slot, monkeypatch):
+    monkeypatch.setattr(concurrency, "TENANT_QUEUE_TIMEOUT", 0.05)
+    release = threading.Event()
+
+    async def scenario():
+        first = asyncio.create_task(run_blocking(release.wait, 2, tenant_id="t1"))
+        await asyncio.sleep(0.02)
+        with pytest.raises(TenantBusyError):
+            await run_blocking(time.sleep, 0, tenant_id="t1")
+        release.set()
+        await first
+
+    asyncio.run(scenario())
+    wait_until(lambda: one_slot.stats() == {})
+
+
+def test_other_tenants_are_not_limited(one_slot):
+    release = threading.Event()
+
+    async def scenario():
+        first = asyncio.create_task(run_blocking(release.wait, 2, tenant_id="t1"))
+        await asyncio.sleep(0.02)
+        assert await run_blocking(lambda: "ok", tenant_id="t2") == "ok"
+        release.set()
+        await first
+
+    asyncio.run(scenario())
+
+
+def test_submit_blocking_skips_busy_tenant(one_slot):
+    finish = threading.Event()
+    future = submit_blocking(finish.wait, 2, tenant_id="t1")
+    assert future is not None
+    assert submit_blocking(lambda: None, tenant_id="t1") is None  # Best-effort work never queues
+    finish.set()
+    assert future.result(timeout=2) is True
+    wait_until(lambda: one_slot.stats() == {})
+    assert submit_blocking(lambda: 42, tenant_id="t1").result(timeout=2) == 42
@@ -0,0 +1,49 @@
+from Langchain.query_engine import CompactingConversationMemory, ConversationMemory
+
+
+def converse(memory, turns: int):
+    for index in range(turns):
+        memory.add_message("user", f"question {index}")
+        memory.add_message("assistant", f"SELECT {index}", {"sql": f"SELECT {index}", "tables_used": ["orders"]})
+
+
+def test_only_recent_exchanges_stay_verbatim():
+    memory = CompactingConversationMemory(recent_exchanges=2, sql_history=2)
+    converse(memory, 5)
+    assert [msg["content"] for msg in memory.messages] == ["question 3", "SELECT 3", "question 4", "SELECT 4"]
+    assert list(memory.summary_lines) == [f"- question {index} -> SQL on orders" for index in range(3)]
+    assert [entry["sql"] for entry in memory.sql_history] == ["SELECT 3", "SELECT 4"]
+
+    summary = memory.get_context_summary()
+    assert summary.startswith("Earlier in this conversation:\n- question 0")
+    assert "Previous SQL:\n- Q: question 3 | tables: orders | SQL: SELECT 3" in summary
+
+
+def test_summary_stays_under_its_token_cap():
+    memory = CompactingConversationMemory(recent_exchanges=1, summary_max_tokens=30)
+    for index in range(40):
+        memory.add_message("user", f"tell me about topic number {index}")
+        memory.add_message("assistant", "I can only help with database questions.", {"intent": "out_of_scope"})
+    assert len(memory.summary_lines) < 39
+    assert memory.summary_lines[-1] == "- tell me about topic number 38 -> out_of_scope"
+    # Verbatim history plus the capped summary: bounded however long the session runs
+    assert memory.get_token_estimate() < 80
+
+
+def test_round_trip_and_clear():
+    memory = CompactingConversationMemory(recent_exchanges=2)
+    converse(memory, 4)
+    restored = CompactingConversationMemory(recent_exchanges=2)
+    restored.from_dict(memory.to_dict())
+    assert restored.get_context_summary() == memory.get_context_summary()
+    assert [msg["content"] for msg in restored.messages] == [msg["content"] for msg in memory.messages]
+
+    # Plain window history is folded as it is replayed
+    window = ConversationMemory(max_exchanges=10)
+    converse(window, 4)
+    replayed = CompactingConversationMemory(recent_exchanges=2)
+    replayed.from_dict(window.to_dict())
+    assert len(replayed.messages) == 4 and len(replayed.summary_lines) == 2
+
+    replayed.clear()
+    assert replayed.get_context_summary() == "" and replayed.get_token_estimate() == 0
@@ -0,0 +1,82 @@
+import threading
+import time
+
+from database import engines
+from database.engines import EngineRegistry
+
+
+def make_db(tmp_path, tables=3):
+    import sqlite3
+
+    path = tmp_path / "shop.db"
+    conn = sqlite3.connect(path)
+    for index in range(tables):
+        conn.execute(f"CREATE TABLE t{index} (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.commit()
+    conn.close()
+    return f"sqlite:///{path}"
+
+
+def test_views_share_engine_and_metadata(tmp_path):
+    registry = EngineRegistry()
+    uri = make_db(tmp_path)
+    first = registry.acquire(uri, engine_args={})
+    second = registry.acquire(uri, engine_args={}, sample_rows_in_table_info=0)
+    try:
+        assert first._engine is second._engine
+        assert "CREATE TABLE t0" in first.get_table_info(["t0"])
+        assert registry.stats()["reflected_tables"] == 1
+        assert "CREATE TABLE t0" in second.get_table_info(["t0"])
+        assert registry.stats() == {"engines": 1, "in_use": 1, "views": 2, "reflected_tables": 1}
+    finally:
+        registry.dispose_all()
+
+
+def test_concurrent_table_info_reads(tmp_path):
+    registry = EngineRegistry()
+    uri = make_db(tmp_path, tables=12)
+    views = [registry.acquire(uri, engine_args={}, sample_rows_in_table_info=n) for n in range(4)]
+    errors = []
+
+    def read(view, names):
+        try:
+            for _ in range(5):
+                view.get_table_info(names)
+                registry.forget_reflection(view)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [
+        threading.Thread(target=read, args=(view, [f"t{i}" for i in range(index, 12, 2)]))
+        for index, view in enumerate(views)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    registry.dispose_all()
+    assert errors == []
+
+
+def test_release_then_dispose_idle(tmp_path):
+    registry = EngineRegistry(idle_timeout=0)
+    database = registry.acquire(make_db(tmp_path), engine_args={})
+    assert registry.dispose_idle() == 0
+    registry.release(database)
+    registry.release(database)  # Extra releases are ignored
+    assert registry.dispose_idle() == 1
+    assert registry.stats()["engines"] == 0
+    registry.dispose_all()
+
+
+def test_reaper_disposes_without_acquire(tmp_path, monkeypatch):
+    monkeypatch.setattr(engines, "ENGINE_REAP_INTERVAL", 0.02)
+    registry = EngineRegistry(idle_timeout=0)
+    registry.release(registry.acquire(make_db(tmp_path), engine_args={}))
+    deadline = time.monotonic() + 2
+    while registry.stats()["engines"] and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert registry.stats()["engines"] == 0
+    registry.dispose_all()
+    registry._reaper.join(timeout=1)
+    assert not registry._reaper.is_alive()
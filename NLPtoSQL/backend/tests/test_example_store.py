@@ -0,0 +1,96 @@
+from Langchain.example_store import NO_EXAMPLES, ExampleStore, format_examples
+
+
+def test_search_returns_similar_examples_best_first():
+    store = ExampleStore("fp")
+    store.add("How many orders were placed per region?", "SELECT region, COUNT(*) FROM orders GROUP BY region;")
+    store.add("Total revenue per customer", "SELECT customer_id, SUM(total) FROM orders GROUP BY customer_id;")
+    examples = store.search("How many orders were placed per country?")
+    assert [example["sql_query"] for example in examples] == ["SELECT region, COUNT(*) FROM orders GROUP BY region;"]
+    assert store.search("weather tomorrow") == []
+    assert store.stats() == {"examples": 2, "lookups": 2, "hits": 1}
+
+
+def test_follow_ups_and_duplicates_are_not_stored():
+    persisted = []
+    store = ExampleStore("fp", persist=lambda question, sql_query: persisted.append(question))
+    assert store.add("List all customers", "SELECT * FROM customers;")
+    assert not store.add("list all customers", "SELECT * FROM customers;")
+    assert not store.add("And what about their orders?", "SELECT * FROM orders;")
+    assert persisted == ["List all customers"]
+
+
+def test_oldest_examples_dropped_past_the_limit():
+    store = ExampleStore("fp", max_examples=2)
+    for table in ("customers", "orders", "invoices"):
+        store.add(f"List all {table}", f"SELECT * FROM {table};")
+    assert store.stats()["examples"] == 2
+    assert store.search("List all customers") == []
+
+
+def test_format_examples_respects_token_cap():
+    examples = [{"question": f"question {i}", "sql_query": "SELECT " + ", ".join(["col"] * 50)} for i in range(5)]
+    text = format_examples(examples, max_tokens=80)
+    assert text.count("Q: ") == 1  # The best example is always kept
+    assert format_examples([]) == NO_EXAMPLES
+
+
+def test_prompt_budget_drops_examples_before_schema():
+    from Langchain.token_budget import PromptBudget, count_tokens
+
+    examples = format_examples([
+        {"question": f"question number {i}", "sql_query": "SELECT " + ", ".join(f"col{n}" for n in range(30))}
+        for i in range(3)
+    ])
+    schema = "CREATE TABLE orders (id INTEGER, total NUMERIC)"
+    inputs = {"question": "q", "schema": schema, "few_shot_examples": examples}
+    budget = PromptBudget("test", limit=count_tokens("system") + count_tokens(examples) // 2 + count_tokens(schema) + 5)
+    fitted, report = budget.fit("system", inputs, shrink_schema=lambda text, allowed: "")
+    assert fitted["schema"] == schema
+    assert fitted["few_shot_examples"].count("Q: ") == 1
+    assert report["trimmed"] == ["few_shot_examples"]
+
+    tight = PromptBudget("test", limit=count_tokens("system") + count_tokens(schema) + 2)
+    fitted, _ = tight.fit("system", inputs, shrink_schema=lambda text, allowed: "")
+    assert fitted["few_shot_examples"] == NO_EXAMPLES and fitted["schema"] == schema
+
+
+def test_sessions_resolve_the_store_per_use():
+    from Langchain.example_store import get_example_store, invalidate_example_store
+    from Langchain.query_engine import QueryEngine
+
+    loads = []
+
+    def lookup(replace=False):
+        return get_example_store(77, "fp", load=lambda: loads.append(1) or [], replace=replace)
+
+    invalidate_example_store(77)
+    query_engine = QueryEngine.__new__(QueryEngine)
+    query_engine.example_store_lookup = lookup
+    first = lookup(replace=True)
+    assert query_engine.example_store is first
+    invalidate_example_store(77)
+    assert query_engine.example_store is not first and len(loads) == 2
+    assert get_example_store(77, "other", load=list, replace=False) is None  # A stale schema never takes over
+    invalidate_example_store(77)
+
+
+def test_persisted_examples_are_capped_per_database(monkeypatch):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from database import connection
+    from Langchain.models import QueryExample
+
+    engine = create_engine("sqlite://")
+    QueryExample.__table__.create(engine)
+    monkeypatch.setattr(connection, "SessionLocal", sessionmaker(bind=engine))
+    monkeypatch.setattr(connection, "FEW_SHOT_MAX_EXAMPLES", 3)
+    connection._persist_query_example(1, "old", "stale question", "SELECT 0")
+    for index in range(5):
+        connection._persist_query_example(1, "fp", f"question {index}", f"SELECT {index}")
+    connection._persist_query_example(2, "fp", "other database", "SELECT 9")
+
+    assert [row["question"] for row in connection._load_query_examples(1, "fp")] == ["question 2", "question 3", "question 4"]
+    assert connection._load_query_examples(1, "old") == []
+    assert len(connection._load_query_examples(2, "fp")) == 1
@@ -0,0 +1,66 @@
+import io
+from decimal import Decimal
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.parquet as pq  # noqa: E402
+
+from database import export  # noqa: E402
+from database.export import write_cursor_parquet  # noqa: E402
+
+
+class FakeCursor:
+    """Unbuffered cursor stand-in: rows come back fetch_size at a time"""
+
+    def __init__(self, description, rows):
+        self.description = description
+        self._rows = list(rows)
+
+    def fetchmany(self, size):
+        batch, self._rows = self._rows[:size], self._rows[size:]
+        return batch
+
+
+def export_parquet(cursor, provider=None):
+    sink = io.BytesIO()
+    write_cursor_parquet(cursor, sink, fetch_size=2, provider=provider)
+    return pq.read_table(io.BytesIO(sink.getvalue()))
+
+
+def test_late_float_in_an_inferred_integer_column_is_kept(monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_PARQUET_ROW_GROUP_ROWS", 4)
+    rows = [(1,), (2,), (3,), (2.5,)]
+    table = export_parquet(FakeCursor([("ratio", None, None, None, None, None, None)], rows))
+    assert table.schema.field("ratio").type == pa.float64()
+    assert table.column("ratio").to_pylist() == [1.0, 2.0, 3.0, 2.5]
+
+
+def test_declared_float_column_survives_integer_first_row_group(monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_PARQUET_ROW_GROUP_ROWS", 2)
+    rows = [(1,), (2,), (3,), (2.5,)]
+    table = export_parquet(FakeCursor([("ratio", 701, None, None, None, None, None)], rows), provider="postgres")
+    assert table.column("ratio").to_pylist() == [1.0, 2.0, 3.0, 2.5]
+
+
+def test_late_decimal_with_a_larger_scale_does_not_abort(monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_PARQUET_ROW_GROUP_ROWS", 2)
+    rows = [(Decimal("1.2"),), (Decimal("3.45"),), (Decimal("0.3333333333333333"),), (Decimal("123456789012.5"),)]
+    # Unconstrained NUMERIC: psycopg2 reports no precision or scale
+    table = export_parquet(FakeCursor([("average", 1700, None, None, None, None, None)], rows), provider="postgres")
+    assert table.column("average").to_pylist() == [value for (value,) in rows]
+
+
+def test_declared_numeric_scale_and_integers(monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_PARQUET_ROW_GROUP_ROWS", 2)
+    description = [("id", 20, None, None, None, None, None), ("total", 1700, None, None, 10, 2, None)]
+    rows = [(1, Decimal("9.99")), (2, None), (3, Decimal("10.50"))]
+    table = export_parquet(FakeCursor(description, rows), provider="postgres")
+    assert table.schema.field("total").type == pa.decimal128(38, 2)
+    assert table.to_pylist()[2] == {"id": 3, "total": Decimal("10.50")}
+
+
+def test_value_that_does_not_fit_raises_instead_of_truncating(monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_PARQUET_ROW_GROUP_ROWS", 2)
+    with pytest.raises(ValueError):
+        export_parquet(FakeCursor([("n", None, None, None, None, None, None)], [(1,), (2,), (2.5,)]))
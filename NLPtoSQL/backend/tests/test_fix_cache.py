@@ -0,0 +1,92 @@
+from database.fix_cache import FixCache, apply_rewrites, diff_rewrites, error_signature, fix_rewrites
+
+FAILED = "SELECT custname FROM customers WHERE region = 'north'"
+FIXED = "SELECT customer_name FROM customers WHERE region = 'north'"
+ERROR = 'SQL execution failed: column "custname" does not exist\nLINE 1: SELECT custname FROM customers\n               ^'
+
+
+def test_error_signature_ignores_prefixes_and_positions():
+    assert error_signature(ERROR) == 'column "custname" does not exist'
+    assert error_signature("Sql execution failed: SQL execution failed: syntax error at character 42") == "syntax error"
+
+
+def test_diff_rewrites_small_edits_only():
+    assert diff_rewrites(FAILED, FIXED) == [(("custname",), "customer_name")]
+    assert diff_rewrites("SELECT a FROM t", "SELECT a FROM t LIMIT 10") == [(("t",), "t LIMIT 10")]
+    assert diff_rewrites(FAILED, "WITH x AS (SELECT 1) SELECT * FROM x ORDER BY 1 DESC") is None
+    assert diff_rewrites(FAILED, FAILED) is None
+
+
+def test_apply_rewrites_leaves_literals_alone():
+    rewrites = [(("custname",), "customer_name")]
+    query = "SELECT custname, 'custname' AS label FROM customers ORDER BY custname"
+    assert apply_rewrites(query, rewrites, ERROR) == "SELECT customer_name, 'custname' AS label FROM customers ORDER BY customer_name"
+    assert apply_rewrites("SELECT id FROM customers", rewrites, ERROR) is None
+
+
+def test_learn_then_replay_on_another_query():
+    cache = FixCache()
+    assert cache.learn(1, [(FAILED, ERROR)], FIXED) == 1
+    other_error = 'column "custname" does not exist\nLINE 3: ...'
+    repaired, key = cache.lookup(1, "SELECT custname, region FROM customers", other_error)
+    assert repaired == "SELECT customer_name, region FROM customers"
+    cache.confirm(key)
+    assert cache.lookup(2, FAILED, ERROR) == (None, None)  # Fixes are per database
+    assert cache.stats()["confirmed"] == 1 and cache.stats()["hits"] == 1
+
+
+def test_rejected_fix_is_forgotten():
+    cache = FixCache()
+    cache.learn(1, [(FAILED, ERROR)], FIXED)
+    _, key = cache.lookup(1, FAILED, ERROR)
+    cache.reject(key)
+    assert cache.lookup(1, FAILED, ERROR) == (None, None)
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_limit_and_invalidation():
+    cache = FixCache(max_entries=2)
+    for index in range(3):
+        cache.learn(1, [(f"SELECT col{index}x FROM t", f"Unknown column 'col{index}x' in 'field list'")], f"SELECT col{index} FROM t")
+    assert cache.stats()["entries"] == 2
+    assert cache.lookup(1, "SELECT col0x FROM t", "Unknown column 'col0x' in 'field list'") == (None, None)
+    assert cache.invalidate_database(2) == 0
+    assert cache.invalidate_database(1) == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_punctuation_fix_is_not_replayed_elsewhere():
+    error = 'syntax error at or near "FROM"\nLINE 1: SELECT a, b, FROM t'
+    cache = FixCache()
+    assert cache.learn(1, [("SELECT a, b, FROM t", error)], "SELECT a, b FROM t") == 0
+    query = "SELECT name, total, FROM orders WHERE id IN (1, 2)"
+    assert cache.lookup(1, query, error) == (None, None)
+    assert apply_rewrites(query, [((",",), "")], error) is None
+
+
+def test_each_failure_learns_from_the_attempt_after_it():
+    first_error = 'column "custname" does not exist'
+    second_error = 'relation "customer" does not exist'
+    failures = [
+        ("SELECT custname FROM customer", first_error),
+        ("SELECT customer_name FROM customer", second_error),
+    ]
+    assert fix_rewrites(*failures[0], failures[1][0]) == [(("custname",), "customer_name")]
+    cache = FixCache()
+    assert cache.learn(1, failures, "SELECT customer_name FROM customers") == 2
+    # The table fix is not filed under the column error
+    assert cache.lookup(1, "SELECT custname FROM customer", first_error)[0] == "SELECT customer_name FROM customer"
+    assert cache.lookup(1, "SELECT id FROM customer", second_error)[0] == "SELECT id FROM customers"
+
+
+def test_rewrite_only_applies_near_the_error():
+    cache = FixCache()
+    error = 'syntax error at or near "totl"'
+    cache.learn(1, [("SELECT totl FROM orders", error)], "SELECT total FROM orders")
+    repaired, _ = cache.lookup(1, "SELECT id, totl FROM orders", error)
+    assert repaired == "SELECT id, total FROM orders"
+    # Only the occurrence at the reported position is touched
+    assert apply_rewrites("SELECT totl, id, name, totl FROM t", [(("totl",), "total")], "syntax error at character 24") == (
+        "SELECT totl, id, name, total FROM t"
+    )
+    assert cache.lookup(1, "SELECT totl FROM orders", "syntax error at end of input") == (None, None)
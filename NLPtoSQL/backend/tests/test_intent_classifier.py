@@ -0,0 +1,37 @@
+from Langchain import intent_classifier
+from Langchain.intent_classifier import IntentClassifier
+
+SCHEMA = {
+    "orders": [{"column": "id"}, {"column": "total_amount"}, {"column": "order_date"}],
+    "customers": [{"column": "id"}, {"column": "region"}],
+}
+
+
+def classifier():
+    return IntentClassifier(stored_schema=SCHEMA)
+
+
+def test_obvious_intents_are_decided_locally():
+    assert classifier().decide("Hello!").intent == "casual_chat"
+    assert classifier().decide("SELECT id FROM orders").intent == "sql_query"
+    assert classifier().decide('orders inside {"type": "Polygon", "coordinates": []}').intent == "sql_spatial"
+    assert classifier().decide("customers within 10 km of the depot").intent == "sql_spatial"
+
+
+def test_schema_terms_and_data_wording_make_sql():
+    decision = classifier().decide("How many orders per customer region?")
+    assert decision.intent == "sql_query" and decision.confidence >= 0.85
+    assert "order" in decision.reason
+
+
+def test_uncertain_questions_go_to_the_llm():
+    assert classifier().decide("Who is the prime minister of India?") is None
+    assert classifier().decide("Show orders within the last month") is None  # "within" without a distance
+    assert classifier().decide("   ") is None
+    assert classifier().classify("list something").intent == "sql_query"  # Wording alone is not confident
+    assert classifier().decide("list something") is None
+
+
+def test_fast_path_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(intent_classifier, "INTENT_FAST_PATH_ENABLED", False)
+    assert classifier().decide("Hello!") is None
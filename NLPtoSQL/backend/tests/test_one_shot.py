@@ -0,0 +1,59 @@
+import json
+
+from langchain_community.utilities.sql_database import SQLDatabase
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from sqlalchemy import create_engine, text
+
+from Langchain.query_engine import QueryEngine, QueryIntent
+from Langchain.schema_cache import TableDDLCache
+
+DDL = "CREATE TABLE orders (id INTEGER PRIMARY KEY, region TEXT, total REAL)"
+SQL = "SELECT region, SUM(total) FROM orders GROUP BY region;"
+QUESTION = "Revenue by region please"
+
+
+def build_engine(*replies: str) -> QueryEngine:
+    """Engine whose one model call returns the given replies in order; the pipeline stages are stubbed"""
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(DDL))
+    query_engine = QueryEngine(
+        SQLDatabase(engine), table_descriptions={"orders": {"description": "sales orders"}},
+        selected_tables=["orders"], ddl_cache=TableDDLCache({"orders": DDL}), speculative_token_budget=0
+    )
+    query_engine.llm = FakeListChatModel(responses=list(replies))
+    query_engine.classify_intent = lambda question: (QueryIntent.SQL_QUERY, {})
+    query_engine.generate_query = lambda question, **kwargs: ("SELECT 1;", ["orders"], DDL, {"table_selection": {}, "sql_generation": {}})
+    return query_engine
+
+
+def reply(**fields) -> str:
+    return "```json\n" + json.dumps({"intent": "SQL_QUERY", "confidence": 0.9, "tables": ["ORDERS"], "sql": SQL, **fields}) + "\n```"
+
+
+def test_one_call_answers_the_question():
+    query_engine = build_engine(reply())
+    result = query_engine.process_query(QUESTION, mode="one_shot")
+    assert result["generation_mode"] == "one_shot" and result["intent_decided_by"] == "one_shot"
+    assert result["sql_query"] == SQL and result["filtered_tables"] == ["orders"]
+    assert query_engine.question_for_sql(SQL) == QUESTION  # Confirmable by /execute-sql like pipeline SQL
+
+
+def test_unusable_replies_fall_back_to_the_pipeline():
+    cases = [
+        ("not json at all", "invalid JSON"),
+        (reply(confidence=0.3), "low confidence (0.3)"),
+        (reply(intent="CASUAL_CHAT"), "one-shot intent: CASUAL_CHAT"),
+        (reply(sql="DELETE FROM orders"), "no SELECT statement"),
+    ]
+    for content, reason in cases:
+        result = build_engine(content).process_query(QUESTION, mode="one_shot")
+        assert result["generation_mode"] == "pipeline" and result["sql_query"] == "SELECT 1;"
+        assert result["one_shot_fallback"] == reason
+        assert "one_shot" in result["llm_token_usage"]
+
+
+def test_local_non_sql_intent_skips_the_one_shot_call():
+    query_engine = build_engine()  # No replies: any model call would fail
+    response, tokens, reason = query_engine.generate_one_shot("Hello!")
+    assert response is None and tokens == {} and reason == "local classifier: casual_chat"
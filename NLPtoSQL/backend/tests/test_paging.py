@@ -0,0 +1,102 @@
+import pytest
+
+from database import paging
+from database.paging import PageRequest, build_page_request, build_page_sql, encode_cursor, finish_page
+
+SQL = "SELECT id, name FROM customers ORDER BY id"
+
+
+def first_page(sql=SQL, size=2):
+    return build_page_request(sql, size, None)
+
+
+def next_page(sql, rows, columns, provider="postgres", size=2):
+    page = build_page_request(sql, size, None)
+    _, _, plan = build_page_sql(sql, provider, page)
+    rows, meta = finish_page(rows, columns, page, plan)
+    return rows, meta
+
+
+def test_paging_is_opt_in_by_default():
+    assert paging.SQL_DEFAULT_PAGE_SIZE == 0
+    assert build_page_request(SQL, None, None) is None
+    with pytest.raises(ValueError):
+        build_page_request(SQL, None, "abc")
+
+
+def test_cursor_round_trip():
+    rows, meta = next_page(SQL, [(1, "a"), (2, "b"), (3, "c")], ["id", "name"])
+    assert rows == [(1, "a"), (2, "b")]
+    assert meta["has_more"] is True
+
+    page = build_page_request(SQL, 2, meta["next_cursor"])
+    assert page.state == {"q": page.query_key, "offset": 2, "mode": "keyset", "key": "id", "last": 2, "dup": 1}
+
+
+def test_cursor_rejected_for_other_query():
+    _, meta = next_page(SQL, [(1, "a"), (2, "b"), (3, "c")], ["id", "name"])
+    with pytest.raises(ValueError):
+        build_page_request("SELECT id FROM orders ORDER BY id", 2, meta["next_cursor"])
+    with pytest.raises(ValueError):
+        build_page_request(SQL, 2, "not-a-cursor!")
+
+
+def test_keyset_page_skips_rows_sharing_last_key():
+    key = first_page().query_key
+    page = PageRequest(2, key, {"q": key, "offset": 2, "mode": "keyset", "key": "id", "last": 2, "dup": 1})
+    page_sql, params, plan = build_page_sql(SQL, "postgres", page)
+    assert page_sql == 'SELECT * FROM (SELECT id, name FROM customers) AS _page WHERE _page.id >= %s ORDER BY _page.id ASC LIMIT 3 OFFSET 1'
+    assert params == (2,)
+
+    # Whole page has the same key as the previous cursor: duplicates accumulate
+    rows, meta = finish_page([(2, "x"), (2, "y"), (2, "z")], ["id", "name"], page, plan)
+    state = build_page_request(SQL, 2, meta["next_cursor"]).state
+    assert state["last"] == 2 and state["dup"] == 3
+
+
+def test_keyset_keeps_order_by_token_as_written():
+    sql = 'SELECT "CreatedAt", id FROM events ORDER BY "CreatedAt" DESC'
+    page = PageRequest(10, "k", {"offset": 10, "mode": "keyset", "key": "CreatedAt", "last": "2024-01-01", "dup": 0})
+    page_sql, _, _ = build_page_sql(sql, "postgres", page)
+    assert '_page."CreatedAt" <= %s ORDER BY _page."CreatedAt" DESC' in page_sql
+
+    unquoted = "SELECT CreatedAt, id FROM events ORDER BY CreatedAt"
+    page_sql, _, _ = build_page_sql(unquoted, "postgres", page)
+    assert "_page.CreatedAt >= %s ORDER BY _page.CreatedAt ASC" in page_sql
+
+
+def test_mssql_offset_and_cte_paths():
+    page = PageRequest(5, "k")
+    page_sql, _, plan = build_page_sql("SELECT id FROM t", "mssql", page)
+    assert page_sql == "SELECT id FROM t ORDER BY 1 OFFSET 0 ROWS FETCH NEXT 6 ROWS ONLY"
+
+    page_sql, _, _ = build_page_sql("SELECT TOP 50 id, name FROM t", "mssql", page)
+    assert page_sql == "SELECT * FROM (SELECT TOP 50 id, name FROM t) AS _page ORDER BY 1 OFFSET 0 ROWS FETCH NEXT 6 ROWS ONLY"
+
+    cte = "WITH x AS (SELECT TOP 3 id FROM t) SELECT TOP 2 id FROM x"
+    page_sql, _, plan = build_page_sql(cte, "mssql", page)
+    assert page_sql == cte and plan["mode"] == "none"
+
+    # Keyset is never used for CTEs on SQL Server
+    keyset = PageRequest(5, "k", {"offset": 5, "mode": "keyset", "key": "id", "last": 5, "dup": 0})
+    page_sql, params, plan = build_page_sql("WITH x AS (SELECT id FROM t) SELECT id FROM x ORDER BY id", "mssql", keyset)
+    assert plan["mode"] == "offset" and params is None
+    assert page_sql.endswith("OFFSET 5 ROWS FETCH NEXT 6 ROWS ONLY")
+
+
+def test_self_limiting_query_is_wrapped():
+    page_sql, _, _ = build_page_sql("SELECT id FROM t LIMIT 50", "postgres", PageRequest(10, "k"))
+    assert page_sql == "SELECT * FROM (SELECT id FROM t LIMIT 50) AS _page LIMIT 11 OFFSET 0"
+
+
+def test_literal_percent_is_escaped_for_keyset():
+    sql = "SELECT id FROM t WHERE name LIKE 'a%' ORDER BY id"
+    page = PageRequest(2, "k", {"offset": 2, "mode": "keyset", "key": "id", "last": 2, "dup": 0})
+    page_sql, _, _ = build_page_sql(sql, "postgres", page)
+    assert "LIKE 'a%%'" in page_sql
+
+
+def test_encode_cursor_handles_decimals_and_dates():
+    from datetime import date
+    from decimal import Decimal
+    assert encode_cursor({"last": Decimal("1.5"), "d": date(2024, 1, 2)})
@@ -0,0 +1,99 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from database.pool import ConnectionPool, PoolTimeoutError, _mssql_connection
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.rolled_back = 0
+
+    def rollback(self):
+        self.rolled_back += 1
+
+    def close(self):
+        self.closed = 1
+
+
+def make_pool(**kwargs):
+    opened = []
+
+    def connect():
+        conn = FakeConnection()
+        opened.append(conn)
+        return conn
+
+    return ConnectionPool(connect, "postgres", **kwargs), opened
+
+
+def test_warm_opens_min_size_connections():
+    pool, opened = make_pool(min_size=2, max_size=4)
+    pool.warm()
+    assert len(opened) == 2
+    assert pool.stats()["idle"] == 2
+    pool.warm()
+    assert len(opened) == 2
+
+
+def test_checkout_reuses_released_connection():
+    pool, opened = make_pool(min_size=0, max_size=2)
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    assert len(opened) == 1
+    assert conn.rolled_back == 1
+
+
+def test_checkout_times_out_when_exhausted():
+    pool, _ = make_pool(min_size=0, max_size=1, checkout_timeout=0.05)
+    pool.acquire()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+
+
+def test_evict_idle_keeps_min_size():
+    pool, opened = make_pool(min_size=1, max_size=3, idle_timeout=0.01)
+    conns = [pool.acquire() for _ in range(3)]
+    for conn in conns:
+        pool.release(conn)
+    time.sleep(0.02)
+    assert pool.evict_idle() == 2
+    assert pool.stats()["size"] == 1
+    assert sum(conn.closed for conn in opened) == 2
+
+
+def test_mssql_connection_requires_low_level_api():
+    low_level = SimpleNamespace(query_timeout=0, cancel=lambda: None)
+    assert _mssql_connection(SimpleNamespace(_conn=low_level)) is low_level
+    with pytest.raises(RuntimeError):
+        _mssql_connection(SimpleNamespace())
+
+
+def test_stale_record_does_not_rebuild_a_newer_pool(monkeypatch):
+    from datetime import datetime, timezone
+
+    from database import pool as registry
+
+    monkeypatch.setattr(registry, "open_connection", lambda db_record, plain_password: FakeConnection())
+    monkeypatch.setattr(registry, "POOL_REAP_INTERVAL", 0)
+
+    def record(host, updated_at):
+        return SimpleNamespace(
+            id=9001, provider=SimpleNamespace(value="postgres"), host=host, port=5432, db_name="app", user="u",
+            created_at=datetime(2026, 1, 1, tzinfo=timezone.utc), updated_at=updated_at
+        )
+
+    try:
+        old = record("old-host", None)
+        new = record("new-host", datetime(2026, 2, 1, tzinfo=timezone.utc))
+        first = registry.get_pool(old, "pw")
+        current = registry.get_pool(new, "pw")
+        assert current is not first and first.stats()["size"] == 0
+        # A session connected before the update keeps using the current pool
+        assert registry.get_pool(old, "pw") is current
+        assert registry.get_pool(new, "pw") is current
+    finally:
+        registry.invalidate_pool(9001)
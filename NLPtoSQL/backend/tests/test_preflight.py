@@ -0,0 +1,89 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from database import connection
+from database.cancellation import QueryCancelledError, QueryCancelScope
+from database.paging import build_page_request
+from database.preflight import decide_action, explain_query
+
+
+class FakeCursor:
+    def __init__(self, log):
+        self.log = log
+
+    def execute(self, sql, params=None):
+        self.log.append((sql, params))
+
+    def fetchone(self):
+        return [json.dumps([{"Plan": {"Node Type": "Limit", "Plan Rows": 11, "Total Cost": 1.5, "Plans": []}}])]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.log = []
+
+    def cursor(self):
+        return FakeCursor(self.log)
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def acquire(self):
+        return self.conn
+
+    def release(self, conn, discard=False):
+        self.discarded = discard
+
+    def cancel(self, conn):
+        conn.log.append(("CANCEL", None))
+
+
+def test_decide_action():
+    assert decide_action({"estimated_rows": 5e8}, streaming=False, paged=False, can_stream=True)[0] == "reject"
+    assert decide_action({"estimated_rows": 5e5}, streaming=False, paged=False, can_stream=True)[0] == "limit"
+    assert decide_action({"estimated_rows": 5e5}, streaming=False, paged=True, can_stream=True)[0] == "ok"
+    assert decide_action({"estimated_rows": 10}, streaming=False, paged=False, can_stream=True)[0] == "ok"
+
+
+def test_explain_passes_page_parameters():
+    conn = FakeConnection()
+    estimate = explain_query(conn, "postgres", "SELECT * FROM t WHERE id >= %s", (5,))
+    assert conn.log == [("EXPLAIN (FORMAT JSON) SELECT * FROM t WHERE id >= %s", (5,))]
+    assert estimate["estimated_rows"] == 11
+
+
+def test_preflight_explains_the_paged_sql(monkeypatch):
+    conn = FakeConnection()
+    monkeypatch.setattr(connection, "get_pool", lambda record, password: FakePool(conn))
+    record = SimpleNamespace(id=1, provider=SimpleNamespace(value="postgres"))
+    page = build_page_request("SELECT id FROM t", 10, None)
+
+    connection.preflight_sql_direct("SELECT id FROM t", record, "pw", None, page)
+    assert conn.log[0][0] == "EXPLAIN (FORMAT JSON) SELECT id FROM t LIMIT 11 OFFSET 0"
+
+
+def test_preflight_explain_is_cancellable(monkeypatch):
+    conn = FakeConnection()
+    pool = FakePool(conn)
+    monkeypatch.setattr(connection, "get_pool", lambda record, password: pool)
+    record = SimpleNamespace(id=1, provider=SimpleNamespace(value="postgres"))
+    scope = QueryCancelScope()
+
+    def cancel_mid_explain(conn, provider, sql, params):
+        scope.cancel("client disconnected")
+        raise RuntimeError("canceling statement due to user request")
+
+    monkeypatch.setattr(connection, "explain_query", cancel_mid_explain)
+    with pytest.raises(RuntimeError):
+        connection.preflight_sql_direct("SELECT id FROM t", record, "pw", None, None, scope)
+    assert conn.log == [("CANCEL", None)] and pool.discarded
+
+    with pytest.raises(QueryCancelledError):  # Already cancelled: EXPLAIN never starts
+        connection.preflight_sql_direct("SELECT id FROM t", record, "pw", None, None, scope)
@@ -0,0 +1,202 @@
+import asyncio
+import json
+import time
+from itertools import groupby
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_community.utilities.sql_database import SQLDatabase
+from sqlalchemy import create_engine, text
+
+from auth import get_current_user
+from database import connection
+from Langchain.query_engine import QueryEngine, QueryIntent
+from Langchain.question_cache import get_question_cache, invalidate_question_cache
+from Langchain.schema_cache import TableDDLCache
+
+DATABASE_ID = 7
+DDL = "CREATE TABLE orders (id INTEGER PRIMARY KEY, region TEXT, total REAL)"
+SQL = "SELECT region, SUM(total) FROM orders GROUP BY region;"
+TOKENS = {"prompt_tokens": 100, "completion_tokens": 10, "total_tokens": 110}
+
+
+def build_engine(llm_calls: list) -> QueryEngine:
+    """QueryEngine on an in-memory database whose LLM calls are stubbed and counted"""
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(DDL))
+    query_engine = QueryEngine(
+        SQLDatabase(engine), table_descriptions={"orders": {"description": "sales orders"}},
+        selected_tables=["orders"], ddl_cache=TableDDLCache({"orders": DDL}),
+        question_cache_key=(DATABASE_ID, "fp"), speculative_token_budget=0
+    )
+
+    def classify_intent(question):
+        llm_calls.append("intent")
+        return QueryIntent.SQL_QUERY, dict(TOKENS)
+
+    def generate_query(question, selected_tables=None, filtered_schema=None, geometry=None, on_event=None):
+        llm_calls.append("sql")
+        return SQL, ["orders"], DDL, {"table_selection": dict(TOKENS), "sql_generation": dict(TOKENS)}
+
+    query_engine.classify_intent = classify_intent
+    query_engine.generate_query = generate_query
+    return query_engine
+
+
+def connect(user_id: int, query_engine: QueryEngine):
+    connection.user_db_store[user_id] = {
+        "query_engine": query_engine,
+        "db_instance": None,
+        "db_record": SimpleNamespace(id=DATABASE_ID, provider=SimpleNamespace(value="postgres")),
+        "plain_password": "pw"
+    }
+
+
+@pytest.fixture
+def api(monkeypatch):
+    invalidate_question_cache(DATABASE_ID)
+    get_question_cache(DATABASE_ID, "fp")
+    llm_calls, executed = [], []
+
+    def execute_sql_direct(sql_query, *args, **kwargs):
+        executed.append(sql_query)
+        return {"columns": ["region", "total"], "data": [{"region": "north", "total": 10.0}, {"region": "south", "total": 4.0}], "row_count": 2}
+
+    monkeypatch.setattr(connection, "execute_sql_direct", execute_sql_direct)
+    connect(501, build_engine(llm_calls))
+    app = FastAPI()
+    app.include_router(connection.router)
+
+    def current_user(request: Request):
+        # X-User picks the session; 501 by default
+        return SimpleNamespace(id=int(request.headers.get("X-User", 501)), client_id=None)
+
+    app.dependency_overrides[get_current_user] = current_user
+    yield SimpleNamespace(app=app, client=TestClient(app), llm_calls=llm_calls, executed=executed)
+    for user_id in (501, 502):
+        connection.user_db_store.pop(user_id, None)
+    invalidate_question_cache(DATABASE_ID)
+
+
+def test_question_cache_fills_from_sql_only_execution(api):
+    question = "Revenue by region please"
+    first = api.client.post("/database/query", json={"question": question}).json()
+    assert first["sql_query"] == SQL and first["question_cache"] is None
+    assert api.llm_calls == ["intent", "sql"]
+
+    # Not run yet: asking again still goes to the LLM
+    api.client.post("/database/query", json={"question": question})
+    assert api.llm_calls == ["intent", "sql"] * 2
+
+    # The shipped frontend posts only the SQL
+    response = api.client.post("/database/execute-sql", json={"sql_query": first["sql_query"], "preflight": False, "use_cache": False})
+    assert response.status_code == 200 and api.executed == [SQL]
+
+    cached = api.client.post("/database/query", json={"question": question}).json()
+    assert cached["sql_query"] == SQL
+    assert cached["question_cache"]["hit"] is True and cached["intent_decided_by"] == "question_cache"
+    assert api.llm_calls == ["intent", "sql"] * 2
+
+
+def test_sql_the_session_did_not_generate_is_not_cached(api):
+    api.client.post("/database/query", json={"question": "Revenue by region please"})
+    api.client.post("/database/execute-sql", json={
+        "sql_query": "SELECT 1", "question": "Revenue by region please", "preflight": False, "use_cache": False
+    })
+    assert get_question_cache(DATABASE_ID, "fp").stats()["entries"] == 0
+
+
+def stream_events(client, payload: dict) -> list:
+    """(event, data) pairs of a /query/stream response"""
+    body = client.post("/database/query/stream", json=payload).text
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+@pytest.fixture
+def streaming_engine(api):
+    """Session whose SQL comes from the real generate_query, streamed by a fake model"""
+    query_engine = build_engine(api.llm_calls)
+    del query_engine.generate_query
+    query_engine.llm = FakeListChatModel(responses=[SQL])
+    connection.user_db_store[501]["query_engine"] = query_engine
+    return query_engine
+
+
+def test_stream_event_order(api, streaming_engine):
+    events = stream_events(api.client, {"question": "Revenue by region please"})
+    assert [name for name, _ in groupby(event for event, _ in events)] == ["intent", "tables", "sql_token", "sql", "results", "done"]
+    data = dict(events)
+    assert "".join(payload["text"] for event, payload in events if event == "sql_token") == SQL
+    assert data["tables"]["tables"] == ["orders"]
+    assert data["sql"]["sql_query"] == SQL and api.executed == [SQL]
+    assert data["done"]["status"] == "success" and data["done"]["generation_mode"] == "pipeline"
+
+
+def test_stream_ambiguous_question_gets_the_unclear_response(api, streaming_engine):
+    def unusable(*args, **kwargs):
+        raise ValueError("no tables")
+
+    streaming_engine.classify_intent = lambda question: (QueryIntent.AMBIGUOUS, dict(TOKENS))
+    streaming_engine.generate_query = unusable
+    events = stream_events(api.client, {"question": "which ones did best last quarter"})
+    assert [event for event, _ in events] == ["intent", "response", "done"]
+    assert events[0][1]["intent"] == "ambiguous"
+    assert "unclear" in events[1][1]["response"]
+    assert events[2][1]["status"] == "error" and api.executed == []
+
+
+def test_stream_honors_one_shot_mode(api, streaming_engine):
+    def generate_one_shot(question):
+        api.llm_calls.append("one_shot")
+        return {
+            "status": "success", "intent": "sql_query", "sql_query": SQL, "filtered_tables": ["orders"],
+            "filtered_schema": DDL, "schema_token_size": 12, "intent_decided_by": "one_shot", "intent_confidence": 0.9,
+            "llm_token_usage": {"one_shot": dict(TOKENS), "total_tokens_used": 110}
+        }, dict(TOKENS), None
+
+    streaming_engine.generate_one_shot = generate_one_shot
+    events = stream_events(api.client, {"question": "Revenue by region please", "mode": "one_shot"})
+    assert [event for event, _ in events] == ["intent", "tables", "sql", "results", "done"]
+    assert events[0][1]["intent_decided_by"] == "one_shot"
+    assert events[-1][1]["generation_mode"] == "one_shot"
+    assert api.llm_calls == ["one_shot"]
+
+
+def test_coalesced_requests_each_get_their_own_response(api, monkeypatch):
+    def slow_execute(sql_query, *args, **kwargs):
+        api.executed.append(sql_query)
+        time.sleep(0.3)  # Long enough for the second request to join the first
+        return {"columns": ["region"], "data": [{"region": "north"}], "row_count": 1}
+
+    monkeypatch.setattr(connection, "execute_sql_direct", slow_execute)
+    connect(502, build_engine(api.llm_calls))
+    api.client.post("/database/query", json={"question": "Revenue by region please"})
+    api.client.post("/database/query", json={"question": "Total sales for each region"}, headers={"X-User": "502"})
+
+    async def run_both():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            leader = asyncio.ensure_future(client.post("/database/execute-sql", json={"sql_query": SQL, "preflight": False, "use_cache": False}))
+            await asyncio.sleep(0.1)
+            follower = await client.post(
+                "/database/execute-sql", headers={"X-User": "502"},
+                json={"sql_query": SQL.replace(" ", "  "), "preflight": False, "use_cache": True}
+            )
+            return await leader, follower
+
+    leader, follower = asyncio.run(run_both())
+    assert api.executed == [SQL] and follower.headers.get("X-Coalesced") == "true"
+    assert leader.json()["original_query"] == SQL and leader.json()["cache"] == "bypass"
+    assert follower.json()["original_query"] == SQL.replace(" ", "  ") and follower.json()["cache"] == "miss"
+    # Both sessions' questions were confirmed, not just the leader's
+    cache = get_question_cache(DATABASE_ID, "fp")
+    assert cache.lookup("Revenue by region please") and cache.lookup("Total sales for each region")
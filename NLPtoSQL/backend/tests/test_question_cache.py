@@ -0,0 +1,93 @@
+from collections import OrderedDict
+
+import pytest
+
+from Langchain import question_cache as registry
+from Langchain.query_engine import ConversationMemory, QueryEngine
+from Langchain.question_cache import QuestionCache, get_question_cache, invalidate_question_cache
+
+ENTRY = {"sql_query": "SELECT COUNT(*) FROM orders;", "filtered_tables": ["orders"], "filtered_schema": "CREATE TABLE orders"}
+
+
+def test_exact_and_similar_matches():
+    cache = QuestionCache("fp")
+    cache.put("How many orders were placed in 2024?", ENTRY)
+    exact = cache.lookup("how many orders were placed in 2024")
+    assert exact["match"] == "exact" and exact["sql_query"] == ENTRY["sql_query"]
+    similar = cache.lookup("Show how many orders were placed in 2024")
+    assert similar["match"] == "similar"
+    assert cache.lookup("How many orders were placed in 2023?") is None  # Literals must match exactly
+    assert cache.stats() == {"entries": 1, "hits": 2, "near_hits": 1, "misses": 1}
+
+
+def test_ttl_and_lru_eviction(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(registry.time, "monotonic", lambda: now[0])
+    cache = QuestionCache("fp", max_entries=2, ttl_seconds=10)
+    cache.put("list customers", ENTRY)
+    cache.put("list products", ENTRY)
+    cache.lookup("list customers")
+    cache.put("list suppliers", ENTRY)
+    assert cache.lookup("list products") is None
+    assert cache.lookup("list customers") is not None
+    now[0] += 11
+    assert cache.lookup("list customers") is None
+
+
+def test_discard_only_matching_sql():
+    cache = QuestionCache("fp")
+    cache.put("list customers", ENTRY)
+    assert not cache.discard("list customers", "SELECT 1;")
+    assert cache.discard("list customers", ENTRY["sql_query"])
+    assert cache.lookup("list customers") is None
+
+
+def test_registry_replace_semantics():
+    invalidate_question_cache(99)
+    try:
+        current = get_question_cache(99, "new")
+        assert get_question_cache(99, "new", replace=False) is current
+        assert get_question_cache(99, "old", replace=False) is None  # An out-of-date session doesn't evict it
+        assert get_question_cache(99, "newer") is not current
+    finally:
+        invalidate_question_cache(99)
+
+
+@pytest.fixture
+def engine():
+    # Only the question-cache bookkeeping is exercised: no database or LLM behind it
+    invalidate_question_cache(42)
+    query_engine = QueryEngine.__new__(QueryEngine)
+    query_engine.question_cache_key = (42, "fp")
+    query_engine._generated_sql = OrderedDict()
+    query_engine.memory = ConversationMemory()
+    query_engine.memory.add_message("user", "How many orders?")
+    yield query_engine
+    invalidate_question_cache(42)
+
+
+def test_generated_sql_cached_only_after_it_runs(engine):
+    engine._remember_generated("How many orders?", ENTRY["sql_query"], ["orders"], "CREATE TABLE orders")
+    assert engine.question_cache.lookup("How many orders?") is None
+
+    assert not engine.confirm_generated_sql("How many orders?", "SELECT 1", "SELECT 1")  # Not what was generated
+    assert not engine.confirm_generated_sql("How many customers?", ENTRY["sql_query"], ENTRY["sql_query"])
+    assert engine.question_cache.lookup("How many orders?") is None
+
+    assert engine.confirm_generated_sql("How many orders?", "SELECT  COUNT(*)\nFROM orders", "SELECT COUNT(*) FROM Orders;")
+    assert engine.question_cache.lookup("How many orders?")["sql_query"] == "SELECT COUNT(*) FROM Orders;"
+
+
+def test_failed_cached_sql_is_dropped(engine):
+    engine.question_cache.put("How many orders?", ENTRY)
+    engine._remember_generated("How many orders?", ENTRY["sql_query"], ["orders"], "CREATE TABLE orders")
+    engine.reject_generated_sql("How many orders?", ENTRY["sql_query"])
+    assert engine.question_cache.lookup("How many orders?") is None
+
+
+def test_invalidation_reaches_connected_sessions(engine):
+    before = engine.question_cache
+    before.put("How many orders?", ENTRY)
+    invalidate_question_cache(42)
+    assert engine.question_cache is not before
+    assert engine.question_cache.lookup("How many orders?") is None
@@ -0,0 +1,62 @@
+from database import result_cache as module
+from database.result_cache import ResultCache, normalize_sql
+
+
+def test_normalize_sql_collapses_whitespace_outside_quotes():
+    assert normalize_sql("```sql\nSELECT  *\n\tFROM orders ;\n```") == "SELECT * FROM orders"
+    assert normalize_sql("SELECT 'a  b', \"Col  Name\"  FROM t;;") == "SELECT 'a  b', \"Col  Name\" FROM t"
+    assert normalize_sql("SELECT 'it''s   here' FROM t") == "SELECT 'it''s   here' FROM t"
+
+
+def test_hit_is_keyed_by_database_normalized_sql_and_variant():
+    cache = ResultCache()
+    cache.put(1, "SELECT * FROM orders;", {"rows": 1}, variant="rows")
+    assert cache.get(1, "SELECT *\nFROM orders", variant="rows") == {"rows": 1}
+    assert cache.get(2, "SELECT * FROM orders", variant="rows") is None
+    assert cache.get(1, "SELECT * FROM orders", variant="columnar") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(module.time, "monotonic", lambda: now[0])
+    cache = ResultCache(ttl_seconds=10)
+    cache.put(1, "SELECT 1", "a")
+    cache.put(1, "SELECT 2", "b", ttl_seconds=30)
+    now[0] += 11
+    assert cache.get(1, "SELECT 1") is None
+    assert cache.get(1, "SELECT 2") == "b"
+    assert cache.stats()["entries"] == 1
+
+
+def test_entry_and_byte_limits_evict_least_recently_used():
+    value = "x" * 100  # 102 bytes as JSON
+    cache = ResultCache(max_entries=10, max_bytes=250)
+    cache.put(1, "SELECT 1", value)
+    cache.put(1, "SELECT 2", value)
+    cache.get(1, "SELECT 1")
+    cache.put(1, "SELECT 3", value)
+    assert cache.get(1, "SELECT 2") is None
+    assert cache.get(1, "SELECT 1") == value
+    assert cache.stats()["bytes"] == 204 and cache.stats()["evictions"] == 1
+
+    by_count = ResultCache(max_entries=1)
+    by_count.put(1, "SELECT 1", value)
+    by_count.put(1, "SELECT 2", value)
+    assert by_count.get(1, "SELECT 1") is None and by_count.stats()["entries"] == 1
+
+
+def test_oversized_results_and_disabled_cache_are_skipped():
+    assert not ResultCache(max_entry_bytes=10).put(1, "SELECT 1", "x" * 100)
+    assert not ResultCache(ttl_seconds=0).put(1, "SELECT 1", "x")
+
+
+def test_invalidate_database():
+    cache = ResultCache()
+    cache.put(1, "SELECT 1", "a")
+    cache.put(1, "SELECT 2", "b")
+    cache.put(2, "SELECT 1", "c")
+    assert cache.invalidate_database(1) == 2
+    assert cache.get(2, "SELECT 1") == "c"
+    assert cache.stats()["bytes"] == 3
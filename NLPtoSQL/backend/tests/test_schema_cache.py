@@ -0,0 +1,62 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from Langchain.schema_cache import TableDDLCache
+
+ORDERS = "CREATE TABLE orders (id INTEGER)"
+
+
+def test_only_missing_tables_are_reflected_and_persisted():
+    reflected, persisted = [], []
+
+    def reflect(tables):
+        reflected.append(tables)
+        return {table: f"CREATE TABLE {table} (id INTEGER)" for table in tables}
+
+    cache = TableDDLCache({"orders": ORDERS}, persist=persisted.append)
+    ddl = cache.get_many(["orders", "customers"], reflect)
+    assert ddl == {"orders": ORDERS, "customers": "CREATE TABLE customers (id INTEGER)"}
+    assert reflected == [["customers"]] and persisted == [{"customers": "CREATE TABLE customers (id INTEGER)"}]
+
+    cache.get_many(["orders", "customers"], reflect)
+    assert reflected == [["customers"]]  # Warm now
+    assert cache.stats() == {"tables": 2, "hits": 3, "misses": 1}
+
+
+def test_persist_failure_still_returns_the_ddl():
+    def persist(entries):
+        raise RuntimeError("database is read-only")
+
+    cache = TableDDLCache(persist=persist)
+    assert cache.get_many(["orders"], lambda tables: {"orders": ORDERS}) == {"orders": ORDERS}
+
+
+def test_replace_drops_old_entries():
+    cache = TableDDLCache({"orders": ORDERS})
+    cache.replace({"customers": "CREATE TABLE customers (id INTEGER)"})
+    assert cache.get_many(["orders"], lambda tables: {}) == {}
+    assert cache.stats()["tables"] == 1
+
+
+def test_reflected_ddl_is_merged_into_the_record(monkeypatch):
+    from database import connection
+    from database.models import Database, DBProvider
+
+    engine = create_engine("sqlite://")
+    Database.__table__.create(engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(connection, "SessionLocal", Session)
+    with Session() as session:
+        session.add(Database(
+            id=1, client_id=1, provider=DBProvider.POSTGRES, port=5432, host="h", user="u", password="p",
+            db_name="app", schema_ddl={"orders": ORDERS}
+        ))
+        session.commit()
+
+    connection._persist_schema_ddl(1, {"customers": "CREATE TABLE customers (id INTEGER)"})
+    with Session() as session:
+        assert set(session.get(Database, 1).schema_ddl) == {"orders", "customers"}
+
+    connection._persist_schema_ddl(1, {"invoices": "CREATE TABLE invoices (id INTEGER)"}, replace=True)
+    with Session() as session:
+        assert set(session.get(Database, 1).schema_ddl) == {"invoices"}
@@ -0,0 +1,40 @@
+from Langchain import schema_linker
+from Langchain.schema_linker import prune_schema
+
+FILLER = [f"\tnote_{index} TEXT" for index in range(20)]
+ORDERS = "CREATE TABLE orders (\n" + ", \n".join([
+    "\tid INTEGER NOT NULL",
+    "\tcustomer_id INTEGER",
+    "\tshipping_country TEXT",
+    "\ttotal_amount NUMERIC",
+    *FILLER,
+    "\tPRIMARY KEY (id)",
+    "\tFOREIGN KEY(customer_id) REFERENCES customers (id)",
+]) + "\n)"
+CUSTOMERS = "CREATE TABLE customers (\n" + ", \n".join(["\tid INTEGER NOT NULL", "\tfull_name TEXT", "\tPRIMARY KEY (id)"]) + "\n)"
+SCHEMA = ORDERS + "\n\n" + CUSTOMERS
+
+
+def test_keys_and_relevant_columns_survive():
+    pruned, stats = prune_schema(SCHEMA, "Total amount per shipping country", budget=120)
+    orders = pruned.split("\n\n")[0]
+    for kept in ("id INTEGER", "customer_id", "shipping_country", "total_amount", "PRIMARY KEY (id)", "REFERENCES customers"):
+        assert kept in orders
+    assert "note_19" not in orders
+    assert "full_name" in pruned  # Small tables keep SCHEMA_MIN_COLUMNS_PER_TABLE columns
+    assert stats["tokens_saved"] > 0 and stats["columns_dropped"] > 0
+    assert stats["tokens_after"] <= 120
+
+
+def test_column_descriptions_count_towards_relevance():
+    descriptions = {"orders": {"note_7": "the shipping carrier used"}}
+    pruned, _ = prune_schema(SCHEMA, "Which carrier shipped most", descriptions, budget=100)
+    assert "note_7" in pruned and "note_8" not in pruned
+
+
+def test_small_or_non_ddl_schemas_pass_through(monkeypatch):
+    assert prune_schema(SCHEMA, "anything", budget=100000)[0] == SCHEMA
+    assert prune_schema("Schema unavailable for requested tables", "anything", budget=1)[0] == "Schema unavailable for requested tables"
+    monkeypatch.setattr(schema_linker, "SCHEMA_LINKING_ENABLED", False)
+    pruned, stats = prune_schema(SCHEMA, "Total amount", budget=1)
+    assert pruned == SCHEMA and stats["tokens_saved"] == 0
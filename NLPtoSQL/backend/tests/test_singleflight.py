@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from database.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_execution():
+    flights = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "rows"
+
+    async def scenario():
+        return await asyncio.gather(*(flights.do("q", work) for _ in range(3)))
+
+    results = asyncio.run(scenario())
+    assert results == [("rows", False), ("rows", True), ("rows", True)]
+    assert calls == [1]
+    assert flights.stats()["in_flight"] == 0 and flights.stats()["coalesced"] == 2
+
+
+def test_failure_reaches_followers_and_is_not_cached():
+    flights = SingleFlight()
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def scenario():
+        results = await asyncio.gather(flights.do("q", failing), flights.do("q", failing), return_exceptions=True)
+        assert [type(result) for result in results] == [ValueError, ValueError]
+        return await flights.do("q", lambda: asyncio.sleep(0, result="ok"))
+
+    assert asyncio.run(scenario()) == ("ok", False)
+
+
+def test_cancelled_follower_does_not_cancel_leader():
+    flights = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "rows"
+
+    async def scenario():
+        leader = asyncio.create_task(flights.do("q", work))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flights.do("q", work))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(scenario()) == ("rows", False)
+
+
+def test_cancelled_leader_hands_work_to_a_follower():
+    flights = SingleFlight()
+    started = []
+
+    async def work():
+        started.append(1)
+        await asyncio.sleep(0.05)
+        return "rows"
+
+    async def scenario():
+        leader = asyncio.create_task(flights.do("q", work))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(flights.do("q", work)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*followers)
+
+    assert sorted(asyncio.run(scenario())) == [("rows", False), ("rows", True)]
+    assert started == [1, 1]
+    assert flights.stats()["in_flight"] == 0
@@ -0,0 +1,62 @@
+import pytest
+
+from benchmarks.bench_validate_sql import build_query, build_schema, legacy_fix
+from Langchain.sql_identifiers import fix_identifiers, identifier_map
+
+SCHEMA = """CREATE TABLE CustomerOrders (
+\tOrderID INTEGER NOT NULL, 
+\tCustomerName VARCHAR(50), 
+\tTotalAmount NUMERIC(10, 2), 
+\tPRIMARY KEY (OrderID)
+)
+
+CREATE TABLE Customers (
+\tCustomerID INTEGER NOT NULL, 
+\tCustomerName VARCHAR(50), 
+\tPRIMARY KEY (CustomerID)
+)"""
+
+
+@pytest.mark.parametrize("sql_query", [
+    "select customername, totalamount from customerorders where orderid > 10",
+    "select o.customername from customerorders.o.customername",
+    "select c.customers.customerid from customers c",
+    "select customers.customers.customerid from customers",
+    "select count(*) as total from customerorders o join customers c on c.customername = o.customername order by total desc",
+    "select x.customerorders.orderid from customerorders x",
+])
+def test_matches_legacy_regex_outside_literals(sql_query):
+    assert fix_identifiers(sql_query, SCHEMA) == legacy_fix(sql_query, SCHEMA)
+
+
+def test_matches_legacy_on_generated_schema():
+    schema = build_schema(tables=40, columns=8)
+    sql_query = build_query(schema)
+    assert fix_identifiers(sql_query, schema) == legacy_fix(sql_query, schema)
+
+
+def test_literals_quoted_identifiers_and_comments_are_untouched():
+    sql_query = "select customername, 'customername' from \"customerorders\" -- orderid\nwhere x = 'it''s customers.customers.id'"
+    assert fix_identifiers(sql_query, SCHEMA) == (
+        "select CustomerName, 'customername' from \"customerorders\" -- orderid\nwhere x = 'it''s customers.customers.id'"
+    )
+    assert legacy_fix(sql_query, SCHEMA) != fix_identifiers(sql_query, SCHEMA)  # The old passes rewrote literals too
+
+
+def test_four_part_names_are_kept():
+    # Only exact three-part chains are collapsed; the old passes also cut longer ones (srv.s.dbo.x -> s.x)
+    sql_query = "select * from srv.s.dbo.customers"
+    assert fix_identifiers(sql_query, SCHEMA) == "select * from srv.s.dbo.Customers"
+    assert legacy_fix(sql_query, SCHEMA) == "select * from s.Customers"
+
+
+def test_without_schema_only_qualification_is_fixed():
+    assert fix_identifiers("select orders.orders.id from orders") == "select orders.id from orders"
+
+
+def test_identifier_map_is_cached_per_schema():
+    identifier_map.cache_clear()
+    fix_identifiers("select orderid from customerorders", SCHEMA)
+    fix_identifiers("select customerid from customers", SCHEMA)
+    assert identifier_map.cache_info().hits == 1
+    assert identifier_map(SCHEMA)["totalamount"] == "TotalAmount"
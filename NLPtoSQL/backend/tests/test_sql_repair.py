@@ -0,0 +1,49 @@
+import pytest
+
+pytest.importorskip("sqlglot")
+
+from Langchain.sql_repair import repair_sql  # noqa: E402
+
+SCHEMA = {
+    "orders": [{"column": "id"}, {"column": "customer_id"}, {"column": "names"}, {"column": "OrderDate"}, {"column": "created_at"}],
+    "customers": [{"column": "id"}, {"column": "name"}, {"column": "region"}, {"column": "created_at"}],
+    "Invoices": [{"column": "id"}, {"column": "amount"}],
+}
+
+
+def test_exact_column_is_not_redirected_to_a_near_miss():
+    sql = "SELECT name FROM orders o JOIN customers c ON c.id = o.customer_id"
+    assert repair_sql(sql, SCHEMA, "postgres") == (None, [])
+
+
+def test_ambiguous_only_when_several_tables_have_the_exact_column():
+    repaired, fixes = repair_sql("SELECT id, region FROM orders o JOIN customers c ON c.id = o.customer_id", SCHEMA, "postgres")
+    assert repaired == "SELECT o.id, region FROM orders AS o JOIN customers AS c ON c.id = o.customer_id"
+    assert fixes == ["qualified ambiguous column id with o"]
+
+
+def test_near_miss_resolved_when_one_table_matches():
+    repaired, fixes = repair_sql("SELECT c.nme, custmer_id FROM orders o JOIN customers c ON c.id = o.customer_id", SCHEMA, "mysql")
+    assert repaired == "SELECT c.name, customer_id FROM orders AS o JOIN customers AS c ON c.id = o.customer_id"
+    assert fixes == ["column nme -> name", "column custmer_id -> customer_id"]
+
+
+def test_near_miss_in_several_tables_is_left_alone():
+    sql = "SELECT createdat FROM orders o JOIN customers c ON c.id = o.customer_id"
+    assert repair_sql(sql, SCHEMA, "postgres") == (None, [])
+
+
+def test_case_and_quoting_for_postgres():
+    repaired, fixes = repair_sql("SELECT orderdate FROM orders JOIN invoices ON invoices.id = orders.id", SCHEMA, "postgres")
+    assert repaired == 'SELECT "OrderDate" FROM orders JOIN "Invoices" ON "Invoices".id = orders.id'
+    assert fixes == ["table invoices -> Invoices", "column orderdate -> OrderDate"]
+
+
+def test_output_aliases_and_ctes_are_not_touched():
+    sql = "WITH recent AS (SELECT id AS total FROM orders) SELECT total FROM recent ORDER BY total"
+    assert repair_sql(sql, SCHEMA, "postgres") == (None, [])
+
+
+def test_unusable_input():
+    assert repair_sql("SELEC FROM WHERE", SCHEMA, "postgres") == (None, [])
+    assert repair_sql("SELECT name FROM customers", {}, "postgres") == (None, [])
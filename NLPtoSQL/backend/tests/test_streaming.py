@@ -0,0 +1,79 @@
+import json
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+from database import connection
+from database.connection import _ndjson_result_stream, stream_sql_direct
+
+RECORD = SimpleNamespace(id=1, provider=SimpleNamespace(value="mssql"))
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.description = None
+        self.closed = False
+
+    def execute(self, sql, params=None):
+        self.description = [("id",), ("day",)]
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    def close(self):
+        self.closed = True
+
+
+class FakePool:
+    def __init__(self, rows):
+        self.cursor = FakeCursor(rows)
+        self.released = []
+
+    def acquire(self):
+        return SimpleNamespace(cursor=lambda: self.cursor)
+
+    def release(self, conn, discard=False):
+        self.released.append(discard)
+
+
+def test_rows_arrive_in_fetch_size_batches(monkeypatch):
+    pool = FakePool([(index, date(2024, 1, index)) for index in range(1, 6)])
+    monkeypatch.setattr(connection, "get_pool", lambda record, password: pool)
+    batches = list(stream_sql_direct("SELECT id, day FROM t", RECORD, "pw", fetch_size=2))
+    assert batches[0] == ["id", "day"]
+    assert [len(batch) for batch in batches[1:]] == [2, 2, 1]
+    assert batches[1][0] == {"id": 1, "day": date(2024, 1, 1)}
+    assert pool.cursor.closed and pool.released == [False]
+
+
+def test_abandoned_stream_discards_the_connection(monkeypatch):
+    pool = FakePool([(index, None) for index in range(10)])
+    monkeypatch.setattr(connection, "get_pool", lambda record, password: pool)
+    batches = stream_sql_direct("SELECT id, day FROM t", RECORD, "pw", fetch_size=3)
+    next(batches)
+    next(batches)
+    batches.close()  # Client went away half way through
+    assert pool.released == [True]
+
+
+def test_ndjson_lines():
+    def batches():
+        yield [{"id": 1, "total": Decimal("2.5")}]
+        yield [{"id": 2, "total": None}]
+
+    lines = [json.loads(line) for line in _ndjson_result_stream(["id", "total"], batches(), "SELECT 1", "SELECT 1", {"action": "ok"})]
+    assert [line["type"] for line in lines] == ["columns", "rows", "rows", "end"]
+    assert lines[0]["columns"] == ["id", "total"] and lines[0]["preflight"] == {"action": "ok"}
+    assert lines[1]["rows"] == [{"id": 1, "total": 2.5}]
+    assert lines[-1]["row_count"] == 2
+
+
+def test_ndjson_reports_mid_stream_failure_in_band():
+    def batches():
+        yield [{"id": 1}]
+        raise RuntimeError("connection reset")
+
+    lines = [json.loads(line) for line in _ndjson_result_stream(["id"], batches(), "SELECT 1", "SELECT 1")]
+    assert lines[-1] == {"type": "error", "detail": "connection reset", "row_count": 1}
@@ -0,0 +1,39 @@
+from Langchain.table_retriever import TableRetriever
+
+DESCRIPTIONS = {
+    "crm_customers": {"description": "People who buy from us", "columns": {"region": "sales territory"}},
+    "sales_orders": {"description": "Orders placed by customers", "columns": {"total_amount": "order value"}},
+    "hr_employees": {"description": "Staff records", "columns": {"salary": "yearly pay"}},
+}
+SCHEMA = {
+    "crm_customers": [{"column": "id"}, {"column": "customer_name"}],
+    "sales_orders": [{"column": "id"}, {"column": "customer_id"}, {"column": "order_date"}],
+    "hr_employees": [{"column": "id"}, {"column": "hired_on"}],
+}
+
+
+def test_best_table_ranks_first():
+    retriever = TableRetriever(DESCRIPTIONS, SCHEMA)
+    assert retriever.search("total order amount per month")[0][0] == "sales_orders"
+    assert retriever.search("employee salaries")[0][0] == "hr_employees"
+    assert retriever.search("weather forecast") == []
+
+
+def test_column_descriptions_are_searchable():
+    retriever = TableRetriever(DESCRIPTIONS, SCHEMA)
+    assert retriever.select("which sales territory is biggest")[0] == "crm_customers"
+
+
+def test_long_tail_is_cut_relative_to_the_best():
+    retriever = TableRetriever(DESCRIPTIONS, SCHEMA)
+    ranked = retriever.search("customers and their orders")
+    assert {table for table, _ in ranked} >= {"crm_customers", "sales_orders"}
+    assert "hr_employees" not in retriever.select("customers and their orders")
+    assert len(retriever.select("customers and their orders", top_k=1)) == 1
+
+
+def test_restricted_to_selected_tables_and_verbatim_names():
+    retriever = TableRetriever(DESCRIPTIONS, SCHEMA, tables=["hr_employees"])
+    assert retriever.select("customer orders") == []
+    assert TableRetriever(DESCRIPTIONS, SCHEMA).match_names('Use "sales_orders" here') == ["sales_orders"]
+    assert TableRetriever().search("anything") == []
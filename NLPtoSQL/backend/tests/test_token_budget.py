@@ -0,0 +1,57 @@
+from types import SimpleNamespace
+
+from Langchain.token_budget import DEFAULT_PROMPT_BUDGET, PromptBudget, count_tokens, truncate_to_tokens
+
+SYSTEM = "You write SQL."
+
+
+def message(text):
+    return SimpleNamespace(content=text)
+
+
+def test_count_and_truncate():
+    assert count_tokens("") == 0
+    assert count_tokens("SELECT region FROM orders") >= 4
+    text = " ".join(f"word{index}" for index in range(200))
+    cut = truncate_to_tokens(text, 20, marker="...")
+    assert cut.endswith("...") and count_tokens(cut[:-3]) <= 20
+    assert truncate_to_tokens("short", 20) == "short"
+
+
+def test_budget_per_model():
+    assert PromptBudget("llama-3.3-70b-versatile").limit == 12000
+    assert PromptBudget("unknown-model").limit == DEFAULT_PROMPT_BUDGET
+    assert PromptBudget("unknown-model", limit=50).limit == 50
+
+
+def test_prompt_that_fits_is_untouched():
+    inputs = {"question": "q", "schema": "CREATE TABLE t (id INTEGER)", "chat_history": [message("hi")]}
+    fitted, report = PromptBudget("test", limit=1000).fit(SYSTEM, inputs)
+    assert fitted == inputs and report["trimmed"] == []
+    assert report["prompt_tokens"] == sum(report["parts"].values())
+
+
+def test_oldest_history_then_context_then_schema():
+    history = [message(f"old message {index} " * 10) for index in range(4)]
+    context = "\n".join(f"Q{index}: earlier question number {index}" for index in range(5))
+    schema = "CREATE TABLE orders (" + ", ".join(f"col{index} TEXT" for index in range(40)) + ")"
+    inputs = {"question": "How many orders?", "schema": schema, "conversation_context": context, "chat_history": history}
+    budget = PromptBudget("test")
+
+    fixed = count_tokens(SYSTEM) + count_tokens("How many orders?") + count_tokens(schema) + count_tokens(context)
+    budget.limit = fixed + count_tokens(history[0].content) + 4
+    fitted, report = budget.fit(SYSTEM, inputs)
+    assert fitted["chat_history"] == history[-1:] and report["trimmed"] == ["chat_history"]
+
+    allowed = []
+    budget.limit = count_tokens(SYSTEM) + count_tokens("How many orders?") + 10
+
+    def shrink(text, tokens):
+        allowed.append(tokens)
+        return "CREATE TABLE orders (col0 TEXT)"
+
+    fitted, report = budget.fit(SYSTEM, inputs, shrink_schema=shrink)
+    assert report["trimmed"] == ["chat_history", "conversation_context", "schema"]
+    assert fitted["chat_history"] == [] and fitted["conversation_context"] == ""
+    assert allowed == [10] and fitted["schema"] == "CREATE TABLE orders (col0 TEXT)"
+    assert fitted["question"] == "How many orders?"
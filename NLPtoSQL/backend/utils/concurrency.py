@@ -0,0 +1,153 @@
+import asyncio
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Deque, Dict, Hashable, Optional
+
+from fastapi import HTTPException
+
+# Worker pool for blocking driver / LLM calls made from async endpoints
+BLOCKING_POOL_SIZE = int(os.getenv("BLOCKING_POOL_SIZE", "32"))
+TENANT_MAX_CONCURRENCY = int(os.getenv("TENANT_MAX_CONCURRENCY", "8"))      # Concurrent blocking calls per client
+TENANT_QUEUE_TIMEOUT = float(os.getenv("TENANT_QUEUE_TIMEOUT", "30"))       # Seconds to wait for a tenant slot
+
+_executor = ThreadPoolExecutor(max_workers=BLOCKING_POOL_SIZE, thread_name_prefix="nlp-blocking")
+
+
+class TenantBusyError(HTTPException):
+    """A tenant already has TENANT_MAX_CONCURRENCY blocking calls in flight"""
+
+    def __init__(self, tenant_id: Hashable):
+        super().__init__(
+            status_code=429,
+            detail=f"Too many concurrent requests for this account (limit {TENANT_MAX_CONCURRENCY}). Please retry shortly."
+        )
+        self.tenant_id = tenant_id
+
+
+class _TenantSlots:
+    """
+    Per-tenant counters of blocking calls in flight. Slots are released by the worker
+    future's done-callback (so a cancelled request can't free a slot its thread still
+    uses), and a tenant's entry is dropped as soon as it has nothing running or waiting.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, int] = {}
+        self._waiters: Dict[Hashable, Deque[asyncio.Future]] = {}
+
+    def try_acquire(self, tenant_id: Hashable) -> bool:
+        with self._lock:
+            if self._in_flight.get(tenant_id, 0) >= self.limit or self._waiters.get(tenant_id):
+                return False
+            self._in_flight[tenant_id] = self._in_flight.get(tenant_id, 0) + 1
+            return True
+
+    async def acquire(self, tenant_id: Hashable, timeout: float):
+        if self.try_acquire(tenant_id):
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        with self._lock:
+            self._waiters.setdefault(tenant_id, deque()).append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except BaseException:
+            with self._lock:
+                queue = self._waiters.get(tenant_id)
+                if queue is not None and waiter in queue:
+                    queue.remove(waiter)
+                    if not queue:
+                        del self._waiters[tenant_id]
+            if waiter.done() and not waiter.cancelled():
+                self.release(tenant_id)  # Granted just before we gave up
+            raise
+
+    def release(self, tenant_id: Hashable):
+        """Thread-safe: hand the slot to the next waiter, or give it back"""
+        with self._lock:
+            queue = self._waiters.get(tenant_id)
+            while queue:
+                waiter = queue.popleft()
+                if not queue:
+                    del self._waiters[tenant_id]
+                if not waiter.done():
+                    waiter.get_loop().call_soon_threadsafe(self._grant, tenant_id, waiter)
+                    return
+            remaining = self._in_flight.get(tenant_id, 0) - 1
+            if remaining > 0:
+                self._in_flight[tenant_id] = remaining
+            else:
+                self._in_flight.pop(tenant_id, None)
+
+    def _grant(self, tenant_id: Hashable, waiter: asyncio.Future):
+        # Runs on the waiter's loop; a waiter that timed out meanwhile passes the slot on
+        if waiter.done():
+            self.release(tenant_id)
+        else:
+            waiter.set_result(True)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {
+                str(tenant_id): {"in_flight": count, "waiting": len(self._waiters.get(tenant_id, ()))}
+                for tenant_id, count in self._in_flight.items()
+            }
+
+
+_tenant_slots = _TenantSlots(TENANT_MAX_CONCURRENCY)
+
+
+async def run_blocking(func: Callable, *args, tenant_id: Hashable = None, **kwargs) -> Any:
+    """
+    Run a blocking callable on the shared worker pool without stalling the event loop.
+    When tenant_id is given, at most TENANT_MAX_CONCURRENCY calls per tenant run at once.
+    """
+    if tenant_id is not None:
+        try:
+            await _tenant_slots.acquire(tenant_id, TENANT_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise TenantBusyError(tenant_id)
+
+    try:
+        future = _executor.submit(partial(func, *args, **kwargs))
+    except BaseException:
+        if tenant_id is not None:
+            _tenant_slots.release(tenant_id)
+        raise
+    if tenant_id is not None:
+        future.add_done_callback(lambda _: _tenant_slots.release(tenant_id))
+    return await asyncio.wrap_future(future)
+
+
+def submit_blocking(func: Callable, *args, tenant_id: Hashable = None, **kwargs) -> Optional[Future]:
+    """
+    Best-effort background work from a worker thread (e.g. speculation): runs on the shared
+    pool under the tenant's limit, or returns None right away if the tenant has no free slot.
+    """
+    if tenant_id is not None and not _tenant_slots.try_acquire(tenant_id):
+        return None
+    try:
+        future = _executor.submit(partial(func, *args, **kwargs))
+    except BaseException:
+        if tenant_id is not None:
+            _tenant_slots.release(tenant_id)
+        raise
+    if tenant_id is not None:
+        future.add_done_callback(lambda _: _tenant_slots.release(tenant_id))
+    return future
+
+
+def get_concurrency_stats() -> Dict:
+    return {
+        "pool_size": BLOCKING_POOL_SIZE,
+        "tenant_max_concurrency": TENANT_MAX_CONCURRENCY,
+        "tenants": _tenant_slots.stats()
+    }
+
+
+def shutdown_executor():
+    _executor.shutdown(wait=False, cancel_futures=True)